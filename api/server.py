@@ -0,0 +1,414 @@
+"""
+本地 API 服务
+
+基于 asyncio 的 HTTP 服务，包装 ScriptExecutor，供本机其他服务以编程方式提交与观察执行。
+监听 127.0.0.1 的 TCP 端口或 Unix socket，只使用标准库：
+
+    POST   /executions                 {"script_id": 1, "parameters": {...}, "timeout": 60, "priority": 0}
+    GET    /executions/<id>            执行状态
+    POST   /executions/<id>/cancel     取消排队中的执行或停止运行中的执行
+    GET    /executions/<id>/stream     Server-Sent Events 实时输出
+    GET    /executions/<id>/records    脚本通过结构化记录通道发出的记录（指标、结果等）
+
+输出流的事件：
+    output    {"data": "..."}                   合并后的输出帧，stderr 的行带有 "ERROR: " 前缀
+    dropped   {"bytes": n}                      客户端读取太慢时丢弃的字节数
+    finished  {"status": "...", "exit_code": n} 执行结束，之后服务关闭连接
+
+每个执行的输出只从执行器线程投递一次到事件循环，再分发给各订阅者。
+每个订阅者有独立的有界缓冲，慢客户端只会丢失自己的输出，不会阻塞其他订阅者或执行器。
+"""
+import asyncio
+import hmac
+import json
+import os
+from collections import deque
+from typing import Dict, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+from core.executor import ScriptExecutor
+from core.script_manager import ScriptManager
+from database.db_manager import SessionLocal
+from database.models import ScriptExecution
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+MAX_BODY_SIZE = 1048576
+MAX_HEADER_LINES = 100
+# 新订阅者可看到的最近输出
+REPLAY_SIZE = 65536
+# 结束的执行保留输出通道的时间，便于稍后连接的客户端获取结束事件
+CHANNEL_LINGER = 60
+
+FINISHED_STATUSES = {"completed", "failed", "timeout", "cancelled",
+                     "memory_limit", "cpu_limit", "file_limit", "process_limit", "skipped"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class _Subscriber:
+    """一个输出流客户端的有界缓冲"""
+
+    def __init__(self, max_buffer: int):
+        self.max_buffer = max_buffer
+        self.frames: deque = deque()
+        self.size = 0
+        self.dropped = 0
+        self.finished: Optional[dict] = None
+        self.ready = asyncio.Event()
+
+    def push(self, text: str):
+        self.frames.append(text)
+        self.size += len(text)
+        # 超出缓冲时丢弃最旧的帧
+        while self.size > self.max_buffer and len(self.frames) > 1:
+            dropped = self.frames.popleft()
+            self.size -= len(dropped)
+            self.dropped += len(dropped)
+        self.ready.set()
+
+    def finish(self, event: dict):
+        self.finished = event
+        self.ready.set()
+
+
+class _Channel:
+    """一个执行的输出分发"""
+
+    def __init__(self):
+        self.subscribers: Set[_Subscriber] = set()
+        self.recent: deque = deque()
+        self.recent_size = 0
+        self.finished: Optional[dict] = None
+
+    def publish(self, text: str):
+        self.recent.append(text)
+        self.recent_size += len(text)
+        while self.recent_size > REPLAY_SIZE and len(self.recent) > 1:
+            self.recent_size -= len(self.recent.popleft())
+        for subscriber in self.subscribers:
+            subscriber.push(text)
+
+    def finish(self, status: str, exit_code: Optional[int]):
+        self.finished = {"status": status, "exit_code": exit_code}
+        for subscriber in self.subscribers:
+            subscriber.finish(self.finished)
+
+    def subscribe(self, max_buffer: int) -> _Subscriber:
+        subscriber = _Subscriber(max_buffer)
+        for text in self.recent:
+            subscriber.push(text)
+        if self.finished:
+            subscriber.finish(self.finished)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+
+class APIServer:
+    """
+    执行器的本地 HTTP 服务
+
+    所有网络 I/O 与订阅者分发在一个事件循环中完成；数据库读写与提交执行在线程池中运行，
+    不阻塞事件循环。设置 token 时每个请求需要带 Authorization: Bearer <token>。
+    """
+
+    def __init__(self, executor: ScriptExecutor, host: str = "127.0.0.1", port: int = 8765,
+                 socket_path: Optional[str] = None, token: Optional[str] = None,
+                 max_client_buffer: int = 262144, session_factory=SessionLocal):
+        self.executor = executor
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path
+        self.token = token
+        self.max_client_buffer = max_client_buffer
+        self.session_factory = session_factory
+        self._channels: Dict[int, _Channel] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return sum(len(channel.subscribers) for channel in self._channels.values())
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        if self.socket_path:
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            self._server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+            os.chmod(self.socket_path, 0o600)
+            logger.info(f"API server listening on {self.socket_path}")
+        else:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port)
+            self.port = self._server.sockets[0].getsockname()[1]
+            logger.info(f"API server listening on http://{self.host}:{self.port}")
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    # 请求处理
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            method, path, headers, body = await self._read_request(reader)
+            # 常数时间比较，避免通过响应时间逐字节猜出令牌
+            if self.token and not hmac.compare_digest(
+                    headers.get("authorization", "").encode("latin-1"),
+                    f"Bearer {self.token}".encode("utf-8")):
+                raise HTTPError(401, "Unauthorized")
+            await self._route(method, path, body, writer)
+        except HTTPError as e:
+            await self._send_json(writer, e.status, {"error": e.message})
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.error(f"API request failed: {str(e)}")
+            try:
+                await self._send_json(writer, 500, {"error": "Internal server error"})
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Tuple[str, str, dict, bytes]:
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        parts = request_line.split()
+        if len(parts) != 3:
+            raise HTTPError(400, "Malformed request line")
+        method, target, _ = parts
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise HTTPError(431, "Too many headers")
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length < 0 or length > MAX_BODY_SIZE:
+            raise HTTPError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), urlsplit(target).path, headers, body
+
+    async def _route(self, method: str, path: str, body: bytes, writer: asyncio.StreamWriter):
+        parts = [part for part in path.split("/") if part]
+        if parts == ["executions"] and method == "POST":
+            result = await self._submit(self._parse_json(body))
+            await self._send_json(writer, 201, result)
+            return
+        if len(parts) >= 2 and parts[0] == "executions":
+            if not parts[1].isdigit():
+                raise HTTPError(404, "Not found")
+            execution_id = int(parts[1])
+            action = parts[2] if len(parts) == 3 else None
+            if action is None and method == "GET":
+                await self._send_json(writer, 200, await self._status(execution_id))
+                return
+            if action == "cancel" and method == "POST":
+                await self._send_json(writer, 200, await self._cancel(execution_id))
+                return
+            if action == "stream" and method == "GET":
+                await self._stream(execution_id, writer)
+                return
+            if action == "records" and method == "GET":
+                await self._send_json(writer, 200, await self._loop.run_in_executor(
+                    None, self._records_blocking, execution_id))
+                return
+        raise HTTPError(404, "Not found")
+
+    @staticmethod
+    def _parse_json(body: bytes) -> dict:
+        try:
+            data = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "Invalid JSON")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "Expected a JSON object")
+        return data
+
+    # 操作
+
+    async def _submit(self, data: dict) -> dict:
+        script_id = data.get("script_id")
+        parameters = data.get("parameters") or {}
+        if not isinstance(script_id, int):
+            raise HTTPError(400, "script_id must be an integer")
+        if not isinstance(parameters, dict) or not all(
+                isinstance(key, str) and isinstance(value, str)
+                for key, value in parameters.items()):
+            raise HTTPError(400, "parameters must map strings to strings")
+        timeout = data.get("timeout") or 3600
+        priority = data.get("priority") or 0
+        if not isinstance(timeout, (int, float)) or not isinstance(priority, int):
+            raise HTTPError(400, "timeout and priority must be numbers")
+        return await self._loop.run_in_executor(
+            None, self._submit_blocking, script_id, parameters, timeout, priority)
+
+    def _submit_blocking(self, script_id: int, parameters: dict, timeout: float,
+                         priority: int) -> dict:
+        db = self.session_factory()
+        try:
+            manager = ScriptManager(db)
+            script = manager.get_script(script_id)
+            if script is None:
+                raise HTTPError(404, f"Script {script_id} not found")
+            content = script.content
+            cacheable = bool(script.cacheable)
+            limits = manager.get_resource_limits(script_id)
+        finally:
+            db.close()
+
+        # 通道在提交前创建，不会错过最早的输出
+        channel = _Channel()
+
+        def on_output(text: str):
+            self._loop.call_soon_threadsafe(channel.publish, text)
+
+        def on_finished(execution_id: int, status: str, exit_code: Optional[int]):
+            self._loop.call_soon_threadsafe(self._finish_channel, execution_id, channel,
+                                            status, exit_code)
+
+        execution_id = self.executor.execute(script_id, content, parameters, timeout,
+                                             output_callback=on_output, priority=priority,
+                                             limits=limits, finished_callback=on_finished,
+                                             cacheable=cacheable)
+        self._loop.call_soon_threadsafe(self._channels.setdefault, execution_id, channel)
+        return {"execution_id": execution_id}
+
+    def _finish_channel(self, execution_id: int, channel: _Channel,
+                        status: str, exit_code: Optional[int]):
+        self._channels.setdefault(execution_id, channel)
+        channel.finish(status, exit_code)
+        self._loop.call_later(CHANNEL_LINGER, self._drop_channel, execution_id, channel)
+
+    def _drop_channel(self, execution_id: int, channel: _Channel):
+        if self._channels.get(execution_id) is channel and not channel.subscribers:
+            del self._channels[execution_id]
+        elif self._channels.get(execution_id) is channel:
+            self._loop.call_later(CHANNEL_LINGER, self._drop_channel, execution_id, channel)
+
+    async def _status(self, execution_id: int) -> dict:
+        return await self._loop.run_in_executor(None, self._status_blocking, execution_id)
+
+    def _status_blocking(self, execution_id: int) -> dict:
+        db = self.session_factory()
+        try:
+            execution = db.get(ScriptExecution, execution_id)
+            if execution is None:
+                raise HTTPError(404, f"Execution {execution_id} not found")
+            return {
+                "execution_id": execution.id,
+                "script_id": execution.script_id,
+                "status": execution.status,
+                "exit_code": execution.exit_code,
+                "error_message": execution.error_message,
+                "queued_at": _isoformat(execution.queued_at),
+                "started_at": _isoformat(execution.started_at),
+                "finished_at": _isoformat(execution.finished_at),
+                "output_size": execution.output_size,
+                "error_size": execution.error_size,
+                "cpu_time": execution.cpu_time,
+                "peak_rss": execution.peak_rss,
+                "progress": execution.progress,
+                "progress_message": execution.progress_message
+            }
+        finally:
+            db.close()
+
+    def _records_blocking(self, execution_id: int) -> dict:
+        db = self.session_factory()
+        try:
+            if db.get(ScriptExecution, execution_id) is None:
+                raise HTTPError(404, f"Execution {execution_id} not found")
+            records = ScriptManager(db).get_execution_records(execution_id)
+            return {
+                "execution_id": execution_id,
+                "records": [dict(json.loads(record.data), seq=record.seq,
+                                 created_at=_isoformat(record.created_at))
+                            for record in records]
+            }
+        finally:
+            db.close()
+
+    async def _cancel(self, execution_id: int) -> dict:
+        await self._loop.run_in_executor(None, self.executor.stop_execution, execution_id)
+        return {"execution_id": execution_id, "cancelled": True}
+
+    async def _stream(self, execution_id: int, writer: asyncio.StreamWriter):
+        channel = self._channels.get(execution_id)
+        if channel is None:
+            # 不是由本服务提交的执行或已过期：只能返回最终状态
+            status = await self._status(execution_id)
+            if status["status"] not in FINISHED_STATUSES:
+                raise HTTPError(409, "Execution output is not available from this server")
+            channel = _Channel()
+            channel.finish(status["status"], status["exit_code"])
+
+        writer.write(b"HTTP/1.1 200 OK\r\n"
+                     b"Content-Type: text/event-stream; charset=utf-8\r\n"
+                     b"Cache-Control: no-cache\r\n"
+                     b"Connection: close\r\n\r\n")
+        subscriber = channel.subscribe(self.max_client_buffer)
+        try:
+            while True:
+                await subscriber.ready.wait()
+                subscriber.ready.clear()
+                if subscriber.dropped:
+                    writer.write(_event("dropped", {"bytes": subscriber.dropped}))
+                    subscriber.dropped = 0
+                while subscriber.frames:
+                    text = subscriber.frames.popleft()
+                    subscriber.size -= len(text)
+                    writer.write(_event("output", {"data": text}))
+                if subscriber.finished:
+                    writer.write(_event("finished", subscriber.finished))
+                    await writer.drain()
+                    return
+                await writer.drain()
+        finally:
+            channel.subscribers.discard(subscriber)
+
+    @staticmethod
+    async def _send_json(writer: asyncio.StreamWriter, status: int, data: dict):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        reason = {200: "OK", 201: "Created", 400: "Bad Request", 401: "Unauthorized",
+                  404: "Not Found", 409: "Conflict", 413: "Payload Too Large",
+                  431: "Request Header Fields Too Large",
+                  500: "Internal Server Error"}.get(status, "")
+        writer.write(f"HTTP/1.1 {status} {reason}\r\n"
+                     f"Content-Type: application/json; charset=utf-8\r\n"
+                     f"Content-Length: {len(body)}\r\n"
+                     f"Connection: close\r\n\r\n".encode("latin-1") + body)
+        await writer.drain()
+
+
+def _event(name: str, data: dict) -> bytes:
+    return f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+def _isoformat(value) -> Optional[str]:
+    return value.isoformat() if value else None
@@ -0,0 +1,44 @@
+"""
+基准测试的公共工具
+
+每个基准在独立的临时工作目录中运行：配置、数据库（sqlite:///script_manager.db 为相对路径）、
+输出与缓存目录都在其中创建，不会读写仓库中的数据，结果可重复。
+"""
+import contextlib
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+from typing import Dict, Iterator, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+@contextlib.contextmanager
+def workspace(prefix: str = "script-bench-") -> Iterator[str]:
+    """切换到临时工作目录，结束后删除"""
+    previous = os.getcwd()
+    path = tempfile.mkdtemp(prefix=prefix)
+    os.chdir(path)
+    try:
+        yield path
+    finally:
+        os.chdir(previous)
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def percentile(values: List[float], percent: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent))]
+
+
+def summarize(prefix: str, seconds: List[float]) -> Dict[str, float]:
+    """把一组耗时（秒）汇总为 mean/p50/p95 毫秒"""
+    return {
+        f"{prefix}_mean_ms": statistics.fmean(seconds) * 1000,
+        f"{prefix}_p50_ms": percentile(seconds, 0.5) * 1000,
+        f"{prefix}_p95_ms": percentile(seconds, 0.95) * 1000
+    }
@@ -0,0 +1,117 @@
+"""
+执行器基准测试
+
+测量 ScriptExecutor.execute 在不同并发上限下从启动到退出的延迟与每秒完成的执行数，
+以及单个执行经由事件循环、输出捕获与输出合并的吞吐量：
+
+    python benchmarks/executor_benchmark.py --concurrency 1 10 100 --runs 200
+"""
+import argparse
+import json
+import threading
+import time
+from typing import Dict, List
+
+from common import summarize, workspace
+
+from core.executor import ScriptExecutor
+from database.db_manager import init_db
+
+# 以 1KB 的行写出 size_mb MB
+OUTPUT_SCRIPT = """
+import sys
+line = b"x" * 1023 + b"\\n"
+block = line * 1024
+for _ in range({size_mb}):
+    sys.stdout.buffer.write(block)
+"""
+
+
+class TimedExecutor(ScriptExecutor):
+    """记录每个执行的启动与退出时刻"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.spawned: Dict[int, float] = {}
+        self.finished: Dict[int, float] = {}
+        self.statuses: Dict[int, int] = {}
+        self._condition = threading.Condition()
+
+    def _on_exit(self, execution_id: int, return_code: int, timed_out: bool):
+        finished = time.monotonic()
+        spawned = self._timing[execution_id][0]
+        super()._on_exit(execution_id, return_code, timed_out)
+        with self._condition:
+            self.spawned[execution_id] = spawned
+            self.finished[execution_id] = finished
+            self.statuses[execution_id] = return_code
+            self._condition.notify_all()
+
+    def wait_all(self, execution_ids: List[int], timeout: float = 600):
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while not all(execution_id in self.finished for execution_id in execution_ids):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("Executions did not finish in time")
+                self._condition.wait(remaining)
+
+
+def bench_concurrency(concurrency: int, runs: int) -> Dict[str, float]:
+    """以 concurrency 为并发上限提交 runs 个空脚本"""
+    executor = TimedExecutor(max_concurrency=concurrency)
+    try:
+        # 预热：编译缓存与写入线程
+        executor.wait_all([executor.execute(1, "pass")])
+        started = time.monotonic()
+        execution_ids = [executor.execute(1, "pass") for _ in range(runs)]
+        executor.wait_all(execution_ids)
+        elapsed = time.monotonic() - started
+        latencies = [executor.finished[i] - executor.spawned[i] for i in execution_ids]
+        failures = sum(1 for i in execution_ids if executor.statuses[i] != 0)
+    finally:
+        executor.shutdown()
+    result = {"runs_per_s": runs / elapsed, "failures": failures}
+    result.update(summarize("spawn_to_exit", latencies))
+    return result
+
+
+def bench_output(size_mb: int) -> Dict[str, float]:
+    """单个执行写出 size_mb MB 输出，经过输出捕获与输出合并（有输出回调）"""
+    delivered = []
+    executor = TimedExecutor(max_concurrency=1)
+    try:
+        execution_id = executor.execute(1, OUTPUT_SCRIPT.format(size_mb=size_mb),
+                                        output_callback=delivered.append)
+        executor.wait_all([execution_id])
+        elapsed = executor.finished[execution_id] - executor.spawned[execution_id]
+    finally:
+        executor.shutdown()
+    return {
+        "output_mb_s": size_mb / elapsed,
+        "output_frames": len(delivered)
+    }
+
+
+def run(concurrency=(1, 10, 100), runs: int = 100, output_mb: int = 64) -> dict:
+    with workspace():
+        init_db()
+        result = {}
+        for level in concurrency:
+            for name, value in bench_concurrency(level, max(runs, level)).items():
+                result[f"c{level}_{name}"] = value
+        result.update(bench_output(output_mb))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="执行器基准测试")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--output-mb", type=int, default=64)
+    args = parser.parse_args()
+    print(json.dumps(run(args.concurrency, args.runs, args.output_mb), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+GUI 基准测试
+
+在无显示环境下测量脚本列表的加载（MainWindow.load_scripts 所用的 ScriptListModel）
+与语法高亮：
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/gui_benchmark.py --scripts 100000
+"""
+import argparse
+import json
+import os
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from common import workspace
+
+from PyQt6.QtWidgets import QApplication, QListView
+from database.db_manager import engine, init_db
+from gui.script_model import ScriptListModel
+
+import highlighter_benchmark
+from storage_benchmark import seed_scripts
+
+
+def bench_load_scripts(count: int) -> dict:
+    app = QApplication.instance() or QApplication([])
+    with workspace():
+        init_db()
+        seed_scripts(count)
+        model = ScriptListModel()
+        view = QListView()
+        view.setModel(model)
+        view.resize(300, 800)
+        view.show()
+
+        # 与 load_scripts 相同：重新加载后由视图请求第一批
+        started = time.perf_counter()
+        model.reload()
+        app.processEvents()
+        first_page = time.perf_counter() - started
+
+        # 一直滚动到末尾，加载全部脚本
+        started = time.perf_counter()
+        while model.canFetchMore():
+            model.fetchMore()
+        view.scrollToBottom()
+        app.processEvents()
+        all_rows = time.perf_counter() - started
+
+        rows = model.rowCount()
+        view.close()
+        view.deleteLater()
+        app.processEvents()
+        engine.dispose()
+    return {
+        "load_scripts_first_page_s": first_page,
+        "load_scripts_all_s": all_rows,
+        "load_scripts_rows": rows
+    }
+
+
+def run(scripts: int = 100000, lines: int = 50000, keystrokes: int = 100) -> dict:
+    result = bench_load_scripts(scripts)
+    for name, value in highlighter_benchmark.run(lines, keystrokes).items():
+        result[f"highlight_{name}"] = value
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GUI 基准测试")
+    parser.add_argument("--scripts", type=int, default=100000)
+    parser.add_argument("--lines", type=int, default=50000)
+    parser.add_argument("--keystrokes", type=int, default=100)
+    args = parser.parse_args()
+    print(json.dumps(run(args.scripts, args.lines, args.keystrokes), indent=2))
+
+
+if __name__ == "__main__":
+    main()
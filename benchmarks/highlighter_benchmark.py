@@ -0,0 +1,119 @@
+"""
+语法高亮基准测试
+
+生成一个大型 Python 文件，测量首次高亮的耗时，以及在文件不同位置输入字符时
+每次按键的高亮耗时与重新高亮的行数。可在无显示环境下运行：
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/highlighter_benchmark.py --lines 50000
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt6.QtGui import QTextCursor
+from PyQt6.QtWidgets import QApplication
+from gui.script_editor import PythonHighlighter, ScriptEditorWidget
+
+TEMPLATE = '''@decorator
+def function_{n}(value, factor=1.5e3):
+    """
+    Docstring for function {n} with 'quotes' and keywords if else
+    """
+    text = "string {n}" + 'other' if value else r'raw \\d+'  # comment {n}
+    for item in range(0x{n:x}):
+        value += len(str(item)) * factor
+    return value
+
+'''
+
+
+class CountingHighlighter(PythonHighlighter):
+    """统计 highlightBlock 的调用次数"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.calls = 0
+
+    def highlightBlock(self, text):
+        self.calls += 1
+        super().highlightBlock(text)
+
+
+def generate_source(lines: int) -> str:
+    parts = []
+    count = 0
+    n = 0
+    while count < lines:
+        chunk = TEMPLATE.format(n=n)
+        parts.append(chunk)
+        count += chunk.count("\n")
+        n += 1
+    return "".join(parts)
+
+
+def _percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent))]
+
+
+def run(lines: int = 50000, keystrokes: int = 200) -> dict:
+    app = QApplication.instance() or QApplication([])
+    widget = ScriptEditorWidget()
+    widget.highlighter.setDocument(None)
+    highlighter = CountingHighlighter(widget.editor.document())
+    widget.highlighter = highlighter
+
+    source = generate_source(lines)
+    started = time.perf_counter()
+    widget.set_content(source)
+    app.processEvents()
+    initial = time.perf_counter() - started
+
+    document = widget.editor.document()
+    result = {
+        "lines": document.blockCount(),
+        "initial_highlight_s": initial
+    }
+
+    # 在文件开头、中间与末尾输入字符
+    for name, fraction in (("start", 0.0), ("middle", 0.5), ("end", 0.999)):
+        block = document.findBlockByNumber(int(document.blockCount() * fraction))
+        cursor = QTextCursor(block)
+        cursor.movePosition(QTextCursor.MoveOperation.EndOfBlock)
+        latencies = []
+        highlighted = []
+        for i in range(keystrokes):
+            highlighter.calls = 0
+            started = time.perf_counter()
+            cursor.insertText("x" if i % 2 == 0 else " ")
+            latencies.append(time.perf_counter() - started)
+            highlighted.append(highlighter.calls)
+        result[f"keystroke_{name}_mean_ms"] = statistics.fmean(latencies) * 1000
+        result[f"keystroke_{name}_p95_ms"] = _percentile(latencies, 0.95) * 1000
+        result[f"keystroke_{name}_blocks"] = max(highlighted)
+
+    # 打开一个三引号字符串会使后面所有行的状态改变，这是必须重新高亮的最坏情况
+    cursor = QTextCursor(document.findBlockByNumber(document.blockCount() // 2))
+    highlighter.calls = 0
+    started = time.perf_counter()
+    cursor.insertText('"""')
+    result["open_string_s"] = time.perf_counter() - started
+    result["open_string_blocks"] = highlighter.calls
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="语法高亮基准测试")
+    parser.add_argument("--lines", type=int, default=50000)
+    parser.add_argument("--keystrokes", type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(run(args.lines, args.keystrokes), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+运行基准测试并与基线比较
+
+    python benchmarks/run.py                          # 全部套件，结果写入 benchmarks/results/latest.json
+    python benchmarks/run.py executor storage --quick # 指定套件，缩小规模
+    python benchmarks/run.py --update-baseline        # 把本次结果保存为基线
+
+结果中以 _s、_ms、_blocks 结尾的指标越小越好，以 _per_s、_mb_s 结尾的越大越好，
+其他字段（规模、计数）只做记录。任一指标比基线差超过 --tolerance 时以退出码 1 结束。
+基线与机器相关，应在同一台机器上生成和比较。
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from common import ROOT
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, "results", "latest.json")
+
+HIGHER_IS_BETTER = ("_per_s", "_mb_s")
+LOWER_IS_BETTER = ("_s", "_ms", "_blocks")
+
+# 套件名 -> (模块, 默认参数, --quick 参数)
+SUITES = {
+    "executor": ("executor_benchmark",
+                 {"concurrency": (1, 10, 100), "runs": 100, "output_mb": 64},
+                 {"concurrency": (1, 10), "runs": 20, "output_mb": 8}),
+    "storage": ("storage_benchmark",
+                {"sizes": (10000, 100000), "ops": 200},
+                {"sizes": (10000,), "ops": 50}),
+    "gui": ("gui_benchmark",
+            {"scripts": 100000, "lines": 50000, "keystrokes": 100},
+            {"scripts": 10000, "lines": 10000, "keystrokes": 20})
+}
+
+
+def direction(metric: str) -> int:
+    """1 表示越大越好，-1 表示越小越好，0 表示不比较"""
+    if metric.endswith(HIGHER_IS_BETTER):
+        return 1
+    if metric.endswith(LOWER_IS_BETTER):
+        return -1
+    return 0
+
+
+def run_suites(names: List[str], quick: bool) -> Dict[str, dict]:
+    results = {}
+    for name in names:
+        module_name, params, quick_params = SUITES[name]
+        try:
+            module = __import__(module_name)
+        except ImportError as e:
+            print(f"[{name}] skipped: {e}", file=sys.stderr)
+            continue
+        print(f"[{name}] running...", file=sys.stderr)
+        started = time.perf_counter()
+        results[name] = module.run(**(quick_params if quick else params))
+        print(f"[{name}] done in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict],
+            tolerance: float) -> List[str]:
+    """返回超出容差的退化描述"""
+    regressions = []
+    for suite, metrics in results.items():
+        base_metrics = baseline.get(suite, {})
+        for metric, value in metrics.items():
+            sign = direction(metric)
+            base = base_metrics.get(metric)
+            if not sign or not isinstance(base, (int, float)) or base <= 0:
+                continue
+            change = (value - base) / base
+            if -sign * change > tolerance:
+                regressions.append(f"{suite}.{metric}: {base:.4g} -> {value:.4g} "
+                                   f"({change:+.1%})")
+    return regressions
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count()
+    }
+
+
+def _load(path: str) -> Optional[dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save(path: str, data: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="运行基准测试并与基线比较")
+    parser.add_argument("suites", nargs="*", help=f"要运行的套件（{', '.join(SUITES)}），默认全部")
+    parser.add_argument("--quick", action="store_true", help="使用较小的规模")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="允许的相对退化，默认 0.2（20%%）")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    names = args.suites or list(SUITES)
+    unknown = [name for name in names if name not in SUITES]
+    if unknown:
+        parser.error(f"unknown suites: {', '.join(unknown)}")
+    report = {
+        "environment": environment(),
+        "quick": args.quick,
+        "results": run_suites(names, args.quick)
+    }
+    _save(args.output, report)
+    print(json.dumps(report, indent=2, sort_keys=True))
+
+    if args.update_baseline:
+        _save(args.baseline, report)
+        print(f"Baseline saved to {args.baseline}", file=sys.stderr)
+        return
+
+    baseline = _load(args.baseline)
+    if baseline is None:
+        print("No baseline, run with --update-baseline to create one", file=sys.stderr)
+        return
+    if baseline.get("quick") != args.quick:
+        print("Baseline was recorded with a different --quick setting", file=sys.stderr)
+        sys.exit(2)
+    regressions = compare(report["results"], baseline.get("results", {}), args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+    print("No regressions", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+存储基准测试
+
+在预先写入 10k/100k 个脚本的数据库上测量 ScriptManager 的创建、更新、分页列表与搜索延迟：
+
+    python benchmarks/storage_benchmark.py --sizes 10000 100000
+"""
+import argparse
+import json
+import random
+import time
+from typing import Dict
+
+from common import summarize, workspace
+
+from sqlalchemy import insert
+from core.script_manager import ScriptManager
+from database.db_manager import SessionLocal, engine, init_db
+from database.models import Script
+
+WORDS = ("report", "backup", "sync", "export", "clean", "daily", "invoice", "metrics",
+         "deploy", "archive", "parse", "upload", "notify", "resize", "migrate", "audit")
+
+CONTENT = '''import os
+import sys
+
+
+def {name}(path):
+    """{description}"""
+    total = 0
+    for entry in os.listdir(path):
+        total += len(entry)
+    return total
+
+
+if __name__ == "__main__":
+    print({name}(sys.argv[1] if len(sys.argv) > 1 else "."))
+'''
+
+
+def _script_row(rng: random.Random, n: int) -> dict:
+    words = rng.sample(WORDS, 3)
+    name = "_".join(words) + f"_{n}"
+    description = f"{words[0]} {words[1]} job number {n} for {words[2]}"
+    return {
+        "name": name,
+        "description": description,
+        "type": rng.choice(("python", "python", "python", "shell")),
+        "content": CONTENT.format(name=name, description=description)
+    }
+
+
+def seed_scripts(count: int, seed: int = 0, batch_size: int = 5000):
+    """批量写入 count 个脚本（全文索引由触发器同步），内容由固定种子生成"""
+    rng = random.Random(seed)
+    with engine.begin() as connection:
+        for start in range(0, count, batch_size):
+            rows = [_script_row(rng, n) for n in range(start, min(count, start + batch_size))]
+            connection.execute(insert(Script), rows)
+
+
+def bench_size(count: int, ops: int) -> Dict[str, float]:
+    result = {}
+    started = time.perf_counter()
+    seed_scripts(count)
+    result["seed_s"] = time.perf_counter() - started
+
+    rng = random.Random(1)
+    db = SessionLocal()
+    try:
+        manager = ScriptManager(db)
+
+        latencies = []
+        created = []
+        for n in range(ops):
+            row = _script_row(rng, count + n)
+            started = time.perf_counter()
+            script = manager.create_script(row["name"], row["content"], row["type"],
+                                           row["description"])
+            latencies.append(time.perf_counter() - started)
+            created.append(script.id)
+        result.update(summarize("create", latencies))
+
+        latencies = []
+        for _ in range(ops):
+            script_id = rng.randint(1, count)
+            started = time.perf_counter()
+            manager.update_script(script_id, CONTENT.format(name=f"updated_{script_id}",
+                                                            description="updated"))
+            latencies.append(time.perf_counter() - started)
+        result.update(summarize("update", latencies))
+
+        latencies = []
+        for _ in range(ops):
+            after_id = rng.randint(0, count)
+            started = time.perf_counter()
+            manager.list_scripts(500, after_id=after_id or None)
+            latencies.append(time.perf_counter() - started)
+        result.update(summarize("list_page", latencies))
+
+        # 按页遍历全部脚本
+        started = time.perf_counter()
+        after_id = None
+        while True:
+            rows = manager.list_scripts(500, after_id=after_id)
+            if not rows:
+                break
+            after_id = rows[-1][0]
+        result["list_all_s"] = time.perf_counter() - started
+
+        latencies = []
+        for _ in range(ops):
+            query = " ".join(rng.sample(WORDS, rng.randint(1, 2)))
+            started = time.perf_counter()
+            manager.search_scripts(query)
+            latencies.append(time.perf_counter() - started)
+        result.update(summarize("search", latencies))
+    finally:
+        db.close()
+    return result
+
+
+def run(sizes=(10000, 100000), ops: int = 200) -> dict:
+    result = {}
+    for count in sizes:
+        # 每个规模使用新的数据库
+        with workspace():
+            init_db()
+            for name, value in bench_size(count, ops).items():
+                result[f"n{count}_{name}"] = value
+            engine.dispose()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="存储基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--ops", type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(run(args.sizes, args.ops), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,810 @@
+"""
+无界面的命令行批量运行器
+
+    python main.py list [--type python] [--tag daily]
+    python main.py run 3 backup_db --tag daily -j 4 --param ENV=prod --json
+    python main.py run analyze --input data=/data/events.bin
+    python main.py tag 3 daily report
+    python main.py records 42 --kind metric
+    python main.py cache on 3
+    python main.py pipeline add etl.json && python main.py pipeline run etl -j 4
+    python main.py sweep run train grid.csv -j 8 --batch 20
+    python main.py serve [--port 8765 | --socket /run/script-runner.sock]
+    python main.py coordinator [--port 8766] [--api-port 8765]
+    python main.py worker --connect 10.0.0.5:8766 --slots 8
+    python main.py schedule add backup_db --cron "0 3 * * *" --jitter 300
+    python main.py scheduler -j 8
+
+只导入 core 与 database，不依赖 PyQt，可在没有显示器的服务器、cron 与 CI 中使用。
+run 的退出码：全部执行成功为 0，有执行失败为 1，找不到脚本为 2，被中断为 130。
+"""
+import argparse
+import asyncio
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, TextIO
+
+from core.config import Config
+from core.executor import ScriptExecutor
+from core.history_retention import HistoryRetention
+from core.script_manager import ScriptManager
+from database.db_manager import SessionLocal, init_db
+from database.models import ScriptExecution
+
+PAGE_SIZE = 500
+
+
+class _OutputPrinter:
+    """把各执行的输出帧按行加上前缀后写出，多个执行的输出不会交错在同一行"""
+
+    def __init__(self, stream: TextIO):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def callback(self, prefix: str):
+        def write(text: str):
+            lines = "".join(f"{prefix}{line}\n" for line in text.splitlines())
+            with self._lock:
+                self.stream.write(lines)
+                self.stream.flush()
+        return write
+
+
+def _parse_parameters(values: List[str]) -> Dict[str, str]:
+    parameters = {}
+    for value in values:
+        name, sep, content = value.partition("=")
+        if not sep or not name:
+            raise argparse.ArgumentTypeError(f"Invalid parameter {value!r}, expected NAME=VALUE")
+        parameters[name] = content
+    return parameters
+
+
+def command_list(args) -> int:
+    db = SessionLocal()
+    try:
+        manager = ScriptManager(db)
+        after_id = None
+        while True:
+            rows = manager.list_scripts(PAGE_SIZE, after_id=after_id,
+                                        script_type=args.type, tag=args.tag)
+            for script_id, name, script_type in rows:
+                if args.json:
+                    print(json.dumps({"id": script_id, "name": name, "type": script_type},
+                                     ensure_ascii=False))
+                else:
+                    print(f"{script_id}\t{script_type}\t{name}")
+            if len(rows) < PAGE_SIZE:
+                return 0
+            after_id = rows[-1][0]
+    finally:
+        db.close()
+
+
+def command_tag(args) -> int:
+    db = SessionLocal()
+    try:
+        ScriptManager(db).set_tags(args.script_id, args.tags)
+        return 0
+    finally:
+        db.close()
+
+
+def command_cache(args) -> int:
+    db = SessionLocal()
+    try:
+        manager = ScriptManager(db)
+        if args.action == "clear":
+            print(manager.clear_result_cache(args.script))
+            return 0
+        try:
+            manager.set_cacheable(args.script_id, args.action == "on")
+        except ValueError as e:
+            print(str(e), file=sys.stderr)
+            return 2
+        return 0
+    finally:
+        db.close()
+
+
+def command_records(args) -> int:
+    db = SessionLocal()
+    try:
+        manager = ScriptManager(db)
+        if args.script:
+            if not args.name:
+                print("--script needs --name", file=sys.stderr)
+                return 2
+            selector = args.script
+            scripts = manager.find_scripts([int(selector)] if selector.isdigit() else None,
+                                           None if selector.isdigit() else [selector])
+            if len(scripts) != 1:
+                print(f"Script {selector!r} not found or ambiguous", file=sys.stderr)
+                return 2
+            for execution_id, finished_at, value, data in manager.get_record_history(
+                    scripts[0].id, args.name, args.kind or "result", args.limit):
+                if args.json:
+                    print(json.dumps(dict(json.loads(data), execution_id=execution_id,
+                                          finished_at=finished_at.isoformat()
+                                          if finished_at else None), ensure_ascii=False))
+                else:
+                    shown = value if value is not None else json.loads(data).get("value")
+                    print(f"{execution_id}\t{finished_at or '-'}\t{shown}")
+            return 0
+        if args.execution_id is None:
+            print("Give an execution id or --script", file=sys.stderr)
+            return 2
+        for record in manager.get_execution_records(args.execution_id, args.kind, args.name,
+                                                    args.limit):
+            if args.json:
+                print(record.data)
+                continue
+            fields = json.loads(record.data)
+            detail = {key: value for key, value in fields.items()
+                      if key not in ("kind", "name", "value", "step")}
+            step = f"@{record.step}" if record.step is not None else ""
+            print(f"{record.kind}\t{record.name or '-'}{step}\t{fields.get('value', '')}"
+                  + (f"\t{json.dumps(detail, ensure_ascii=False)}" if detail else ""))
+        return 0
+    finally:
+        db.close()
+
+
+def command_run(args) -> int:
+    try:
+        parameters = _parse_parameters(args.param)
+        inputs = _parse_parameters(args.input)
+    except argparse.ArgumentTypeError as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    for path in inputs.values():
+        if not os.path.isfile(path):
+            print(f"Input file not found: {path}", file=sys.stderr)
+            return 2
+
+    ids = [int(selector) for selector in args.scripts if selector.isdigit()]
+    names = [selector for selector in args.scripts if not selector.isdigit()]
+    db = SessionLocal()
+    try:
+        manager = ScriptManager(db)
+        if not (ids or names or args.tag):
+            print("No scripts selected, give ids, names or --tag", file=sys.stderr)
+            return 2
+        scripts = manager.find_scripts(ids, names, args.tag, args.type)
+        missing = set(ids) - {script.id for script in scripts}
+        missing |= set(names) - {script.name for script in scripts}
+        if missing:
+            print(f"Scripts not found: {', '.join(map(str, sorted(missing, key=str)))}",
+                  file=sys.stderr)
+            return 2
+        jobs = [(script.id, script.name, script.content, manager.get_resource_limits(script.id),
+                 bool(script.cacheable)) for script in scripts]
+    finally:
+        db.close()
+
+    config = Config()
+    timeout = args.timeout or config.get_system_config("max_execution_time", 3600)
+    executor = ScriptExecutor(max_concurrency=args.jobs)
+    # --json 时标准输出只输出结果，脚本输出写到标准错误
+    printer = None if args.quiet else _OutputPrinter(sys.stderr if args.json else sys.stdout)
+    finished: "queue.SimpleQueue" = queue.SimpleQueue()
+    names_by_execution = {}
+
+    def on_finished(execution_id: int, status: str, exit_code: Optional[int]):
+        finished.put((execution_id, status, exit_code))
+
+    failures = 0
+    pending = set()
+    try:
+        for script_id, name, content, limits, cacheable in jobs:
+            prefix = f"[{name}] " if len(jobs) > 1 else ""
+            execution_id = executor.execute(
+                script_id, content, parameters, timeout,
+                output_callback=printer.callback(prefix) if printer else None,
+                limits=limits, finished_callback=on_finished, cacheable=cacheable,
+                attachments=inputs
+            )
+            names_by_execution[execution_id] = (script_id, name)
+            pending.add(execution_id)
+
+        db = SessionLocal()
+        try:
+            while pending:
+                execution_id, status, exit_code = finished.get()
+                pending.discard(execution_id)
+                if status != "completed":
+                    failures += 1
+                _report(db, executor, execution_id, names_by_execution[execution_id],
+                        status, exit_code, args.json)
+        finally:
+            db.close()
+    except KeyboardInterrupt:
+        for execution_id in pending:
+            executor.stop_execution(execution_id)
+        print("Interrupted", file=sys.stderr)
+        return 130
+    finally:
+        executor.shutdown()
+    return 1 if failures else 0
+
+
+def command_schedule(args) -> int:
+    db = SessionLocal()
+    try:
+        manager = ScriptManager(db)
+        if args.action == "add":
+            try:
+                parameters = _parse_parameters(args.param)
+            except argparse.ArgumentTypeError as e:
+                print(str(e), file=sys.stderr)
+                return 2
+            selector = args.script
+            scripts = manager.find_scripts([int(selector)] if selector.isdigit() else None,
+                                           None if selector.isdigit() else [selector])
+            if len(scripts) != 1:
+                print(f"Script {selector!r} not found or ambiguous", file=sys.stderr)
+                return 2
+            try:
+                schedule = manager.add_schedule(scripts[0].id, args.cron, args.every, parameters,
+                                                args.misfire, args.jitter, args.timeout,
+                                                args.priority)
+            except ValueError as e:
+                print(str(e), file=sys.stderr)
+                return 2
+            print(schedule.id)
+        elif args.action == "list":
+            after_id = None
+            while True:
+                schedules = manager.list_schedules(args.script, PAGE_SIZE, after_id)
+                for schedule in schedules:
+                    _print_schedule(schedule, args.json)
+                if len(schedules) < PAGE_SIZE:
+                    break
+                after_id = schedules[-1].id
+        else:
+            try:
+                if args.action == "remove":
+                    manager.delete_schedule(args.schedule_id)
+                else:
+                    manager.set_schedule_enabled(args.schedule_id, args.action == "enable")
+            except ValueError as e:
+                print(str(e), file=sys.stderr)
+                return 2
+        return 0
+    finally:
+        db.close()
+
+
+def _print_schedule(schedule, as_json: bool):
+    trigger = schedule.cron or f"every {schedule.interval}s"
+    next_run = schedule.next_run_at.isoformat(timespec="seconds") if schedule.next_run_at else None
+    if as_json:
+        print(json.dumps({"id": schedule.id, "script_id": schedule.script_id,
+                          "cron": schedule.cron, "interval": schedule.interval,
+                          "misfire_policy": schedule.misfire_policy, "jitter": schedule.jitter,
+                          "enabled": bool(schedule.enabled), "next_run_at": next_run},
+                         ensure_ascii=False))
+    else:
+        state = "" if schedule.enabled else "\tdisabled"
+        print(f"{schedule.id}\t{schedule.script_id}\t{trigger}\t{schedule.misfire_policy}"
+              f"\t{next_run}{state}")
+
+
+def command_scheduler(args) -> int:
+    from core.scheduler import Scheduler
+
+    executor = ScriptExecutor(max_concurrency=args.jobs)
+    scheduler = Scheduler(executor)
+    scheduler.start()
+    retention = _start_retention()
+    print(f"Scheduler running with {scheduler.schedule_count} schedules", file=sys.stderr)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        retention.stop()
+        scheduler.stop()
+        executor.shutdown()
+    return 0
+
+
+def _start_retention(session_factory=SessionLocal) -> HistoryRetention:
+    """长期运行的命令与图形界面一样定期清理执行历史"""
+    retention = HistoryRetention(session_factory)
+    retention.start()
+    return retention
+
+
+def _start_scheduler(args, executor):
+    """serve 与 coordinator 的 --scheduler 选项：在同一进程中运行定时计划"""
+    if not args.scheduler:
+        return None
+    from core.scheduler import Scheduler
+
+    scheduler = Scheduler(executor)
+    scheduler.start()
+    return scheduler
+
+
+def command_serve(args) -> int:
+    from api.server import APIServer
+    
+    config = Config()
+    executor = ScriptExecutor()
+    scheduler = _start_scheduler(args, executor)
+    server = APIServer(
+        executor,
+        host=args.host or config.get_system_config("api_host", "127.0.0.1"),
+        port=args.port if args.port is not None else config.get_system_config("api_port", 8765),
+        socket_path=args.socket or config.get_system_config("api_socket"),
+        token=config.get_system_config("api_token"),
+        max_client_buffer=config.get_system_config("api_client_buffer", 262144)
+    )
+    retention = _start_retention()
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        retention.stop()
+        if scheduler:
+            scheduler.stop()
+        executor.shutdown()
+    return 0
+
+
+def command_coordinator(args) -> int:
+    from api.server import APIServer
+    from distributed.coordinator import Coordinator
+
+    config = Config()
+    coordinator = Coordinator(
+        host=args.host, port=args.port,
+        socket_path=args.socket or config.get_system_config("coordinator_socket"),
+        token=config.get_system_config("coordinator_token")
+    )
+    # 通过本地 API 服务提交与观察执行，由工作节点运行
+    server = APIServer(
+        coordinator,
+        host=config.get_system_config("api_host", "127.0.0.1"),
+        port=args.api_port if args.api_port is not None else config.get_system_config("api_port", 8765),
+        socket_path=args.api_socket or config.get_system_config("api_socket"),
+        token=config.get_system_config("api_token"),
+        max_client_buffer=config.get_system_config("api_client_buffer", 262144)
+    )
+
+    scheduler = None
+
+    async def serve():
+        nonlocal scheduler
+        await coordinator.start()
+        # 协调器的 execute 需要事件循环已运行
+        scheduler = _start_scheduler(args, coordinator)
+        try:
+            await server.serve_forever()
+        finally:
+            await coordinator.stop()
+
+    retention = _start_retention()
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        retention.stop()
+        if scheduler:
+            scheduler.stop()
+        coordinator.shutdown()
+    return 0
+
+
+def command_worker(args) -> int:
+    from distributed.worker import Worker
+
+    config = Config()
+    host, port = None, None
+    if args.connect:
+        host, _, port = args.connect.rpartition(":")
+        if not host or not port.isdigit():
+            print(f"Invalid address {args.connect!r}, expected HOST:PORT", file=sys.stderr)
+            return 2
+        port = int(port)
+    worker = Worker(host=host, port=port,
+                    socket_path=args.socket or config.get_system_config("coordinator_socket"),
+                    worker_id=args.id, slots=args.slots, prefetch=args.prefetch,
+                    token=config.get_system_config("coordinator_token"), work_dir=args.dir)
+    # 工作节点的执行记录在自己的数据库中
+    retention = _start_retention(worker.session_factory)
+    try:
+        asyncio.run(worker.run())
+    except KeyboardInterrupt:
+        pass
+    except PermissionError as e:
+        print(f"Registration rejected: {str(e)}", file=sys.stderr)
+        return 1
+    finally:
+        retention.stop()
+        worker.shutdown()
+    return 0
+
+
+def command_pipeline(args) -> int:
+    db = SessionLocal()
+    try:
+        manager = ScriptManager(db)
+        if args.action == "add":
+            try:
+                with open(args.file, encoding="utf-8") as f:
+                    definition = json.load(f)
+                pipeline = manager.create_pipeline(definition["name"], definition["stages"],
+                                                   definition.get("description", ""))
+            except (OSError, KeyError, TypeError, ValueError) as e:
+                print(f"Invalid pipeline {args.file}: {str(e)}", file=sys.stderr)
+                return 2
+            print(pipeline.id)
+            return 0
+        if args.action == "list":
+            for pipeline in manager.list_pipelines():
+                stages = json.loads(pipeline.stages)
+                if args.json:
+                    print(json.dumps({"id": pipeline.id, "name": pipeline.name,
+                                      "stages": stages}, ensure_ascii=False))
+                else:
+                    print(f"{pipeline.id}\t{pipeline.name}\t{len(stages)} stages")
+            return 0
+        if args.action == "status":
+            run, executions = manager.get_pipeline_run(args.run_id)
+            if run is None:
+                print(f"Pipeline run {args.run_id} not found", file=sys.stderr)
+                return 2
+            _print_pipeline_run(run, executions, args.json)
+            return 0
+        pipeline = manager.find_pipeline(args.pipeline)
+        if pipeline is None:
+            print(f"Pipeline {args.pipeline!r} not found", file=sys.stderr)
+            return 2
+        if args.action == "remove":
+            manager.delete_pipeline(pipeline.id)
+            return 0
+    finally:
+        db.close()
+    return _run_pipeline(args, pipeline.id)
+
+
+def _run_pipeline(args, pipeline_id: int) -> int:
+    from core.pipeline import PipelineRunner
+
+    try:
+        parameters = _parse_parameters(args.param)
+    except argparse.ArgumentTypeError as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    executor = ScriptExecutor(max_concurrency=args.jobs)
+    runner = PipelineRunner(executor)
+    printer = None if args.quiet else _OutputPrinter(sys.stderr if args.json else sys.stdout)
+    finished: "queue.SimpleQueue" = queue.SimpleQueue()
+    writers = {}
+
+    def on_output(stage: str, text: str):
+        if stage not in writers:
+            writers[stage] = printer.callback(f"[{stage}] ")
+        writers[stage](text)
+
+    run_id = None
+    try:
+        run_id = runner.run(
+            pipeline_id, parameters, output_callback=on_output if printer else None,
+            finished_callback=lambda finished_run, status: finished.put(status)
+        )
+        status = finished.get()
+        executor.writer.flush()
+        db = SessionLocal()
+        try:
+            run, executions = ScriptManager(db).get_pipeline_run(run_id)
+            _print_pipeline_run(run, executions, args.json)
+        finally:
+            db.close()
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    except KeyboardInterrupt:
+        if run_id is not None:
+            runner.stop(run_id)
+        print("Interrupted", file=sys.stderr)
+        return 130
+    finally:
+        executor.shutdown()
+    return 0 if status == "completed" else 1
+
+
+def _print_pipeline_run(run, executions, as_json: bool):
+    stages = []
+    for execution in executions:
+        duration = None
+        if execution.started_at and execution.finished_at:
+            duration = round((execution.finished_at - execution.started_at).total_seconds(), 3)
+        stages.append({"stage": execution.stage, "execution_id": execution.id,
+                       "script_id": execution.script_id, "status": execution.status,
+                       "exit_code": execution.exit_code, "duration_s": duration})
+    if as_json:
+        print(json.dumps({"run_id": run.id, "pipeline_id": run.pipeline_id, "status": run.status,
+                          "stages": stages}, ensure_ascii=False), flush=True)
+        return
+    for stage in stages:
+        print(f"{stage['stage']}: {stage['status']} (exit code {stage['exit_code']}, "
+              f"{stage['duration_s']}s)")
+    print(f"Pipeline run {run.id}: {run.status}", flush=True)
+
+
+def command_sweep(args) -> int:
+    from core.sweep import SweepRunner
+
+    db = SessionLocal()
+    try:
+        manager = ScriptManager(db)
+        if args.action == "status":
+            sweep = manager.get_sweep(args.sweep_id)
+            if sweep is None:
+                print(f"Sweep {args.sweep_id} not found", file=sys.stderr)
+                return 2
+            _print_sweep(sweep, manager.get_sweep_status_counts(sweep.id), args.json)
+            return 0
+        if args.action == "run":
+            try:
+                parameters = _parse_parameters(args.param)
+            except argparse.ArgumentTypeError as e:
+                print(str(e), file=sys.stderr)
+                return 2
+            selector = args.script
+            scripts = manager.find_scripts([int(selector)] if selector.isdigit() else None,
+                                           None if selector.isdigit() else [selector])
+            if len(scripts) != 1:
+                print(f"Script {selector!r} not found or ambiguous", file=sys.stderr)
+                return 2
+            if not os.path.isfile(args.file):
+                print(f"Parameter file {args.file} not found", file=sys.stderr)
+                return 2
+            script_id = scripts[0].id
+    finally:
+        db.close()
+
+    executor = ScriptExecutor(max_concurrency=args.jobs)
+    runner = SweepRunner(executor)
+    last_report = [0.0]
+
+    def on_progress(completed: int, failed: int, total: int):
+        if args.quiet or time.monotonic() - last_report[0] < 1:
+            return
+        last_report[0] = time.monotonic()
+        print(f"{completed + failed}/{total}+ done, {failed} failed", file=sys.stderr, flush=True)
+
+    sweep_id = args.sweep_id if args.action == "resume" else None
+    try:
+        if sweep_id is None:
+            sweep_id = runner.create(script_id, args.file, parameters, args.batch, args.attempts)
+            print(f"Sweep {sweep_id}", file=sys.stderr, flush=True)
+        status = runner.run(sweep_id, timeout=args.timeout, progress_callback=on_progress)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    except KeyboardInterrupt:
+        if sweep_id is not None:
+            print(f"Interrupted, continue with: python main.py sweep resume {sweep_id}",
+                  file=sys.stderr)
+        return 130
+    finally:
+        executor.shutdown()
+
+    db = SessionLocal()
+    try:
+        manager = ScriptManager(db)
+        _print_sweep(manager.get_sweep(sweep_id), manager.get_sweep_status_counts(sweep_id),
+                     args.json)
+    finally:
+        db.close()
+    return 0 if status == "completed" else 1
+
+
+def _print_sweep(sweep, counts: Dict[str, int], as_json: bool):
+    if as_json:
+        print(json.dumps({"sweep_id": sweep.id, "script_id": sweep.script_id,
+                          "status": sweep.status, "total": sweep.total, "items": counts,
+                          "output_file": sweep.output_file}, ensure_ascii=False), flush=True)
+        return
+    summary = ", ".join(f"{count} {status}" for status, count in sorted(counts.items()))
+    print(f"Sweep {sweep.id}: {sweep.status} ({summary or 'nothing done'} of {sweep.total})")
+    print(f"Results: {sweep.output_file}", flush=True)
+
+
+def _report(db, executor: ScriptExecutor, execution_id: int, script: tuple,
+            status: str, exit_code: Optional[int], as_json: bool):
+    """输出一条执行结果，时间与资源占用取自执行记录"""
+    # 结束回调之前提交的记录更新写入后再读取
+    executor.writer.flush()
+    # 结束上一次读取的事务，读到最新的提交
+    db.rollback()
+    execution = db.get(ScriptExecution, execution_id)
+    duration = None
+    if execution and execution.started_at and execution.finished_at:
+        duration = round((execution.finished_at - execution.started_at).total_seconds(), 3)
+    script_id, name = script
+    result = {
+        "execution_id": execution_id,
+        "script_id": script_id,
+        "name": name,
+        "status": status,
+        "exit_code": exit_code,
+        "duration_s": duration,
+        "cpu_time": execution.cpu_time if execution else None,
+        "peak_rss": execution.peak_rss if execution else None,
+        "output_file": execution.output_file if execution else None
+    }
+    if as_json:
+        # 脚本通过结构化记录通道报告的结果值，同名结果取最后一次
+        result["results"] = {
+            record.name: json.loads(record.data).get("value")
+            for record in ScriptManager(db).get_execution_records(execution_id, "result")
+            if record.name is not None
+        }
+        print(json.dumps(result, ensure_ascii=False), flush=True)
+    else:
+        print(f"{name}: {status} (exit code {exit_code}, {duration}s)", flush=True)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="main.py", description="Script Tool Box 命令行模式")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = commands.add_parser("list", help="列出脚本")
+    list_parser.add_argument("--type", help="按脚本类型过滤")
+    list_parser.add_argument("--tag", help="按标签过滤")
+    list_parser.add_argument("--json", action="store_true", help="每行输出一个 JSON 对象")
+    list_parser.set_defaults(handler=command_list)
+
+    run_parser = commands.add_parser("run", help="运行一个或多个脚本")
+    run_parser.add_argument("scripts", nargs="*", help="脚本ID或名称")
+    run_parser.add_argument("--tag", action="append", default=[], help="运行带有该标签的脚本，可重复")
+    run_parser.add_argument("--type", help="只运行该类型的脚本")
+    run_parser.add_argument("-j", "--jobs", type=int, default=1, help="并行执行数")
+    run_parser.add_argument("--param", action="append", default=[], metavar="NAME=VALUE",
+                            help="脚本参数（环境变量），可重复")
+    run_parser.add_argument("--input", action="append", default=[], metavar="NAME=PATH",
+                            help="输入附件，脚本通过 script_inputs 模块直接映射文件，可重复")
+    run_parser.add_argument("--timeout", type=int, help="每个执行的超时时间（秒）")
+    run_parser.add_argument("-q", "--quiet", action="store_true", help="不输出脚本的输出")
+    run_parser.add_argument("--json", action="store_true",
+                            help="以 JSON Lines 输出每个执行的结果")
+    run_parser.set_defaults(handler=command_run)
+
+    serve_parser = commands.add_parser("serve", help="启动本地 API 服务")
+    serve_parser.add_argument("--host", help="监听地址，默认 127.0.0.1")
+    serve_parser.add_argument("--port", type=int, help="监听端口")
+    serve_parser.add_argument("--socket", help="改为监听 Unix socket")
+    serve_parser.add_argument("--scheduler", action="store_true", help="同时运行定时计划")
+    serve_parser.set_defaults(handler=command_serve)
+
+    coordinator_parser = commands.add_parser("coordinator",
+                                             help="启动分布式协调器与本地 API 服务")
+    coordinator_parser.add_argument("--host", help="工作节点连接的监听地址，默认 127.0.0.1")
+    coordinator_parser.add_argument("--port", type=int, help="工作节点连接的端口")
+    coordinator_parser.add_argument("--socket", help="改为在 Unix socket 上接受工作节点")
+    coordinator_parser.add_argument("--api-port", type=int, help="API 服务端口")
+    coordinator_parser.add_argument("--api-socket", help="API 服务改为监听 Unix socket")
+    coordinator_parser.add_argument("--scheduler", action="store_true",
+                                    help="同时运行定时计划，交给工作节点执行")
+    coordinator_parser.set_defaults(handler=command_coordinator)
+
+    worker_parser = commands.add_parser("worker", help="作为工作节点连接协调器并运行脚本")
+    worker_parser.add_argument("--connect", metavar="HOST:PORT", help="协调器地址")
+    worker_parser.add_argument("--socket", help="通过 Unix socket 连接协调器")
+    worker_parser.add_argument("--slots", type=int, help="并行执行数")
+    worker_parser.add_argument("--prefetch", type=int, help="执行槽之外预先领取的执行数")
+    worker_parser.add_argument("--id", help="工作节点ID，默认为 主机名-进程号")
+    worker_parser.add_argument("--dir", help="本地执行记录与输出目录")
+    worker_parser.set_defaults(handler=command_worker)
+
+    schedule_parser = commands.add_parser("schedule", help="管理定时计划")
+    schedule_actions = schedule_parser.add_subparsers(dest="action", required=True)
+    add_parser = schedule_actions.add_parser("add", help="添加定时计划")
+    add_parser.add_argument("script", help="脚本ID或名称")
+    trigger = add_parser.add_mutually_exclusive_group(required=True)
+    trigger.add_argument("--cron", help="cron 表达式，如 \"*/5 * * * *\"")
+    trigger.add_argument("--every", type=int, metavar="SECONDS", help="固定间隔（秒）")
+    add_parser.add_argument("--misfire", default="coalesce",
+                            help="错过运行时的策略：skip、coalesce（默认）或 catch_up")
+    add_parser.add_argument("--jitter", type=int, default=0, metavar="SECONDS",
+                            help="每次运行随机推迟的最大秒数")
+    add_parser.add_argument("--param", action="append", default=[], metavar="NAME=VALUE",
+                            help="脚本参数（环境变量），可重复")
+    add_parser.add_argument("--timeout", type=int, help="每次执行的超时时间（秒）")
+    add_parser.add_argument("--priority", type=int, default=0)
+    schedule_list_parser = schedule_actions.add_parser("list", help="列出定时计划")
+    schedule_list_parser.add_argument("--script", type=int, help="只列出该脚本的计划")
+    schedule_list_parser.add_argument("--json", action="store_true")
+    for action, help_text in (("enable", "启用定时计划"), ("disable", "停用定时计划"),
+                              ("remove", "删除定时计划")):
+        action_parser = schedule_actions.add_parser(action, help=help_text)
+        action_parser.add_argument("schedule_id", type=int)
+    schedule_parser.set_defaults(handler=command_schedule)
+
+    scheduler_parser = commands.add_parser("scheduler", help="运行定时计划")
+    scheduler_parser.add_argument("-j", "--jobs", type=int, help="并行执行数")
+    scheduler_parser.set_defaults(handler=command_scheduler)
+
+    tag_parser = commands.add_parser("tag", help="设置脚本标签")
+    tag_parser.add_argument("script_id", type=int)
+    tag_parser.add_argument("tags", nargs="*", help="标签，为空时清除")
+    tag_parser.set_defaults(handler=command_tag)
+
+    records_parser = commands.add_parser("records", help="查看脚本通过结构化记录通道发出的记录")
+    records_parser.add_argument("execution_id", type=int, nargs="?", help="执行ID")
+    records_parser.add_argument("--script", help="改为列出该脚本最近各次执行中 --name 记录的值")
+    records_parser.add_argument("--kind", help="记录类型，如 metric、result（--script 时默认为 result）")
+    records_parser.add_argument("--name", help="记录名")
+    records_parser.add_argument("--limit", type=int, default=100, help="最多输出的条数")
+    records_parser.add_argument("--json", action="store_true", help="每行输出一条记录的 JSON")
+    records_parser.set_defaults(handler=command_records)
+
+    cache_parser = commands.add_parser("cache", help="管理结果缓存")
+    cache_actions = cache_parser.add_subparsers(dest="action", required=True)
+    for action, help_text in (("on", "脚本的结果只取决于内容与参数，相同的执行复用结果"),
+                              ("off", "不缓存脚本的结果")):
+        action_parser = cache_actions.add_parser(action, help=help_text)
+        action_parser.add_argument("script_id", type=int)
+    clear_parser = cache_actions.add_parser("clear", help="清除缓存的结果")
+    clear_parser.add_argument("--script", type=int, help="只清除该脚本的结果")
+    cache_parser.set_defaults(handler=command_cache)
+
+    pipeline_parser = commands.add_parser("pipeline", help="管理与运行流水线")
+    pipeline_actions = pipeline_parser.add_subparsers(dest="action", required=True)
+    pipeline_add_parser = pipeline_actions.add_parser(
+        "add", help="从 JSON 文件添加流水线：{\"name\", \"stages\": [...]}")
+    pipeline_add_parser.add_argument("file")
+    pipeline_list_parser = pipeline_actions.add_parser("list", help="列出流水线")
+    pipeline_list_parser.add_argument("--json", action="store_true")
+    pipeline_run_parser = pipeline_actions.add_parser("run", help="运行流水线")
+    pipeline_run_parser.add_argument("pipeline", help="流水线ID或名称")
+    pipeline_run_parser.add_argument("-j", "--jobs", type=int, default=4, help="并行执行数")
+    pipeline_run_parser.add_argument("--param", action="append", default=[], metavar="NAME=VALUE",
+                                     help="传给每个阶段的参数，可重复")
+    pipeline_run_parser.add_argument("-q", "--quiet", action="store_true", help="不输出阶段的输出")
+    pipeline_run_parser.add_argument("--json", action="store_true", help="以 JSON 输出运行结果")
+    pipeline_status_parser = pipeline_actions.add_parser("status", help="查看流水线运行的各阶段状态")
+    pipeline_status_parser.add_argument("run_id", type=int)
+    pipeline_status_parser.add_argument("--json", action="store_true")
+    pipeline_remove_parser = pipeline_actions.add_parser("remove", help="删除流水线")
+    pipeline_remove_parser.add_argument("pipeline", help="流水线ID或名称")
+    pipeline_parser.set_defaults(handler=command_pipeline)
+
+    sweep_parser = commands.add_parser("sweep", help="用大量参数集运行同一个脚本")
+    sweep_actions = sweep_parser.add_subparsers(dest="action", required=True)
+    sweep_run_parser = sweep_actions.add_parser("run", help="开始参数扫描")
+    sweep_run_parser.add_argument("script", help="脚本ID或名称")
+    sweep_run_parser.add_argument("file", help="参数集文件：CSV（表头为参数名）或 JSON Lines")
+    sweep_run_parser.add_argument("--param", action="append", default=[], metavar="NAME=VALUE",
+                                  help="所有参数集共用的参数，可重复")
+    sweep_run_parser.add_argument("--batch", type=int, help="每个进程依次运行的参数集数")
+    sweep_run_parser.add_argument("--attempts", type=int, help="每个参数集最多运行的次数")
+    sweep_resume_parser = sweep_actions.add_parser("resume", help="继续中断的参数扫描")
+    sweep_resume_parser.add_argument("sweep_id", type=int)
+    for action_parser in (sweep_run_parser, sweep_resume_parser):
+        action_parser.add_argument("-j", "--jobs", type=int, default=4, help="并行执行数")
+        action_parser.add_argument("--timeout", type=int, help="每个参数集的超时时间（秒）")
+        action_parser.add_argument("-q", "--quiet", action="store_true", help="不输出进度")
+        action_parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    sweep_status_parser = sweep_actions.add_parser("status", help="查看参数扫描的进度")
+    sweep_status_parser.add_argument("sweep_id", type=int)
+    sweep_status_parser.add_argument("--json", action="store_true")
+    sweep_parser.set_defaults(handler=command_sweep)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    init_db()
+    return args.handler(args)
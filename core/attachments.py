@@ -0,0 +1,205 @@
+"""
+执行的输入附件
+
+大的输入不经过环境变量（有大小限制，且每次启动都要复制），而是放在子进程可以直接映射的位置：
+    文件          直接映射原文件，不复制
+    字节缓冲区    复制一次到共享内存段（multiprocessing.shared_memory），
+                  共享内存不可用或空间不足时写入附件目录下的临时文件
+    NumPy 数组    同字节缓冲区，另记录 dtype 与 shape，子进程得到同一块内存上的只读数组
+附件清单以 JSON 放在环境变量 SCRIPT_ATTACHMENTS 中，脚本通过 runtime/script_inputs.py 映射附件。
+执行结束时删除共享内存段与临时文件；执行器异常退出时，共享内存段由 multiprocessing 的资源跟踪进程删除，
+临时文件在下次启动时清理。
+"""
+import json
+import os
+import tempfile
+from typing import Dict, List, Optional
+from utils.file_utils import ensure_directory
+from utils.logger import get_logger
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+logger = get_logger(__name__)
+
+# 传给子进程的附件清单
+ATTACHMENTS_ENV = "SCRIPT_ATTACHMENTS"
+# Linux 上共享内存段所在的文件系统，写满时写入共享内存会触发 SIGBUS
+SHM_DIR = "/dev/shm"
+
+
+class _Attachment:
+    """一个附件：kind 为 shm（共享内存段名）或 file（文件路径）"""
+
+    def __init__(self, kind: str, location: str, size: int,
+                 dtype=None, shape: Optional[List[int]] = None):
+        self.kind = kind
+        self.location = location
+        self.size = size
+        self.dtype = dtype
+        self.shape = shape
+        # 执行结束时需要删除的共享内存段或临时文件
+        self.segment = None
+        self.temporary = False
+
+    def describe(self) -> dict:
+        entry = {"kind": self.kind, "location": self.location, "size": self.size}
+        if self.shape is not None:
+            entry["dtype"] = self.dtype
+            entry["shape"] = self.shape
+        return entry
+
+    def release(self):
+        if self.segment is not None:
+            self.segment.close()
+            try:
+                self.segment.unlink()
+            except FileNotFoundError:
+                pass
+            self.segment = None
+        elif self.temporary:
+            try:
+                os.remove(self.location)
+            except FileNotFoundError:
+                pass
+            self.temporary = False
+
+
+class AttachmentSet:
+    """一次执行的全部附件"""
+
+    def __init__(self, attachments: Dict[str, _Attachment]):
+        self.attachments = attachments
+
+    @property
+    def size(self) -> int:
+        return sum(attachment.size for attachment in self.attachments.values())
+
+    def manifest(self) -> str:
+        return json.dumps({name: attachment.describe()
+                           for name, attachment in self.attachments.items()})
+
+    def release(self):
+        for name, attachment in self.attachments.items():
+            try:
+                attachment.release()
+            except OSError as e:
+                logger.warning(f"Failed to remove attachment {name}: {str(e)}")
+
+
+class AttachmentStore:
+    """
+    创建输入附件
+
+    directory 存放共享内存不可用时的临时文件，文件名以创建它的进程 ID 开头，
+    启动时删除进程已退出的临时文件。
+    """
+
+    def __init__(self, directory: str, use_shared_memory: bool = True):
+        self.directory = os.path.abspath(directory)
+        self.use_shared_memory = use_shared_memory and shared_memory is not None
+        self._clean_stale()
+
+    def create(self, inputs: Dict[str, object]) -> AttachmentSet:
+        """
+        放置一次执行的附件
+
+        Args:
+            inputs: 附件名 -> 文件路径（str 或 os.PathLike）、支持缓冲区协议的对象或 NumPy 数组
+
+        Raises:
+            ValueError: 附件名为空、文件不存在或数据类型不支持
+        """
+        attachments = {}
+        try:
+            for name, data in inputs.items():
+                if not name or not isinstance(name, str):
+                    raise ValueError(f"Invalid attachment name {name!r}")
+                attachments[name] = self._place(name, data)
+        except Exception:
+            AttachmentSet(attachments).release()
+            raise
+        return AttachmentSet(attachments)
+
+    def _place(self, name: str, data) -> _Attachment:
+        if isinstance(data, (str, os.PathLike)):
+            path = os.path.abspath(os.fspath(data))
+            if not os.path.isfile(path):
+                raise ValueError(f"Attachment {name!r}: file {path} not found")
+            return _Attachment("file", path, os.path.getsize(path))
+
+        dtype = shape = None
+        if hasattr(data, "__array_interface__"):
+            import numpy
+            array = numpy.ascontiguousarray(data)
+            if array.dtype.hasobject:
+                raise ValueError(f"Attachment {name!r}: arrays of Python objects cannot be shared")
+            dtype = numpy.lib.format.dtype_to_descr(array.dtype)
+            shape = list(array.shape)
+            view = memoryview(array.reshape(-1).view(numpy.uint8))
+        else:
+            try:
+                view = memoryview(data)
+            except TypeError:
+                raise ValueError(f"Attachment {name!r}: unsupported type {type(data).__name__}")
+            if not view.c_contiguous:
+                raise ValueError(f"Attachment {name!r}: buffer is not contiguous")
+            view = view.cast("B")
+
+        size = view.nbytes
+        if self.use_shared_memory and size and self._shm_has_room(size):
+            segment = shared_memory.SharedMemory(create=True, size=size)
+            try:
+                segment.buf[:size] = view
+            except Exception:
+                segment.close()
+                segment.unlink()
+                raise
+            attachment = _Attachment("shm", segment.name, size, dtype, shape)
+            attachment.segment = segment
+            return attachment
+
+        ensure_directory(self.directory)
+        fd, path = tempfile.mkstemp(prefix=f"{os.getpid()}-", suffix=".bin", dir=self.directory)
+        attachment = _Attachment("file", path, size, dtype, shape)
+        attachment.temporary = True
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(view)
+        except Exception:
+            attachment.release()
+            raise
+        return attachment
+
+    @staticmethod
+    def _shm_has_room(size: int) -> bool:
+        """容器中 /dev/shm 通常很小，空间不足时改用临时文件"""
+        if not os.path.isdir(SHM_DIR):
+            return True
+        stat = os.statvfs(SHM_DIR)
+        return stat.f_bavail * stat.f_frsize >= size
+
+    def _clean_stale(self):
+        if not os.path.isdir(self.directory):
+            return
+        for file_name in os.listdir(self.directory):
+            pid = file_name.partition("-")[0]
+            if not pid.isdigit() or _process_alive(int(pid)):
+                continue
+            try:
+                os.remove(os.path.join(self.directory, file_name))
+            except OSError:
+                pass
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # 进程存在但属于其他用户
+        return True
+    return True
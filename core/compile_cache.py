@@ -0,0 +1,185 @@
+import hashlib
+import importlib.util
+import marshal
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+from typing import Optional
+from utils.file_utils import ensure_directory
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 在子进程中加载缓存的字节码并以 __main__ 身份执行，sys.path 与 "python -c" 一致
+LOADER = (
+    "import sys, marshal\n"
+    "with open(sys.argv.pop(1), 'rb') as f:\n"
+    "    f.seek(16)\n"
+    "    __cached_code__ = marshal.load(f)\n"
+    "del sys, marshal, f\n"
+    "exec(__cached_code__)\n"
+)
+
+
+class CompileCache:
+    """
+    脚本字节码缓存
+
+    以脚本内容和目标解释器版本的 SHA-256 为键，把编译结果保存为 .pyc 文件。
+    编译在当前进程中完成，语法错误在启动子进程之前就能发现。
+    缓存目录按总大小做 LRU 淘汰。
+    """
+
+    def __init__(self, cache_dir: str, max_size: int, python: str = "python"):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_size = max_size
+        self.python = python
+        self._lock = threading.Lock()
+        # key -> 文件大小，按最近使用排序
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_size = 0
+        self.hits = 0
+        self.misses = 0
+
+        ensure_directory(cache_dir)
+        self._version = self._probe_interpreter()
+        self._load_index()
+
+    @property
+    def enabled(self) -> bool:
+        """目标解释器与当前解释器的字节码格式一致时才能直接运行缓存"""
+        return self._version is not None
+
+    def key(self, content: str) -> str:
+        digest = hashlib.sha256()
+        digest.update((self._version or "").encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(content.encode("utf-8"))
+        return digest.hexdigest()
+
+    def compile(self, content: str) -> Optional[str]:
+        """
+        编译脚本并返回缓存的 .pyc 路径
+
+        Raises:
+            SyntaxError: 脚本存在语法错误
+
+        Returns:
+            .pyc 文件路径，目标解释器版本不一致时只做语法检查并返回 None
+        """
+        key = self.key(content)
+        path = self._path(key)
+        with self._lock:
+            if key in self._entries and os.path.exists(path):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+                return path
+
+        code = compile(content, "<string>", "exec")
+        self.misses += 1
+        if not self.enabled:
+            return None
+
+        source = content.encode("utf-8")
+        data = (importlib.util.MAGIC_NUMBER +
+                (1).to_bytes(4, "little") +
+                importlib.util.source_hash(source) +
+                marshal.dumps(code))
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = len(data)
+                self._total_size += len(data)
+            self._entries.move_to_end(key)
+            self._evict()
+        return path
+
+    def invalidate(self, content: str):
+        """删除指定内容的缓存（脚本更新或删除时调用）"""
+        key = self.key(content)
+        with self._lock:
+            self._remove(key)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pyc")
+
+    def _evict(self):
+        while self._total_size > self.max_size and len(self._entries) > 1:
+            key = next(iter(self._entries))
+            self._remove(key)
+
+    def _remove(self, key: str):
+        size = self._entries.pop(key, None)
+        if size is None:
+            return
+        self._total_size -= size
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _load_index(self):
+        """按修改时间从旧到新恢复 LRU 顺序"""
+        files = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".pyc"):
+                continue
+            stat = os.stat(os.path.join(self.cache_dir, name))
+            files.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self._total_size += size
+        with self._lock:
+            self._evict()
+
+    def _probe_interpreter(self) -> Optional[str]:
+        """查询目标解释器的版本与字节码 magic number"""
+        try:
+            result = subprocess.run(
+                [self.python, "-c",
+                 "import importlib.util, sys; print(importlib.util.MAGIC_NUMBER.hex(), sys.version)"],
+                capture_output=True, text=True, timeout=30
+            )
+            magic, version = result.stdout.strip().split(" ", 1)
+        except (OSError, ValueError, subprocess.SubprocessError) as e:
+            logger.warning(f"Failed to probe interpreter {self.python}: {str(e)}")
+            return None
+        if bytes.fromhex(magic) != importlib.util.MAGIC_NUMBER:
+            logger.warning(f"Interpreter {self.python} bytecode differs from the runner, "
+                           f"compile cache only checks syntax")
+            return None
+        return version
+
+
+_shared_cache: Optional[CompileCache] = None
+_shared_lock = threading.Lock()
+
+
+def shared_compile_cache() -> Optional[CompileCache]:
+    """
+    进程内共用的字节码缓存，按系统配置在首次使用时创建，未启用时返回 None
+
+    执行器编译脚本与脚本管理器在更新、删除脚本时失效缓存使用同一实例。
+    """
+    global _shared_cache
+    from core.config import Config
+    config = Config()
+    if not config.get_system_config("compile_cache_enabled", True):
+        return None
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = CompileCache(
+                config.get_system_config("compile_cache_dir", os.path.join("cache", "bytecode")),
+                config.get_system_config("compile_cache_max_size", 67108864),
+                config.get_system_config("python_executable", "python")
+            )
+        return _shared_cache
@@ -22,9 +22,77 @@ class Config:
             "database_url": "sqlite:///script_manager.db",
             "scripts_dir": "scripts",
             "logs_dir": "logs",
+            "outputs_dir": "outputs",
             "max_execution_time": 3600,
             "max_output_size": 1048576,
-            "supported_script_types": ["python", "nodejs", "shell"]
+            "max_concurrent_executions": os.cpu_count() or 4,
+            "max_concurrent_per_script": 0,
+            "supported_script_types": ["python", "nodejs", "shell"],
+            "python_executable": "python",
+            "warm_pool_enabled": False,
+            "warm_pool_preload": [],
+            "compile_cache_enabled": True,
+            "compile_cache_dir": os.path.join("cache", "bytecode"),
+            "compile_cache_max_size": 67108864,
+            "history_retention_days": 30,
+            "history_keep_per_script": 100,
+            "history_compact_interval": 3600,
+            "resource_sampling_enabled": True,
+            "resource_sample_interval": 1.0,
+            "resource_max_samples": 3600,
+            # 全局资源限制，0 表示不限制（见 core.resource_limits）
+            "resource_limits": {
+                "address_space": 0,
+                "cpu_time": 0,
+                "open_files": 0,
+                "processes": 0,
+                "memory": 0
+            },
+            "cgroup_enabled": False,
+            "cgroup_root": None,
+            "cgroup_cpu_weight": 100,
+            # 指标导出：本地 HTTP 端口（0 为关闭）与 Prometheus 文本文件
+            "metrics_port": 0,
+            "metrics_file": None,
+            "metrics_file_interval": 15,
+            # 本地 API 服务（python main.py serve），设置 api_socket 时改用 Unix socket
+            "api_host": "127.0.0.1",
+            "api_port": 8765,
+            "api_socket": None,
+            "api_token": None,
+            "api_client_buffer": 262144,
+            # 分布式模式（python main.py coordinator / worker），跨主机时设置 coordinator_token
+            "coordinator_host": "127.0.0.1",
+            "coordinator_port": 8766,
+            "coordinator_socket": None,
+            "coordinator_token": None,
+            "coordinator_lease_ttl": 30,
+            "coordinator_heartbeat_interval": 5,
+            "coordinator_max_attempts": 3,
+            "worker_slots": os.cpu_count() or 4,
+            "worker_prefetch": 1,
+            "worker_dir": "worker",
+            # 定时执行（python main.py scheduler），晚于计划时间超过 misfire_grace 秒视为错过
+            "scheduler_misfire_grace": 60,
+            "scheduler_max_catch_up": 100,
+            "scheduler_sync_interval": 30,
+            # 标记为可缓存的脚本的结果缓存，大小按源执行的输出字节数计算
+            "result_cache_enabled": True,
+            "result_cache_ttl": 86400,
+            "result_cache_max_entries": 10000,
+            "result_cache_max_size": 268435456,
+            # 参数扫描（python main.py sweep），每个进程依次运行 sweep_batch_size 组参数
+            "sweep_batch_size": 1,
+            "sweep_max_attempts": 3,
+            "sweep_item_output_limit": 65536,
+            "sweep_dir": "sweeps",
+            # 输入附件：字节缓冲区与数组放入共享内存，关闭或空间不足时写入 attachments_dir 下的临时文件
+            "attachments_dir": "attachments",
+            "attachment_shared_memory": True,
+            # 结构化记录通道（仅 POSIX），每个执行最多保存 results_max_records 条记录
+            "results_channel_enabled": True,
+            "results_max_records": 100000,
+            "results_max_record_size": 65536
         }
         
         # 用户配置默认值
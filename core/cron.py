@@ -0,0 +1,118 @@
+"""
+cron 表达式
+
+五段格式：分 时 日 月 周，使用本地时间。每段支持 *、数值、范围 a-b、列表 a,b 与步长 */n、a-b/n，
+月与周可用英文缩写（jan、mon），周日为 0 或 7。日与周都受限时满足其一即可（与 cron 相同）。
+另支持 @yearly、@monthly、@weekly、@daily、@hourly。
+"""
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+ALIASES = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *"
+}
+MONTH_NAMES = ["jan", "feb", "mar", "apr", "may", "jun",
+               "jul", "aug", "sep", "oct", "nov", "dec"]
+WEEKDAY_NAMES = ["sun", "mon", "tue", "wed", "thu", "fri", "sat"]
+# 查找下一次触发时间时最多向后检查的年数（如 2 月 30 日永远不会触发）
+MAX_YEARS = 5
+
+
+def _parse_value(text: str, names: Optional[List[str]], offset: int) -> int:
+    if names and text.lower() in names:
+        return names.index(text.lower()) + offset
+    if not text.isdigit():
+        raise ValueError(f"Invalid cron value {text!r}")
+    return int(text)
+
+
+def _parse_field(text: str, low: int, high: int, names: Optional[List[str]] = None,
+                 offset: int = 0) -> List[int]:
+    values = set()
+    for part in text.split(","):
+        expression, _, step = part.partition("/")
+        step = int(step) if step.isdigit() else (1 if not step else 0)
+        if step < 1:
+            raise ValueError(f"Invalid cron step in {part!r}")
+        if expression == "*":
+            start, end = low, high
+        elif "-" in expression:
+            first, _, last = expression.partition("-")
+            start, end = _parse_value(first, names, offset), _parse_value(last, names, offset)
+        else:
+            start = _parse_value(expression, names, offset)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end:
+            raise ValueError(f"Cron value out of range in {part!r}")
+        values.update(range(start, end + 1, step))
+    return sorted(values)
+
+
+class CronExpression:
+    """解析后的 cron 表达式，按字段跳跃计算下一次触发时间，而不是逐分钟检查"""
+
+    def __init__(self, expression: str):
+        self.expression = expression.strip()
+        fields = ALIASES.get(self.expression.lower(), self.expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+        self.minutes = _parse_field(fields[0], 0, 59)
+        self.hours = _parse_field(fields[1], 0, 23)
+        self.days = _parse_field(fields[2], 1, 31)
+        self.months = _parse_field(fields[3], 1, 12, MONTH_NAMES, 1)
+        weekdays = _parse_field(fields[4], 0, 7, WEEKDAY_NAMES)
+        self.weekdays = sorted({day % 7 for day in weekdays})
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def __str__(self) -> str:
+        return self.expression
+
+    def _day_matches(self, value: datetime) -> bool:
+        day_match = value.day in self.days
+        # Python 中周一为 0，cron 中周日为 0
+        weekday_match = (value.weekday() + 1) % 7 in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day_match and weekday_match
+        return day_match or weekday_match
+
+    def next_after(self, after: datetime) -> datetime:
+        """after 之后（不含）的第一个触发时间"""
+        value = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = after.year + MAX_YEARS
+        while value.year <= limit:
+            if value.month not in self.months:
+                index = bisect_left(self.months, value.month)
+                if index == len(self.months):
+                    value = datetime(value.year + 1, self.months[0], 1)
+                else:
+                    value = datetime(value.year, self.months[index], 1)
+                continue
+            if not self._day_matches(value):
+                value = datetime(value.year, value.month, value.day) + timedelta(days=1)
+                continue
+            if value.hour not in self.hours:
+                index = bisect_left(self.hours, value.hour)
+                day = datetime(value.year, value.month, value.day)
+                if index == len(self.hours):
+                    value = day + timedelta(days=1)
+                else:
+                    value = day.replace(hour=self.hours[index])
+                continue
+            if value.minute not in self.minutes:
+                index = bisect_left(self.minutes, value.minute)
+                hour = value.replace(minute=0)
+                if index == len(self.minutes):
+                    value = hour + timedelta(hours=1)
+                else:
+                    value = hour.replace(minute=self.minutes[index])
+                continue
+            return value
+        raise ValueError(f"Cron expression never matches: {self.expression!r}")
@@ -0,0 +1,183 @@
+import heapq
+import itertools
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class QueuedExecution:
+    """等待调度的执行请求"""
+
+    def __init__(self, execution_id: int, script_id: int, priority: int,
+                 turn: int, seq: int, payload: Any,
+                 members: Optional[List[Tuple[int, int]]] = None):
+        self.execution_id = execution_id
+        self.script_id = script_id
+        self.priority = priority
+        self.turn = turn
+        self.seq = seq
+        self.payload = payload
+        # 需要同时启动的一组执行 [(执行ID, 脚本ID)]，每个占用一个执行槽
+        self.members = members
+        self.cancelled = False
+    
+    @property
+    def slots(self) -> int:
+        return len(self.members) if self.members else 1
+
+    @property
+    def key(self) -> Tuple[int, int, int]:
+        return (self.priority, self.turn, self.seq)
+
+    def __lt__(self, other: "QueuedExecution") -> bool:
+        return self.key < other.key
+
+
+class ExecutionQueue:
+    """
+    带并发上限的执行队列
+
+    - priority 数值越小越先执行
+    - 同优先级下按脚本轮转（FIFO 公平），避免单个脚本的突发请求独占执行槽
+    - 支持全局与单脚本并发上限（0 表示不限制单脚本并发）
+    - 一组执行（如通过管道相连的流水线阶段）作为一个请求排队，有足够的空闲执行槽时一起出队，
+      超过全局上限的组在没有其他执行时单独运行
+    """
+
+    def __init__(self, max_concurrency: int = 4, max_per_script: int = 0):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_per_script = max(0, max_per_script)
+
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        # 每个脚本自己的待执行堆
+        self._pending: Dict[int, List[QueuedExecution]] = {}
+        # 各脚本队首组成的全局堆，元素为 (key, script_id)，采用惰性删除
+        self._heads: List[Tuple[Tuple[int, int, int], int]] = []
+        self._entries: Dict[int, QueuedExecution] = {}
+        self._running: Dict[int, int] = {}
+        self._running_per_script: Dict[int, int] = {}
+        # 公平轮次：每个脚本的最后轮次与已派发的最大轮次
+        self._last_turn: Dict[int, int] = {}
+        self._dispatched_turn = 0
+
+    def push(self, execution_id: int, script_id: int,
+             priority: int = 0, payload: Any = None,
+             members: Optional[List[Tuple[int, int]]] = None) -> QueuedExecution:
+        """
+        加入队列
+        
+        members 为需要同时启动的一组执行 [(执行ID, 脚本ID)]（包括 execution_id 本身），
+        出队后各自调用 finish() 释放执行槽，取消时使用 execution_id。
+        """
+        with self._lock:
+            turn = max(self._last_turn.get(script_id, 0), self._dispatched_turn) + 1
+            self._last_turn[script_id] = turn
+            entry = QueuedExecution(execution_id, script_id, priority,
+                                    turn, next(self._seq), payload, members)
+            self._entries[execution_id] = entry
+
+            pending = self._pending.setdefault(script_id, [])
+            heapq.heappush(pending, entry)
+            if pending[0] is entry:
+                self._push_head(script_id)
+            return entry
+
+    def pop_ready(self) -> Optional[QueuedExecution]:
+        """取出下一个可以立即执行的请求，没有时返回 None"""
+        with self._lock:
+            if len(self._running) >= self.max_concurrency:
+                return None
+
+            while self._heads:
+                key, script_id = heapq.heappop(self._heads)
+                self._drop_cancelled(script_id, repush=False)
+                pending = self._pending.get(script_id)
+                if not pending or not self._script_available(script_id):
+                    # 脚本已达并发上限时丢弃队首记录，finish() 时会重新登记
+                    continue
+                if pending[0].key != key:
+                    # 过期的队首记录，重新登记当前队首
+                    self._push_head(script_id)
+                    continue
+                if (pending[0].members and self._running
+                        and len(self._running) + pending[0].slots > self.max_concurrency):
+                    # 等待整组的执行槽，后面的请求不插队
+                    heapq.heappush(self._heads, (key, script_id))
+                    return None
+
+                entry = heapq.heappop(pending)
+                if not pending:
+                    del self._pending[script_id]
+                del self._entries[entry.execution_id]
+
+                for member_id, member_script in entry.members or [(entry.execution_id, script_id)]:
+                    self._running[member_id] = member_script
+                    self._running_per_script[member_script] = \
+                        self._running_per_script.get(member_script, 0) + 1
+                self._dispatched_turn = max(self._dispatched_turn, entry.turn)
+
+                if script_id in self._pending:
+                    self._push_head(script_id)
+                return entry
+
+            return None
+
+    def finish(self, execution_id: int):
+        """标记执行结束，释放执行槽"""
+        with self._lock:
+            script_id = self._running.pop(execution_id, None)
+            if script_id is None:
+                return
+            count = self._running_per_script.get(script_id, 1) - 1
+            if count > 0:
+                self._running_per_script[script_id] = count
+            else:
+                self._running_per_script.pop(script_id, None)
+            if script_id in self._pending:
+                self._push_head(script_id)
+
+    def cancel(self, execution_id: int) -> bool:
+        """取消排队中的请求，已开始执行的返回 False"""
+        with self._lock:
+            entry = self._entries.pop(execution_id, None)
+            if entry is None:
+                return False
+            entry.cancelled = True
+            self._drop_cancelled(entry.script_id)
+            return True
+
+    def is_queued(self, execution_id: int) -> bool:
+        with self._lock:
+            return execution_id in self._entries
+
+    @property
+    def queued_count(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    @property
+    def running_count(self) -> int:
+        with self._lock:
+            return len(self._running)
+
+    def _script_available(self, script_id: int) -> bool:
+        if not self.max_per_script:
+            return True
+        return self._running_per_script.get(script_id, 0) < self.max_per_script
+
+    def _push_head(self, script_id: int):
+        pending = self._pending.get(script_id)
+        if pending:
+            heapq.heappush(self._heads, (pending[0].key, script_id))
+
+    def _drop_cancelled(self, script_id: int, repush: bool = True):
+        """丢弃脚本队首已取消的请求"""
+        pending = self._pending.get(script_id)
+        if not pending or not pending[0].cancelled:
+            return
+        while pending and pending[0].cancelled:
+            heapq.heappop(pending)
+        if not pending:
+            del self._pending[script_id]
+        elif repush:
+            self._push_head(script_id)
@@ -0,0 +1,148 @@
+"""
+结构化记录通道
+
+执行器为每个执行额外创建一个管道，写端交给子进程，描述符号码通过环境变量 SCRIPT_RESULTS_FD 传递。
+脚本用 runtime/script_results.py 每行写一条 JSON 记录：
+    {"kind": "progress", "value": 0.5, "message": "..."}   最新进度，写入执行记录的 progress 字段
+    {"kind": "metric", "name": "loss", "value": 0.12, "step": 10}
+    {"kind": "result", "name": "accuracy", "value": 0.93}
+    {"kind": "<自定义>", ...}
+除 progress 外的记录保存在 execution_records 表中，数值的 value 另存为数值列，便于跨执行查询与聚合。
+事件循环按行增量解析，记录攒批后交给批量写入器，无效的行与超出上限的记录被丢弃并计数。
+"""
+import json
+import math
+from datetime import datetime
+from typing import Dict, List, Optional
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+RESULTS_FD_ENV = "SCRIPT_RESULTS_FD"
+# 记录通道在事件循环中的流名
+RESULTS_STREAM = "results"
+
+
+def _number(value) -> Optional[float]:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+class RecordCollector:
+    """一次执行的记录：逐行解析，待写入的记录与最新进度留在内存中直到 take()"""
+
+    def __init__(self, execution_id: int, max_records: int, max_record_size: int):
+        self.execution_id = execution_id
+        self.max_records = max_records
+        self.max_record_size = max_record_size
+        self.count = 0
+        self.invalid = 0
+        self.dropped = 0
+        self._rows: List[dict] = []
+        self._progress: Optional[Dict[str, object]] = None
+        # 事件循环分段交出的过长行：已收到的开头，超过 max_record_size 后只等待行尾
+        self._partial: List[str] = []
+        self._partial_size = 0
+        self._overlong = False
+
+    @property
+    def pending(self) -> int:
+        return len(self._rows)
+
+    def feed(self, text: str):
+        """解析文本，过长的行由事件循环分段交出，最后一段之前的部分先保存起来"""
+        now = datetime.now()
+        lines = text.split("\n")
+        rest = lines.pop()
+        if self._partial or self._overlong:
+            if lines:
+                lines[0] = "".join(self._partial) + lines[0]
+                self._partial, self._partial_size = [], 0
+            else:
+                self._keep_partial(rest)
+                rest = ""
+        for line in lines:
+            if self._overlong:
+                self._overlong = False
+                continue
+            self._parse(line, now)
+        if rest:
+            self._keep_partial(rest)
+
+    def finish(self):
+        """执行结束：解析没有以换行结尾的最后一条记录"""
+        if self._partial or self._overlong:
+            self.feed("\n")
+
+    def _keep_partial(self, piece: str):
+        if self._overlong:
+            return
+        self._partial_size += len(piece)
+        if self._partial_size > self.max_record_size:
+            self._partial, self._partial_size = [], 0
+            self._overlong = True
+            self.dropped += 1
+        else:
+            self._partial.append(piece)
+
+    def _parse(self, line: str, now: datetime):
+        if not line.strip():
+            return
+        if len(line) > self.max_record_size:
+            self.dropped += 1
+            return
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if not isinstance(record, dict) or not isinstance(record.get("kind"), str) \
+                or not record["kind"]:
+            if not self.invalid:
+                logger.warning(f"Execution {self.execution_id} wrote an invalid record: "
+                               f"{line[:200]!r}")
+            self.invalid += 1
+            return
+        self._add(record, line, now)
+
+    def _add(self, record: dict, line: str, now: datetime):
+        if record["kind"] == "progress":
+            value = _number(record.get("value"))
+            message = record.get("message")
+            self._progress = self._progress or {}
+            if value is not None:
+                self._progress["progress"] = min(max(value, 0.0), 1.0)
+            if message is not None:
+                self._progress["progress_message"] = str(message)[:255]
+            return
+        if self.max_records and self.count >= self.max_records:
+            if not self.dropped:
+                logger.warning(f"Execution {self.execution_id} exceeded "
+                               f"{self.max_records} records, dropping the rest")
+            self.dropped += 1
+            return
+        name = record.get("name")
+        step = record.get("step")
+        self._rows.append({
+            "execution_id": self.execution_id,
+            "seq": self.count,
+            "kind": record["kind"][:50],
+            "name": str(name)[:255] if name is not None else None,
+            "value": _number(record.get("value")),
+            "step": step if isinstance(step, int) and not isinstance(step, bool) else None,
+            "data": line,
+            "created_at": now
+        })
+        self.count += 1
+
+    def take(self):
+        """
+        取出待写入的记录与最新进度
+
+        Returns:
+            (ExecutionRecord 的行字典列表, 执行记录的进度字段或 None)
+        """
+        rows, self._rows = self._rows, []
+        progress, self._progress = self._progress, None
+        return rows, progress
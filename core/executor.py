@@ -3,165 +3,1037 @@ import signal
 import subprocess
 import threading
 import time
-from typing import Optional, Dict, Callable
+import traceback
+from typing import Optional, Dict, Callable, List, Tuple
 from datetime import datetime
-from database.models import ScriptExecution
+from sqlalchemy import delete, insert, literal, select, update
+from database.db_manager import engine
+from database.db_writer import DBWriter
+from database.models import (ScriptExecution, ExecutionOutputChunk, ExecutionRecord,
+                             ExecutionResourceSamples)
+from core.attachments import ATTACHMENTS_ENV, AttachmentSet, AttachmentStore
+from core.compile_cache import LOADER, shared_compile_cache
+from core.config import Config
+from core.execution_queue import ExecutionQueue, QueuedExecution
+from core.execution_records import RESULTS_FD_ENV, RESULTS_STREAM, RecordCollector
+from core.metrics import ExecutorMetrics, MetricsRegistry, MetricsServer
+from core.output_batcher import OutputBatcher
+from core.output_capture import OutputCapture
+from core.process_reactor import ProcessReactor
+from core.resource_limits import (CgroupManager, classify_exit, make_preexec, merge_limits,
+                                  rlimit_settings)
+from core.resource_monitor import ResourceMonitor, ResourceUsage
+from core.result_cache import CachedResult, ResultCache
+from core.warm_pool import WarmPool
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# 输出表中每块的最大字符数
+OUTPUT_CHUNK_SIZE = 65536
+# 结构化记录攒够一批或等待超过间隔（秒）后写入
+RECORD_BATCH_SIZE = 1000
+RECORD_FLUSH_INTERVAL = 1.0
+
+# 脚本可以导入的辅助模块（如 script_inputs）所在目录，加入子进程的 PYTHONPATH
+RUNTIME_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "runtime")
+
+# 复用结果时从源执行复制的字段
+RESULT_COLUMNS = ("status", "exit_code", "error_message", "output_file", "error_file",
+                  "output_size", "error_size", "progress", "progress_message")
+
+
+class _SharedRun:
+    """可缓存的执行正在进行时，相同内容与参数的后续请求等待并共用它的结果"""
+
+    def __init__(self, key: str, script_id: int):
+        self.key = key
+        self.script_id = script_id
+        self.execution_id: Optional[int] = None
+        # 领头执行的队列负载，领头执行被取消时交给第一个等待者运行
+        self.payload = None
+        # (执行ID, 优先级, 输出回调, 结束回调)
+        self.followers: List[Tuple[int, int, Optional[Callable], Optional[Callable]]] = []
+
+
+class ChainStage:
+    """通过管道相连的一个阶段（见 ScriptExecutor.execute_chain），参数与 execute 相同"""
+
+    def __init__(self, script_id: int, content: str,
+                 parameters: Optional[Dict[str, str]] = None,
+                 timeout: int = 3600,
+                 output_callback: Optional[Callable[[str], None]] = None,
+                 limits: Optional[Dict[str, int]] = None,
+                 finished_callback: Optional[Callable[[int, str, Optional[int]], None]] = None,
+                 record_fields: Optional[Dict[str, object]] = None,
+                 attachments: Optional[Dict[str, object]] = None):
+        self.script_id = script_id
+        self.content = content
+        self.parameters = parameters
+        self.timeout = timeout
+        self.output_callback = output_callback
+        self.limits = limits
+        self.finished_callback = finished_callback
+        # 执行记录的附加字段（如 pipeline_run_id、stage）
+        self.record_fields = record_fields or {}
+        self.attachments = attachments
+
+
 class ScriptExecutor:
-    def __init__(self, db_session):
-        self.db = db_session
+    def __init__(self, writer: Optional[DBWriter] = None,
+                 max_concurrency: Optional[int] = None,
+                 max_per_script: Optional[int] = None,
+                 warm_pool: Optional[WarmPool] = None):
+        # 执行记录的所有写入都交给批量写入器，不在线程间共享会话
+        self.writer = writer or DBWriter(engine)
         self.running_processes = {}
         self.output_callbacks = {}
+        self.finished_callbacks = {}
+        self._outputs = {}
+        self._batchers = {}
+        self._flush_scheduled = set()
+        # 上一段 stderr 停在行中间的执行（过长的行被事件循环分段交出）
+        self._stderr_midline = set()
+        self._limits = {}
+        # 执行ID -> (启动时刻, 脚本ID, 是否已有输出)，用于时长与首次输出指标
+        self._timing = {}
+        self.delivered_output_bytes = 0
+        self.dropped_output_bytes = 0
+        
+        # 所有执行共用一个事件循环线程读取输出、回收进程与处理超时
+        self.reactor = ProcessReactor()
+        
+        # 并发控制：超出上限的执行进入优先级队列等待
+        config = Config()
+        self.outputs_dir = config.get_system_config("outputs_dir", "outputs")
+        self.max_output_size = config.get_system_config("max_output_size", 1048576)
+        self.python = config.get_system_config("python_executable", "python")
+        
+        # 字节码缓存
+        self.compile_cache = shared_compile_cache()
+        
+        # 可选的预热解释器池
+        self.warm_pool = warm_pool
+        # 执行器自己创建的池在 shutdown 时关闭，调用方传入的池由调用方关闭
+        self._owns_warm_pool = False
+        if warm_pool is None and config.get_system_config("warm_pool_enabled", False):
+            if WarmPool.is_supported():
+                self.warm_pool = WarmPool(self.python, config.get_system_config("warm_pool_preload", []))
+                self._owns_warm_pool = True
+            else:
+                logger.warning("Warm pool is not supported on this platform, using cold start")
+        
+        # 资源采样（仅 Linux）
+        self.resource_monitor = None
+        if config.get_system_config("resource_sampling_enabled", True) and ResourceMonitor.is_supported():
+            self.resource_monitor = ResourceMonitor(
+                config.get_system_config("resource_sample_interval", 1.0),
+                config.get_system_config("resource_max_samples", 3600)
+            )
+        
+        # 资源限制与可选的 cgroup v2 模式
+        self.resource_limits = merge_limits(config.get_system_config("resource_limits", {}))
+        self.cgroups = None
+        if config.get_system_config("cgroup_enabled", False):
+            cgroups = CgroupManager(config.get_system_config("cgroup_root"),
+                                    config.get_system_config("cgroup_cpu_weight", 100))
+            if cgroups.setup():
+                self.cgroups = cgroups
+        if max_concurrency is None:
+            max_concurrency = config.get_system_config("max_concurrent_executions", 4)
+        if max_per_script is None:
+            max_per_script = config.get_system_config("max_concurrent_per_script", 0)
+        self.queue = ExecutionQueue(max_concurrency, max_per_script)
+        
+        # 指标：可通过本地 HTTP 端点或定期写入的文本文件导出
+        self.metrics = ExecutorMetrics(MetricsRegistry(),
+                                       lambda: self.queue.queued_count,
+                                       lambda: self.queue.running_count)
+        if self.writer.on_commit is None:
+            self.writer.on_commit = self.metrics.observe_commit
+        self.metrics_server = None
+        metrics_port = config.get_system_config("metrics_port", 0)
+        if metrics_port:
+            try:
+                self.metrics_server = MetricsServer(self.metrics.registry, metrics_port)
+                self.metrics_server.start()
+            except OSError as e:
+                logger.error(f"Failed to start metrics server: {str(e)}")
+                self.metrics_server = None
+        self.metrics_file = config.get_system_config("metrics_file")
+        self.metrics_file_interval = config.get_system_config("metrics_file_interval", 15)
+        if self.metrics_file:
+            self.reactor.call_later(0, self._write_metrics_file)
+        
+        # 可缓存脚本的结果缓存与同时进行的相同执行
+        self.result_cache = None
+        if config.get_system_config("result_cache_enabled", True):
+            self.result_cache = ResultCache(
+                self.writer, self.python,
+                config.get_system_config("result_cache_ttl", 86400),
+                config.get_system_config("result_cache_max_entries", 10000),
+                config.get_system_config("result_cache_max_size", 268435456)
+            )
+        self._cache_lock = threading.Lock()
+        self._shared_runs: Dict[str, _SharedRun] = {}
+        # 领头执行ID -> _SharedRun，等待中的执行ID -> _SharedRun
+        self._leading: Dict[int, _SharedRun] = {}
+        self._following: Dict[int, _SharedRun] = {}
+        self._result_sizes: Dict[int, int] = {}
+        
+        # 排队中的管道链：首个阶段的执行ID -> 各阶段执行ID，阶段执行ID -> 首个阶段的执行ID
+        self._chains: Dict[int, List[int]] = {}
+        self._chain_heads: Dict[int, int] = {}
+        
+        # 输入附件，执行结束时删除
+        self.attachments = AttachmentStore(
+            config.get_system_config("attachments_dir", "attachments"),
+            config.get_system_config("attachment_shared_memory", True)
+        )
+        self._attachments: Dict[int, AttachmentSet] = {}
+        
+        # 结构化记录通道（见 core.execution_records），需要向子进程传递额外的管道描述符
+        self.results_channel = os.name == "posix" and \
+            config.get_system_config("results_channel_enabled", True)
+        self.max_records = config.get_system_config("results_max_records", 100000)
+        self.max_record_size = config.get_system_config("results_max_record_size", 65536)
+        self._records: Dict[int, RecordCollector] = {}
+        self._records_scheduled = set()
     
     def execute(self, script_id: int, content: str,
                 parameters: Dict[str, str] = None,
                 timeout: int = 3600,
-                output_callback: Optional[Callable[[str], None]] = None) -> int:
+                output_callback: Optional[Callable[[str], None]] = None,
+                priority: int = 0,
+                limits: Optional[Dict[str, int]] = None,
+                finished_callback: Optional[Callable[[int, str, Optional[int]], None]] = None,
+                cacheable: bool = False,
+                attachments: Optional[Dict[str, object]] = None) -> int:
         """
-        执行脚本
+        提交脚本执行
+        
+        脚本先在当前进程中编译（命中缓存时跳过），语法错误直接记为失败，不启动进程。
+        执行请求先进入队列（状态为 queued），有空闲执行槽时再启动进程。
+        可缓存的脚本先查结果缓存，命中时直接复制缓存的结果；相同的执行正在进行时等待并共用它的结果。
         
         Args:
             script_id: 脚本ID
             content: 脚本内容
             parameters: 脚本参数
             timeout: 超时时间（秒）
-            output_callback: 输出回调函数
+            output_callback: 输出回调函数，输出按帧合并后回调（约每 50ms 一次）
+            priority: 优先级，数值越小越先执行
+            limits: 脚本的资源限制（见 core.resource_limits），与全局限制合并后取更严格的值
+            finished_callback: 执行结束（包括启动失败与取消）时回调 (execution_id, status, exit_code)，
+                在事件循环线程或调用方线程中调用
+            cacheable: 脚本的结果只取决于内容与参数（Script.cacheable），有附件时不使用缓存
+            attachments: 输入附件，附件名 -> 文件路径、字节缓冲区或 NumPy 数组（见 core.attachments），
+                提交时放入共享内存或临时文件，调用方随后可以释放自己的副本
         
         Returns:
             execution_id: 执行记录ID
+        
+        Raises:
+            ValueError: 附件无效
         """
+        attached = self.attachments.create(attachments) if attachments else None
+        if attached:
+            # 缓存键不包含附件内容
+            cacheable = False
+        shared = None
+        if cacheable and self.result_cache is not None:
+            key = self.result_cache.key(content, parameters)
+            while shared is None:
+                cached = self.result_cache.get(key)
+                if cached is not None:
+                    execution_id = self._replay_cached(key, cached, script_id, priority,
+                                                       output_callback, finished_callback)
+                    if execution_id is not None:
+                        return execution_id
+                with self._cache_lock:
+                    running = self._shared_runs.get(key)
+                    if running is None:
+                        # 成为领头执行，之后的相同请求等待它的结果
+                        shared = self._shared_runs[key] = _SharedRun(key, script_id)
+                if running is not None:
+                    execution_id = self._follow(running, script_id, priority,
+                                                output_callback, finished_callback)
+                    if execution_id is not None:
+                        return execution_id
+            self.metrics.result_cache.inc(result="miss")
+        
+        limits = merge_limits(self.resource_limits, limits)
+        bytecode_path = None
+        syntax_error = None
+        if self.compile_cache:
+            try:
+                bytecode_path = self.compile_cache.compile(content)
+            except SyntaxError as e:
+                syntax_error = "".join(traceback.format_exception_only(type(e), e))
+        
+        # 创建执行记录
+        execution = ScriptExecution(
+            script_id=script_id,
+            status="queued",
+            priority=priority
+        )
+        if syntax_error:
+            execution.status = "failed"
+            execution.error_message = syntax_error.strip().splitlines()[-1][:255]
+            execution.started_at = execution.finished_at = datetime.now()
         try:
-            # 创建执行记录
-            execution = ScriptExecution(
-                script_id=script_id,
-                status="running"
-            )
-            self.db.add(execution)
-            self.db.commit()
-            self.db.refresh(execution)
+            execution_id = self.writer.insert(execution).result()
+        except Exception as e:
+            logger.error(f"Failed to queue script {script_id}: {str(e)}")
+            if attached:
+                attached.release()
+            if shared:
+                self._complete_shared(shared, None, "failed", None)
+            raise
+        
+        if finished_callback:
+            self.finished_callbacks[execution_id] = finished_callback
+        if attached:
+            self._attachments[execution_id] = attached
+            logger.info(f"Execution {execution_id} has {len(attached.attachments)} attachments, "
+                        f"{attached.size} bytes")
+        if shared:
+            shared.execution_id = execution_id
+            self._leading[execution_id] = shared
+        
+        if syntax_error:
+            self._store_output(execution_id, "stderr", syntax_error)
+            logger.info(f"Execution {execution_id} rejected: syntax error")
+            self._notify_finished(execution_id, "failed", None)
+            return execution_id
+        
+        if output_callback:
+            self.output_callbacks[execution_id] = output_callback
+        payload = (content, bytecode_path, parameters, timeout, limits)
+        if shared:
+            shared.payload = payload
+        self.queue.push(execution_id, script_id, priority, payload=payload)
+        logger.info(f"Queued execution {execution_id} for script {script_id}")
+        
+        self._dispatch()
+        return execution_id
+    
+    def execute_chain(self, stages: List[ChainStage], priority: int = 0) -> List[int]:
+        """
+        提交通过管道相连的一组执行：每个阶段的 stdout 直接接到下一个阶段的 stdin
+        
+        数据在进程之间流动，不经过执行器、数据库与回调，内存占用与数据量无关；
+        只有最后一个阶段的 stdout 与各阶段的 stderr 被收集。整条链作为一个请求排队，
+        有足够的执行槽时同时启动（超过并发上限的链在没有其他执行时单独运行）。
+        与 shell 管道相同，下游提前退出时上游收到 SIGPIPE，各阶段的状态分别记录。
+        有阶段存在语法错误时整条链不启动，该阶段记为失败，其余阶段记为取消。
+        
+        Returns:
+            各阶段的执行ID
+        """
+        if not stages:
+            return []
+        attached = []
+        try:
+            for stage in stages:
+                attached.append(self.attachments.create(stage.attachments)
+                                if stage.attachments else None)
+        except Exception:
+            for stage_attachments in attached:
+                if stage_attachments:
+                    stage_attachments.release()
+            raise
+        payloads = []
+        syntax_errors = {}
+        for index, stage in enumerate(stages):
+            bytecode_path = None
+            if self.compile_cache:
+                try:
+                    bytecode_path = self.compile_cache.compile(stage.content)
+                except SyntaxError as e:
+                    syntax_errors[index] = "".join(traceback.format_exception_only(type(e), e))
+            payloads.append((stage.content, bytecode_path, stage.parameters, stage.timeout,
+                             merge_limits(self.resource_limits, stage.limits)))
+        
+        executions = [ScriptExecution(script_id=stage.script_id, status="queued", priority=priority,
+                                      **stage.record_fields) for stage in stages]
+        
+        def insert_all(session):
+            session.add_all(executions)
+            session.flush()
+            return [execution.id for execution in executions]
+        
+        try:
+            execution_ids = self.writer.submit(insert_all).result()
+        except Exception as e:
+            logger.error(f"Failed to queue chain of {len(stages)} stages: {str(e)}")
+            for stage_attachments in attached:
+                if stage_attachments:
+                    stage_attachments.release()
+            raise
+        
+        for execution_id, stage, stage_attachments in zip(execution_ids, stages, attached):
+            if stage.finished_callback:
+                self.finished_callbacks[execution_id] = stage.finished_callback
+            if stage_attachments:
+                self._attachments[execution_id] = stage_attachments
+        if syntax_errors:
+            now = datetime.now()
+            for index, execution_id in enumerate(execution_ids):
+                if index in syntax_errors:
+                    self._store_output(execution_id, "stderr", syntax_errors[index])
+                    self._update_execution(
+                        execution_id, status="failed", started_at=now, finished_at=now,
+                        error_message=syntax_errors[index].strip().splitlines()[-1][:255])
+                    self._notify_finished(execution_id, "failed", None)
+                else:
+                    self._update_execution(execution_id, status="cancelled", finished_at=now)
+                    self._notify_finished(execution_id, "cancelled", None)
+            logger.info(f"Chain {execution_ids} rejected: syntax error")
+            return execution_ids
+        
+        for execution_id, stage in zip(execution_ids, stages):
+            if stage.output_callback:
+                self.output_callbacks[execution_id] = stage.output_callback
+            self._chain_heads[execution_id] = execution_ids[0]
+        self._chains[execution_ids[0]] = execution_ids
+        members = [(execution_id, stage.script_id) for execution_id, stage in zip(execution_ids, stages)]
+        self.queue.push(execution_ids[0], stages[0].script_id, priority,
+                        payload=payloads, members=members)
+        logger.info(f"Queued chain {execution_ids}")
+        
+        self._dispatch()
+        return execution_ids
+    
+    def _update_execution(self, execution_id: int, **fields):
+        """异步更新执行记录字段，与其他更新合并提交"""
+        return self.writer.update(ScriptExecution, execution_id, **fields)
+    
+    def _dispatch(self):
+        """在执行槽允许的范围内启动排队中的执行"""
+        while True:
+            entry = self.queue.pop_ready()
+            if entry is None:
+                return
+            self._start(entry)
+    
+    def _start(self, entry: QueuedExecution):
+        """启动一个已出队的执行"""
+        if entry.members:
+            self._start_chain(entry)
+        else:
+            self._launch(entry.execution_id, entry.script_id, entry.payload)
+    
+    def _start_chain(self, entry: QueuedExecution):
+        """依次启动管道链的各阶段，相邻阶段之间创建管道"""
+        execution_ids = self._chains.pop(entry.execution_id, [])
+        for execution_id in execution_ids:
+            self._chain_heads.pop(execution_id, None)
+        stdin = None
+        for index, ((execution_id, script_id), payload) in enumerate(zip(entry.members,
+                                                                         entry.payload)):
+            stdout = None
+            next_stdin = None
+            if index < len(entry.members) - 1:
+                next_stdin, stdout = os.pipe()
+            try:
+                started = self._launch(execution_id, script_id, payload, stdin, stdout)
+            finally:
+                # 子进程已持有管道的副本，关闭本进程中的副本，上下游退出时对方能收到 EOF/SIGPIPE
+                for fd in (stdin, stdout):
+                    if fd is not None:
+                        os.close(fd)
+            stdin = next_stdin
+            if not started:
+                if stdin is not None:
+                    os.close(stdin)
+                self._abort_chain(entry.members[index + 1:])
+                return
+    
+    def _abort_chain(self, members: List[Tuple[int, int]]):
+        """前面的阶段启动失败时，不再启动后面的阶段"""
+        now = datetime.now()
+        for execution_id, _ in members:
+            self.queue.finish(execution_id)
+            self.output_callbacks.pop(execution_id, None)
+            self._update_execution(execution_id, status="cancelled", finished_at=now,
+                                   error_message="Previous stage failed to start")
+            self._notify_finished(execution_id, "cancelled", None)
+    
+    def _launch(self, execution_id: int, script_id: int, payload,
+                stdin: Optional[int] = None, stdout: Optional[int] = None) -> bool:
+        """启动执行的进程，stdin/stdout 为管道链中相邻阶段的管道，返回是否启动成功"""
+        content, bytecode_path, parameters, timeout, limits = payload
+        try:
+            self._update_execution(execution_id, status="running",
+                                   started_at=datetime.now())
             
             # 设置环境变量
             env = os.environ.copy()
             if parameters:
                 env.update(parameters)
+            env["PYTHONPATH"] = os.pathsep.join(filter(None, [RUNTIME_DIR, env.get("PYTHONPATH")]))
+            attached = self._attachments.get(execution_id)
+            if attached:
+                env[ATTACHMENTS_ENV] = attached.manifest()
+            env.pop(RESULTS_FD_ENV, None)
             
-            # 启动进程
-            process = subprocess.Popen(
-                ["python", "-c", content],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                env=env,
-                text=True,
-                bufsize=1,
-                universal_newlines=True
-            )
+            # 每个执行一个 cgroup，按 cpu.weight 分配 CPU
+            cgroup = None
+            if self.cgroups:
+                cgroup = self.cgroups.create(f"exec-{execution_id}", limits)
+            self._limits[execution_id] = (limits, cgroup)
             
-            # 记录进程信息
-            self.running_processes[execution.id] = process
-            if output_callback:
-                self.output_callbacks[execution.id] = output_callback
+            # 排队期间字节码可能已被失效（脚本更新或删除）或按 LRU 淘汰，启动前重新取得路径
+            if bytecode_path and self.compile_cache:
+                try:
+                    bytecode_path = self.compile_cache.compile(content)
+                except OSError as e:
+                    logger.warning(f"Failed to recompile execution {execution_id}, "
+                                   f"running source: {str(e)}")
+                    bytecode_path = None
             
-            # 启动监控线程
-            monitor_thread = threading.Thread(
-                target=self._monitor_execution,
-                args=(execution.id, process, timeout)
-            )
-            monitor_thread.daemon = True
-            monitor_thread.start()
+            # 启动进程
+            spawned_at = time.monotonic()
+            results_r, results_w = os.pipe() if self.results_channel else (None, None)
+            try:
+                process = self._spawn(content, bytecode_path, env, limits, cgroup,
+                                      stdin, stdout, results_w)
+            except Exception:
+                if results_r is not None:
+                    os.close(results_r)
+                raise
+            finally:
+                # 子进程退出后记录通道读到 EOF
+                if results_w is not None:
+                    os.close(results_w)
+            self._timing[execution_id] = [spawned_at, script_id, False]
+            extra_streams = None
+            if results_r is not None:
+                extra_streams = {RESULTS_STREAM: os.fdopen(results_r, "rb", buffering=0)}
+                self._records[execution_id] = RecordCollector(execution_id, self.max_records,
+                                                              self.max_record_size)
             
-            logger.info(f"Started execution {execution.id} for script {script_id}")
-            return execution.id
+            # 记录进程信息，交给事件循环监控输出、退出与超时
+            self.running_processes[execution_id] = process
+            self._outputs[execution_id] = self._create_captures(execution_id)
+            callback = self._output_target(execution_id)
+            if callback:
+                # 回调在独立的投递线程中调用，慢消费者不阻塞事件循环
+                self._batchers[execution_id] = OutputBatcher(callback, background=True)
+            if self.resource_monitor:
+                self.resource_monitor.register(execution_id, process.pid)
+            self.reactor.register(execution_id, process, timeout,
+                                  self._on_output, self._on_exit, extra_streams)
             
+            logger.info(f"Started execution {execution_id} for script {script_id}")
+            return True
+        
         except Exception as e:
             logger.error(f"Failed to execute script: {str(e)}")
-            if execution:
-                execution.status = "failed"
-                execution.error = str(e)
-                execution.finished_at = datetime.now()
-                self.db.commit()
-            raise
+            self.queue.finish(execution_id)
+            self.output_callbacks.pop(execution_id, None)
+            self._release_cgroup(execution_id)
+            self._update_execution(execution_id, status="failed", error_message=str(e)[:255],
+                                   finished_at=datetime.now())
+            self._notify_finished(execution_id, "failed", None)
+            return False
+    
+    def _spawn(self, content: str, bytecode_path: Optional[str], env: Dict[str, str],
+               limits: Dict[str, int], cgroup: Optional[str] = None,
+               stdin: Optional[int] = None, stdout: Optional[int] = None,
+               results: Optional[int] = None):
+        """
+        启动脚本进程，有缓存的字节码时直接运行字节码，启用预热池时从 fork 服务创建
+        
+        资源限制与 cgroup 在子进程执行脚本前生效。指定 stdout 描述符时进程的 stdout 为 None。
+        results 为结构化记录通道的写端，子进程中的号码通过环境变量 SCRIPT_RESULTS_FD 传递。
+        """
+        rlimits = rlimit_settings(limits)
+        if self.warm_pool:
+            try:
+                started = time.perf_counter()
+                if bytecode_path:
+                    process = self.warm_pool.spawn(path=bytecode_path, env=env,
+                                                   rlimits=rlimits, cgroup=cgroup,
+                                                   stdin=stdin, stdout=stdout, results=results)
+                else:
+                    process = self.warm_pool.spawn(code=content, env=env,
+                                                   rlimits=rlimits, cgroup=cgroup,
+                                                   stdin=stdin, stdout=stdout, results=results)
+                self.metrics.spawn_seconds.observe(time.perf_counter() - started, mode="warm")
+                return process
+            except Exception as e:
+                logger.warning(f"Warm pool spawn failed, using cold start: {str(e)}")
+        
+        if bytecode_path:
+            args = [self.python, "-c", LOADER, bytecode_path]
+        else:
+            args = [self.python, "-c", content]
+        if results is not None:
+            env = dict(env)
+            env[RESULTS_FD_ENV] = str(results)
+        
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            args,
+            stdin=stdin,
+            stdout=subprocess.PIPE if stdout is None else stdout,
+            stderr=subprocess.PIPE,
+            env=env,
+            pass_fds=(results,) if results is not None else (),
+            preexec_fn=make_preexec(
+                rlimits, os.path.join(cgroup, "cgroup.procs") if cgroup else None)
+        )
+        elapsed = time.perf_counter() - started
+        self.metrics.spawn_seconds.observe(elapsed, mode="cold")
+        if self.warm_pool:
+            self.warm_pool.record_cold_spawn(elapsed)
+        return process
+    
+    def cancel_queued(self, execution_id: int) -> bool:
+        """取消尚在排队的执行（管道链的阶段取消整条链），已开始执行的返回 False 且不受影响"""
+        head = self._chain_heads.get(execution_id, execution_id)
+        if not self.queue.cancel(head):
+            return False
+        execution_ids = self._chains.pop(head, None) or [execution_id]
+        for cancelled_id in execution_ids:
+            self._chain_heads.pop(cancelled_id, None)
+            self.output_callbacks.pop(cancelled_id, None)
+            self._update_execution(cancelled_id, status="cancelled",
+                                   finished_at=datetime.now())
+            self._notify_finished(cancelled_id, "cancelled", None)
+            logger.info(f"Cancelled queued execution {cancelled_id}")
+        return True
     
     def stop_execution(self, execution_id: int):
-        """停止脚本执行"""
+        """停止脚本执行（排队中的执行直接取消）"""
+        if self.cancel_queued(execution_id) or self._stop_following(execution_id):
+            return
+        
         process = self.running_processes.get(execution_id)
         if process:
             try:
                 process.terminate()
-                time.sleep(1)
-                if process.poll() is None:
-                    process.kill()
+                # 1 秒后仍未退出则由事件循环强制结束
+                self.reactor.call_later(1, lambda: self._kill(execution_id))
                 
                 logger.info(f"Stopped execution {execution_id}")
             except Exception as e:
                 logger.error(f"Failed to stop execution {execution_id}: {str(e)}")
     
-    def _monitor_execution(self, execution_id: int,
-                          process: subprocess.Popen,
-                          timeout: int):
-        """监控脚本执行"""
-        output = []
-        error_output = []
-        
-        def read_output():
-            while True:
-                line = process.stdout.readline()
-                if not line:
-                    break
-                output.append(line)
-                callback = self.output_callbacks.get(execution_id)
-                if callback:
-                    callback(line)
-        
-        def read_error():
-            while True:
-                line = process.stderr.readline()
-                if not line:
-                    break
-                error_output.append(line)
-                callback = self.output_callbacks.get(execution_id)
-                if callback:
-                    callback(f"ERROR: {line}")
-        
-        # 启动输出读取线程
-        stdout_thread = threading.Thread(target=read_output)
-        stderr_thread = threading.Thread(target=read_error)
-        stdout_thread.daemon = True
-        stderr_thread.daemon = True
-        stdout_thread.start()
-        stderr_thread.start()
+    def shutdown(self):
+        """写完排队中的执行记录后停止后台线程（正在运行的执行不会被结束）"""
+        if self.metrics_server:
+            self.metrics_server.stop()
+        if self.resource_monitor:
+            self.resource_monitor.stop()
+        if self.warm_pool and self._owns_warm_pool:
+            self.warm_pool.stop()
+        self.reactor.stop()
+        self.writer.flush()
+        self.writer.stop()
+    
+    def _notify_finished(self, execution_id: int, status: str, exit_code: Optional[int]):
+        attached = self._attachments.pop(execution_id, None)
+        if attached:
+            attached.release()
+        shared = self._leading.pop(execution_id, None)
+        if shared:
+            self._complete_shared(shared, execution_id, status, exit_code)
+        callback = self.finished_callbacks.pop(execution_id, None)
+        if callback:
+            try:
+                callback(execution_id, status, exit_code)
+            except Exception as e:
+                logger.error(f"Finished callback failed for {execution_id}: {str(e)}")
+    
+    def _replay_cached(self, key: str, cached: CachedResult, script_id: int, priority: int,
+                       output_callback: Optional[Callable[[str], None]],
+                       finished_callback: Optional[Callable]) -> Optional[int]:
+        """
+        复用缓存的结果：新建执行记录并复制源执行的结果字段与输出摘要，不启动进程
+        
+        Returns:
+            新的执行ID，源执行已被删除时返回 None（缓存条目随之作废）
+        """
+        def replay(session):
+            now = datetime.now()
+            execution = ScriptExecution(script_id=script_id, status="queued", priority=priority,
+                                        started_at=now)
+            session.add(execution)
+            session.flush()
+            self._copy_result(session, cached.execution_id, execution.id, now)
+            return execution.id, self._read_output(session, execution.id) if output_callback else []
         
         try:
-            # 等待进程完成或超时
-            return_code = process.wait(timeout=timeout)
-            
-            # 更新执行记录
-            execution = self.db.query(ScriptExecution).get(execution_id)
-            execution.finished_at = datetime.now()
-            execution.output = "".join(output)
-            execution.error = "".join(error_output)
-            
-            if return_code == 0:
-                execution.status = "completed"
+            execution_id, texts = self.writer.submit(replay).result()
+        except LookupError:
+            self.result_cache.discard(key)
+            return None
+        self.metrics.result_cache.inc(result="hit")
+        logger.info(f"Execution {execution_id} reused the result of {cached.execution_id}")
+        for text in texts:
+            try:
+                output_callback(text)
+            except Exception as e:
+                logger.error(f"Output callback failed for {execution_id}: {str(e)}")
+        if finished_callback:
+            try:
+                finished_callback(execution_id, "completed", cached.exit_code)
+            except Exception as e:
+                logger.error(f"Finished callback failed for {execution_id}: {str(e)}")
+        return execution_id
+    
+    def _follow(self, shared: _SharedRun, script_id: int, priority: int,
+                output_callback: Optional[Callable[[str], None]],
+                finished_callback: Optional[Callable]) -> Optional[int]:
+        """
+        登记一个等待相同执行结果的请求
+
+        执行记录在 _cache_lock 之外写入，写入期间领头执行可能已经结束，此时删除记录，由调用方重新查找缓存。
+
+        Returns:
+            执行ID，领头执行已结束时返回 None
+        """
+        execution_id = self.writer.insert(
+            ScriptExecution(script_id=script_id, status="queued", priority=priority)).result()
+        with self._cache_lock:
+            waiting = self._shared_runs.get(shared.key) is shared
+            if waiting:
+                shared.followers.append((execution_id, priority, output_callback, finished_callback))
+                self._following[execution_id] = shared
+        if not waiting:
+            self.writer.submit(lambda session: session.execute(
+                delete(ScriptExecution).where(ScriptExecution.id == execution_id))).result()
+            return None
+        self.metrics.result_cache.inc(result="coalesced")
+        logger.info(f"Execution {execution_id} waits for an identical running execution")
+        return execution_id
+    
+    def _stop_following(self, execution_id: int) -> bool:
+        """取消等待中的执行"""
+        with self._cache_lock:
+            shared = self._following.pop(execution_id, None)
+            if shared is None:
+                return False
+            follower = next(item for item in shared.followers if item[0] == execution_id)
+            shared.followers.remove(follower)
+        self._update_execution(execution_id, status="cancelled", finished_at=datetime.now())
+        if follower[3]:
+            follower[3](execution_id, "cancelled", None)
+        logger.info(f"Cancelled waiting execution {execution_id}")
+        return True
+    
+    def _output_target(self, execution_id: int) -> Optional[Callable[[str], None]]:
+        """执行的输出回调，领头执行的输出同时转发给等待者"""
+        callback = self.output_callbacks.get(execution_id)
+        shared = self._leading.get(execution_id)
+        if shared is None:
+            return callback
+        
+        def fan_out(text: str):
+            if callback:
+                callback(text)
+            for follower_id, _, follower_callback, _ in list(shared.followers):
+                if follower_callback:
+                    try:
+                        follower_callback(text)
+                    except Exception as e:
+                        logger.error(f"Output callback failed for {follower_id}: {str(e)}")
+        return fan_out
+    
+    def _complete_shared(self, shared: _SharedRun, execution_id: Optional[int],
+                         status: str, exit_code: Optional[int]):
+        """领头执行结束：成功的结果写入缓存，等待者复用同一结果"""
+        size = self._result_sizes.pop(execution_id, None)
+        if status == "completed" and size is not None:
+            self.result_cache.put(shared.key, CachedResult(execution_id, shared.script_id,
+                                                           exit_code, size, time.time()))
+        with self._cache_lock:
+            if status == "cancelled" and shared.followers and shared.payload:
+                self._promote(shared)
+                return
+            if self._shared_runs.get(shared.key) is shared:
+                del self._shared_runs[shared.key]
+            followers = list(shared.followers)
+            for follower in followers:
+                self._following.pop(follower[0], None)
+        if not followers:
+            return
+        
+        if execution_id is None:
+            for follower_id, _, _, _ in followers:
+                self._update_execution(follower_id, status="failed", finished_at=datetime.now(),
+                                       error_message="Identical execution failed to start")
+        else:
+            def copy_results(session):
+                now = datetime.now()
+                for follower_id, _, _, _ in followers:
+                    self._copy_result(session, execution_id, follower_id, finished_at=now)
+            self.writer.submit(copy_results)
+        for follower_id, _, _, follower_finished in followers:
+            if follower_finished:
+                try:
+                    follower_finished(follower_id, status, exit_code)
+                except Exception as e:
+                    logger.error(f"Finished callback failed for {follower_id}: {str(e)}")
+    
+    def _promote(self, shared: _SharedRun):
+        """领头执行被取消时，第一个等待者成为新的领头执行并进入队列（持有 _cache_lock 时调用）"""
+        execution_id, priority, output_callback, finished_callback = shared.followers.pop(0)
+        self._following.pop(execution_id, None)
+        shared.execution_id = execution_id
+        self._leading[execution_id] = shared
+        if output_callback:
+            self.output_callbacks[execution_id] = output_callback
+        if finished_callback:
+            self.finished_callbacks[execution_id] = finished_callback
+        self.queue.push(execution_id, shared.script_id, priority, payload=shared.payload)
+        self.reactor.call_later(0, self._dispatch)
+        logger.info(f"Execution {execution_id} takes over a cancelled identical execution")
+    
+    @staticmethod
+    def _copy_result(session, source_id: int, target_id: int,
+                     started_at: Optional[datetime] = None,
+                     finished_at: Optional[datetime] = None):
+        """把源执行的结果字段、输出摘要与结构化记录复制到目标执行（在写入线程中调用）"""
+        columns = [getattr(ScriptExecution, name) for name in RESULT_COLUMNS]
+        row = session.execute(select(ScriptExecution.started_at, *columns).where(
+            ScriptExecution.id == source_id)).first()
+        if row is None:
+            raise LookupError(f"Execution {source_id} not found")
+        fields = dict(zip(RESULT_COLUMNS, row[1:]))
+        session.execute(update(ScriptExecution).where(ScriptExecution.id == target_id).values(
+            started_at=started_at or row[0], finished_at=finished_at or datetime.now(),
+            cached_from=source_id, **fields))
+        session.execute(insert(ExecutionOutputChunk).from_select(
+            ["execution_id", "stream", "seq", "data"],
+            select(literal(target_id), ExecutionOutputChunk.stream, ExecutionOutputChunk.seq,
+                   ExecutionOutputChunk.data).where(ExecutionOutputChunk.execution_id == source_id)))
+        session.execute(insert(ExecutionRecord).from_select(
+            ["execution_id", "seq", "kind", "name", "value", "step", "data", "created_at"],
+            select(literal(target_id), ExecutionRecord.seq, ExecutionRecord.kind,
+                   ExecutionRecord.name, ExecutionRecord.value, ExecutionRecord.step,
+                   ExecutionRecord.data, ExecutionRecord.created_at).where(
+                ExecutionRecord.execution_id == source_id)))
+    
+    @staticmethod
+    def _read_output(session, execution_id: int) -> List[str]:
+        """按输出回调的格式读取输出摘要，stderr 每行加 ERROR: 前缀"""
+        texts = []
+        for stream in ("stdout", "stderr"):
+            text = "".join(session.execute(
+                select(ExecutionOutputChunk.data).where(
+                    ExecutionOutputChunk.execution_id == execution_id,
+                    ExecutionOutputChunk.stream == stream).order_by(ExecutionOutputChunk.seq)
+            ).scalars())
+            if text and stream == "stderr":
+                text = "".join(f"ERROR: {line}" for line in text.splitlines(keepends=True))
+            if text:
+                texts.append(text)
+        return texts
+    
+    def _kill(self, execution_id: int):
+        """强制结束未响应 SIGTERM 的执行（在事件循环线程中调用）"""
+        if execution_id in self.running_processes:
+            self.metrics.kills.inc()
+            self.reactor.kill(execution_id)
+    
+    def _write_metrics_file(self):
+        """定期写入指标文件（在事件循环线程中调用）"""
+        try:
+            self.metrics.registry.write_file(self.metrics_file)
+        except OSError as e:
+            logger.error(f"Failed to write metrics file: {str(e)}")
+        self.reactor.call_later(self.metrics_file_interval, self._write_metrics_file)
+    
+    def _release_cgroup(self, execution_id: int):
+        """删除执行的 cgroup，后代进程尚未退出时稍后重试"""
+        _, cgroup = self._limits.pop(execution_id, ({}, None))
+        if cgroup and not self.cgroups.remove(cgroup):
+            self.reactor.call_later(1, lambda: self.cgroups.remove(cgroup))
+    
+    def _create_captures(self, execution_id: int):
+        """创建 stdout/stderr 的有界输出捕获"""
+        base = os.path.join(self.outputs_dir, str(execution_id))
+        return (OutputCapture(f"{base}.stdout.log", self.max_output_size),
+                OutputCapture(f"{base}.stderr.log", self.max_output_size))
+    
+    def _store_output(self, execution_id: int, stream: str, text: str):
+        """把输出摘要分块写入输出表"""
+        if not text:
+            return
+        chunks = [
+            ExecutionOutputChunk(execution_id=execution_id, stream=stream, seq=seq,
+                                 data=text[start:start + OUTPUT_CHUNK_SIZE])
+            for seq, start in enumerate(range(0, len(text), OUTPUT_CHUNK_SIZE))
+        ]
+        self.writer.submit(lambda session: session.add_all(chunks))
+    
+    def _store_resource_usage(self, execution_id: int, usage: ResourceUsage):
+        """保存资源采样的时间序列"""
+        samples = ExecutionResourceSamples(execution_id=execution_id,
+                                           sample_count=usage.sample_count,
+                                           **usage.encode())
+        self.writer.submit(lambda session: session.add(samples))
+    
+    def _on_output(self, execution_id: int, stream: str, text: str):
+        """收集输出（在事件循环线程中调用）"""
+        if stream == RESULTS_STREAM:
+            self._on_records(execution_id, text)
+            return
+        output, error_output = self._outputs[execution_id]
+        timing = self._timing.get(execution_id)
+        if timing and not timing[2]:
+            timing[2] = True
+            self.metrics.first_output_seconds.observe(time.monotonic() - timing[0])
+        capture = output if stream == "stdout" else error_output
+        size = capture.total_size
+        capture.write(text)
+        self.metrics.output_bytes.inc(capture.total_size - size, stream=stream)
+        if stream == "stderr":
+            text = self._prefix_errors(execution_id, text)
+        
+        batcher = self._batchers.get(execution_id)
+        if batcher and batcher.push(text) and execution_id not in self._flush_scheduled:
+            # 剩余内容在刷新间隔后由事件循环发送
+            self._flush_scheduled.add(execution_id)
+            self.reactor.call_later(batcher.flush_interval,
+                                    lambda: self._flush_output(execution_id))
+    
+    def _prefix_errors(self, execution_id: int, text: str) -> str:
+        """stderr 每行加 ERROR: 前缀，分段交出的过长行只在第一段加"""
+        lines = text.splitlines(keepends=True)
+        prefixed = "".join(f"ERROR: {line}" for line in lines)
+        if execution_id in self._stderr_midline:
+            self._stderr_midline.discard(execution_id)
+            prefixed = prefixed[len("ERROR: "):]
+        if not text.endswith(("\n", "\r")):
+            self._stderr_midline.add(execution_id)
+        return prefixed
+    
+    def _on_records(self, execution_id: int, text: str):
+        """解析结构化记录，攒批写入（在事件循环线程中调用）"""
+        collector = self._records.get(execution_id)
+        if collector is None:
+            return
+        collector.feed(text)
+        if collector.pending >= RECORD_BATCH_SIZE:
+            self._flush_records(execution_id)
+        elif execution_id not in self._records_scheduled:
+            self._records_scheduled.add(execution_id)
+            self.reactor.call_later(RECORD_FLUSH_INTERVAL,
+                                    lambda: self._flush_records(execution_id))
+    
+    def _flush_records(self, execution_id: int):
+        """写入待写入的记录与最新进度（在事件循环线程中调用）"""
+        self._records_scheduled.discard(execution_id)
+        collector = self._records.get(execution_id)
+        if collector is None:
+            return
+        rows, progress = collector.take()
+        if rows:
+            self.writer.submit(lambda session: session.execute(insert(ExecutionRecord), rows))
+        if progress:
+            self._update_execution(execution_id, **progress)
+    
+    def _flush_output(self, execution_id: int):
+        """定时刷新合并的输出（在事件循环线程中调用）"""
+        self._flush_scheduled.discard(execution_id)
+        batcher = self._batchers.get(execution_id)
+        if batcher:
+            batcher.flush(force=True)
+    
+    def _on_exit(self, execution_id: int, return_code: int, timed_out: bool):
+        """更新执行记录（在事件循环线程中调用）"""
+        output, error_output = self._outputs.pop(execution_id)
+        self._stderr_midline.discard(execution_id)
+        batcher = self._batchers.pop(execution_id, None)
+        usage = self.resource_monitor.unregister(execution_id) if self.resource_monitor else None
+        status = "failed"
+        try:
+            output.close()
+            error_output.close()
+            error_message = None
+            limits, cgroup = self._limits.get(execution_id, ({}, None))
+            limit_status = None
+            if timed_out:
+                status = "timeout"
+                error_message = "Execution timeout"
             else:
-                execution.status = "failed"
+                limit_status = classify_exit(
+                    return_code, limits, error_output.summary()[-4096:],
+                    self.cgroups.events(cgroup) if cgroup else None,
+                    usage.cpu_seconds if usage else None
+                )
+                if limit_status:
+                    status = limit_status
+                    error_message = "Resource limit exceeded"
+                else:
+                    status = "completed" if return_code == 0 else "failed"
             
-            self.db.commit()
-            logger.info(f"Execution {execution_id} finished with status {execution.status}")
-            
-        except subprocess.TimeoutExpired:
-            process.kill()
-            execution = self.db.query(ScriptExecution).get(execution_id)
-            execution.status = "timeout"
-            execution.finished_at = datetime.now()
-            execution.output = "".join(output)
-            execution.error = "Execution timeout"
-            self.db.commit()
-            logger.warning(f"Execution {execution_id} timeout")
+            self._store_output(execution_id, "stdout", output.summary())
+            self._store_output(execution_id, "stderr", error_output.summary())
+            collector = self._records.get(execution_id)
+            if collector:
+                collector.finish()
+                self._flush_records(execution_id)
+                if collector.invalid or collector.dropped:
+                    logger.warning(f"Execution {execution_id} records: {collector.count} stored, "
+                                   f"{collector.invalid} invalid, {collector.dropped} dropped")
+            resources = {}
+            if usage and usage.sample_count:
+                self._store_resource_usage(execution_id, usage)
+                resources = usage.summary()
+            self._update_execution(execution_id, status=status,
+                                   exit_code=return_code,
+                                   error_message=error_message,
+                                   output_file=output.file_path,
+                                   error_file=error_output.file_path,
+                                   output_size=output.total_size,
+                                   error_size=error_output.total_size,
+                                   finished_at=datetime.now(),
+                                   **resources)
+            self.metrics.executions.inc(status=status)
+            if execution_id in self._leading:
+                self._result_sizes[execution_id] = output.total_size + error_output.total_size
+            if timed_out:
+                self.metrics.timeouts.inc()
+            timing = self._timing.get(execution_id)
+            if timing:
+                self.metrics.duration_seconds.observe(time.monotonic() - timing[0],
+                                                      script_id=timing[1])
+            if timed_out or limit_status:
+                logger.warning(f"Execution {execution_id} finished with status {status}")
+            else:
+                logger.info(f"Execution {execution_id} finished with status {status}")
+        
+        except Exception as e:
+            logger.error(f"Failed to record execution {execution_id} result: {str(e)}")
         
         finally:
             # 清理资源
             self.running_processes.pop(execution_id, None)
-            self.output_callbacks.pop(execution_id, None) 
\ No newline at end of file
+            self.output_callbacks.pop(execution_id, None)
+            self._records.pop(execution_id, None)
+            self._timing.pop(execution_id, None)
+            self._release_cgroup(execution_id)
+            
+            # 释放执行槽并启动后续排队的执行
+            self.queue.finish(execution_id)
+            if batcher:
+                self._finish_after_delivery(batcher, execution_id, status, return_code)
+            else:
+                self._notify_finished(execution_id, status, return_code)
+            self._dispatch()
+    
+    def _finish_after_delivery(self, batcher: OutputBatcher, execution_id: int,
+                               status: str, exit_code: Optional[int]):
+        """剩余输出送达消费者后再回到事件循环通知执行结束，回调看到的输出总在结束之前"""
+        def delivered():
+            self.delivered_output_bytes += batcher.delivered_bytes
+            self.dropped_output_bytes += batcher.dropped_bytes
+            self._notify_finished(execution_id, status, exit_code)
+        
+        batcher.close(lambda: self.reactor.call_later(0, delivered))
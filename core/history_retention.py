@@ -0,0 +1,56 @@
+import threading
+from typing import Optional
+from core.config import Config
+from core.script_manager import ScriptManager
+from database.db_manager import SessionLocal
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class HistoryRetention:
+    """定期清理执行历史的后台任务"""
+    
+    def __init__(self, session_factory=SessionLocal,
+                 keep_days: Optional[int] = None,
+                 keep_per_script: Optional[int] = None,
+                 interval: Optional[float] = None):
+        config = Config()
+        self.session_factory = session_factory
+        self.keep_days = keep_days if keep_days is not None else \
+            config.get_system_config("history_retention_days", 30)
+        self.keep_per_script = keep_per_script if keep_per_script is not None else \
+            config.get_system_config("history_keep_per_script", 100)
+        self.interval = interval if interval is not None else \
+            config.get_system_config("history_compact_interval", 3600)
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def run_once(self) -> int:
+        """执行一次清理，返回删除的执行记录数"""
+        db = self.session_factory()
+        try:
+            return ScriptManager(db).compact_execution_history(self.keep_days, self.keep_per_script)
+        finally:
+            db.close()
+    
+    def start(self):
+        """启动后台清理线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="HistoryRetention")
+        self._thread.daemon = True
+        self._thread.start()
+    
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+    
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"History retention failed: {str(e)}")
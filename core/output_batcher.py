@@ -0,0 +1,164 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, List, Optional
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class OutputBatcher:
+    """
+    输出合并器
+
+    将逐行/逐块的输出合并成帧，累计达到 max_frame_size 或距上次刷新超过
+    flush_interval 时才交给消费者。尚未送达的内容超过 max_pending 时丢弃新输出，
+    并在恢复后插入一条丢弃标记，避免慢消费者（如 GUI）被输出淹没。
+
+    background 为 True 时帧交给该消费者独占的投递线程，push/flush 只做入队，
+    调用方（如执行器的事件循环线程）不会被慢消费者阻塞；已入队未送达的帧同样计入 max_pending。
+    """
+
+    def __init__(self, deliver: Callable[[str], None],
+                 max_frame_size: int = 65536,
+                 flush_interval: float = 0.05,
+                 max_pending: int = 262144,
+                 background: bool = False):
+        self.deliver = deliver
+        self.max_frame_size = max_frame_size
+        self.flush_interval = flush_interval
+        self.max_pending = max(max_pending, max_frame_size)
+        self.background = background
+
+        self._lock = threading.Lock()
+        self._pending: List[str] = []
+        self._pending_size = 0
+        self._dropping = 0
+        self._last_flush = time.monotonic()
+
+        # 投递线程的帧队列：(帧, 字节数)
+        self._ready = threading.Condition(self._lock)
+        self._frames: deque = deque()
+        self._queued_size = 0
+        self._closed = False
+        self._on_closed: Optional[Callable[[], None]] = None
+        self._thread: Optional[threading.Thread] = None
+
+        # 统计
+        self.delivered_bytes = 0
+        self.dropped_bytes = 0
+        self.frames = 0
+
+    def push(self, text: str) -> bool:
+        """
+        追加输出
+
+        Returns:
+            是否还有未刷新的内容（调用方据此安排定时刷新）
+        """
+        size = len(text.encode("utf-8"))
+        with self._lock:
+            if self._pending_size + self._queued_size + size > self.max_pending:
+                self._dropping += size
+                self.dropped_bytes += size
+            else:
+                if self._dropping:
+                    self._pending.append(self._drop_marker())
+                    self._dropping = 0
+                self._pending.append(text)
+                self._pending_size += size
+            due = (self._pending_size >= self.max_frame_size or
+                   time.monotonic() - self._last_flush >= self.flush_interval)
+        if due:
+            self.flush(force=True)
+        return self.has_pending
+
+    def flush(self, force: bool = False) -> bool:
+        """
+        刷新待发送内容
+
+        Args:
+            force: 为 False 时只在到达刷新间隔后刷新
+
+        Returns:
+            是否发送（或交给投递线程）了一帧
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_flush < self.flush_interval:
+                return False
+            frame = self._take_frame(now)
+            if frame is None:
+                return False
+            if self.background:
+                self._enqueue(frame)
+                return True
+        self.deliver(frame)
+        return True
+
+    def close(self, on_closed: Optional[Callable[[], None]] = None):
+        """
+        不再接收输出：刷新剩余内容，全部送达后调用 on_closed
+
+        background 为 True 时 on_closed 在投递线程中调用（没有启动过投递线程时在调用方线程中调用）。
+        """
+        self.flush(force=True)
+        with self._lock:
+            self._closed = True
+            self._on_closed = on_closed
+            thread = self._thread
+            self._ready.notify()
+        if thread is None and on_closed:
+            on_closed()
+
+    @property
+    def has_pending(self) -> bool:
+        with self._lock:
+            return bool(self._pending) or bool(self._dropping)
+
+    def _take_frame(self, now: float) -> Optional[str]:
+        """取出待发送内容（持有 _lock 时调用）"""
+        if self._dropping:
+            self._pending.append(self._drop_marker())
+            self._dropping = 0
+        self._last_flush = now
+        if not self._pending:
+            return None
+        frame = "".join(self._pending)
+        self.delivered_bytes += self._pending_size
+        self._pending = []
+        self._pending_size = 0
+        self.frames += 1
+        return frame
+
+    def _enqueue(self, frame: str):
+        """把一帧交给投递线程（持有 _lock 时调用）"""
+        size = len(frame.encode("utf-8"))
+        self._frames.append((frame, size))
+        self._queued_size += size
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._deliver_loop, name="OutputDelivery")
+            self._thread.daemon = True
+            self._thread.start()
+        self._ready.notify()
+
+    def _deliver_loop(self):
+        while True:
+            with self._lock:
+                while not self._frames and not self._closed:
+                    self._ready.wait()
+                if not self._frames:
+                    on_closed = self._on_closed
+                    break
+                frame, size = self._frames.popleft()
+            try:
+                self.deliver(frame)
+            except Exception as e:
+                logger.error(f"Output consumer failed: {str(e)}")
+            with self._lock:
+                self._queued_size -= size
+        if on_closed:
+            on_closed()
+
+    def _drop_marker(self) -> str:
+        return f"\n[... {self._dropping} bytes of output dropped ...]\n"
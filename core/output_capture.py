@@ -0,0 +1,94 @@
+import os
+from collections import deque
+from typing import Optional
+from utils.file_utils import ensure_directory
+
+
+class OutputCapture:
+    """
+    有界输出捕获
+
+    内存中只保留输出的头部和尾部（合计不超过 max_size 字节）。
+    输出超过 max_size 后，完整内容写入磁盘文件，数据库只保存摘要和文件路径。
+    写入的文本不必是完整的行，没有换行的长输出由事件循环分段写入，内存占用同样有界。
+    """
+
+    def __init__(self, path: str, max_size: int):
+        self.path = path
+        self.max_size = max(0, max_size)
+        self.head_limit = self.max_size // 2
+        self.tail_limit = self.max_size - self.head_limit
+
+        self.head = bytearray()
+        self.tail = deque()
+        self.tail_size = 0
+        self.total_size = 0
+        self._file = None
+        self.spilled = False
+
+    def write(self, text: str):
+        """追加输出"""
+        data = text.encode("utf-8")
+        if not data:
+            return
+        self.total_size += len(data)
+
+        if self._file is None and self.total_size > self.max_size:
+            self._spill()
+        if self._file is not None:
+            self._file.write(data)
+
+        room = self.head_limit - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if data:
+            self._append_tail(data)
+
+    def close(self):
+        """关闭溢出文件"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @property
+    def file_path(self) -> Optional[str]:
+        """完整输出文件路径，未溢出时为 None"""
+        return self.path if self.spilled else None
+
+    def summary(self) -> str:
+        """返回用于保存到数据库的输出摘要"""
+        head = bytes(self.head).decode("utf-8", errors="replace")
+        tail = b"".join(self.tail).decode("utf-8", errors="replace")
+        omitted = self.total_size - len(self.head) - self.tail_size
+        if omitted <= 0:
+            return head + tail
+        return (f"{head}\n... [{omitted} bytes omitted, "
+                f"full output in {self.path}] ...\n{tail}")
+
+    def _append_tail(self, data: bytes):
+        if len(data) >= self.tail_limit:
+            self.tail.clear()
+            data = data[len(data) - self.tail_limit:] if self.tail_limit else b""
+            self.tail_size = 0
+        if data:
+            self.tail.append(data)
+            self.tail_size += len(data)
+        while self.tail_size > self.tail_limit:
+            excess = self.tail_size - self.tail_limit
+            first = self.tail[0]
+            if len(first) <= excess:
+                self.tail.popleft()
+                self.tail_size -= len(first)
+            else:
+                self.tail[0] = first[excess:]
+                self.tail_size -= excess
+
+    def _spill(self):
+        """内存中的内容仍是完整输出，先写入文件，之后的输出直接追加"""
+        ensure_directory(os.path.dirname(self.path) or ".")
+        self._file = open(self.path, "wb")
+        self._file.write(bytes(self.head))
+        for chunk in self.tail:
+            self._file.write(chunk)
+        self.spilled = True
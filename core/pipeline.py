@@ -0,0 +1,310 @@
+"""
+流水线
+
+流水线由多个阶段组成，每个阶段运行一个脚本。阶段之间有两种依赖：
+    input  上游阶段的 stdout 通过管道直接接到本阶段的 stdin，两者同时运行，
+           数据在进程之间流动，不经过执行器、数据库与界面，内存占用与数据量无关
+    after  等待所列阶段全部成功后再启动
+通过 input 相连的阶段组成一条管道链（见 ScriptExecutor.execute_chain），整体排队与启动；
+一个阶段的 stdout 只能接给一个下游阶段。没有依赖关系的链并行运行，受执行器的并发上限约束。
+
+每个阶段对应一条执行记录（pipeline_run_id 与 stage 字段），因上游失败而未运行的阶段记为 skipped，
+流水线停止时未启动的阶段记为 cancelled。
+"""
+import json
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set
+
+from core.config import Config
+from core.executor import ChainStage
+from database.db_manager import SessionLocal
+from database.models import Pipeline, PipelineRun, Script, ScriptExecution
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def validate_stages(stages: List[dict]) -> List[List[dict]]:
+    """
+    检查阶段定义，无效时抛出 ValueError
+
+    Returns:
+        按 input 连接分组的管道链，每条链中的阶段按数据流向排列
+    """
+    if not stages:
+        raise ValueError("Pipeline needs at least one stage")
+    by_name = {}
+    for stage in stages:
+        name = stage.get("name")
+        if not name or not isinstance(name, str):
+            raise ValueError("Every stage needs a name")
+        if name in by_name:
+            raise ValueError(f"Duplicate stage name {name!r}")
+        if not isinstance(stage.get("script_id"), int):
+            raise ValueError(f"Stage {name!r} needs a script")
+        by_name[name] = stage
+
+    consumers = {}
+    for stage in stages:
+        source = stage.get("input")
+        if source is None:
+            continue
+        if source not in by_name or source == stage["name"]:
+            raise ValueError(f"Stage {stage['name']!r} reads from unknown stage {source!r}")
+        if source in consumers:
+            raise ValueError(f"Stage {source!r} output is read by both "
+                             f"{consumers[source]!r} and {stage['name']!r}")
+        consumers[source] = stage["name"]
+
+    chains = []
+    chain_of = {}
+    for stage in stages:
+        if stage.get("input") is not None:
+            continue
+        chain = [stage]
+        while chain[-1]["name"] in consumers:
+            chain.append(by_name[consumers[chain[-1]["name"]]])
+        for member in chain:
+            chain_of[member["name"]] = len(chains)
+        chains.append(chain)
+    if len(chain_of) < len(stages):
+        raise ValueError("Stage inputs form a cycle")
+
+    for stage in stages:
+        for name in stage.get("after") or []:
+            if name not in by_name:
+                raise ValueError(f"Stage {stage['name']!r} waits for unknown stage {name!r}")
+            if chain_of[name] == chain_of[stage["name"]]:
+                raise ValueError(f"Stage {stage['name']!r} cannot wait for {name!r}, "
+                                 f"they are connected by pipes and run together")
+    _chain_dependencies(chains, chain_of)
+    return chains
+
+
+def _chain_dependencies(chains: List[List[dict]], chain_of: Dict[str, int]) -> List[Set[int]]:
+    """各链等待的链，存在环时抛出 ValueError"""
+    dependencies = [{chain_of[name] for stage in chain for name in stage.get("after") or []}
+                    for chain in chains]
+    remaining = {index: set(deps) for index, deps in enumerate(dependencies)}
+    while remaining:
+        ready = [index for index, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError("Stage dependencies form a cycle")
+        for index in ready:
+            del remaining[index]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    return dependencies
+
+
+class _RunState:
+    """一次流水线运行的进度"""
+
+    def __init__(self, run_id: int, chains: List[List[dict]], parameters: Dict[str, str],
+                 priority: int, output_callback, finished_callback):
+        self.run_id = run_id
+        self.chains = chains
+        chain_of = {stage["name"]: index for index, chain in enumerate(chains) for stage in chain}
+        self.dependencies = _chain_dependencies(chains, chain_of)
+        self.parameters = parameters
+        self.priority = priority
+        self.output_callback = output_callback
+        self.finished_callback = finished_callback
+        # 链的状态：None 未启动，"running"，"completed"，"failed"，"skipped"，"cancelled"
+        self.states: List[Optional[str]] = [None] * len(chains)
+        self.pending = [len(chain) for chain in chains]
+        self.executions: Dict[str, int] = {}
+        self.failed = False
+        self.stopped = False
+        self.done = False
+
+
+class PipelineRunner:
+    """
+    流水线运行器
+
+    依赖满足的链立即提交给执行器，阶段结束的回调推进后续的链。
+    executor 为 ScriptExecutor（管道链要求各阶段在同一台机器上运行）。
+    """
+
+    def __init__(self, executor, session_factory=SessionLocal):
+        self.executor = executor
+        self.session_factory = session_factory
+        self.default_timeout = Config().get_system_config("max_execution_time", 3600)
+        self._lock = threading.Lock()
+        self._runs: Dict[int, _RunState] = {}
+
+    def run(self, pipeline_id: int, parameters: Optional[Dict[str, str]] = None,
+            priority: int = 0,
+            output_callback: Optional[Callable[[str, str], None]] = None,
+            finished_callback: Optional[Callable[[int, str], None]] = None) -> int:
+        """
+        启动流水线
+
+        Args:
+            pipeline_id: 流水线ID
+            parameters: 传给每个阶段的参数，阶段定义中的同名参数优先
+            priority: 各阶段的执行优先级
+            output_callback: 输出回调 (阶段名, 文本)，只包含各链最后一个阶段的 stdout 与各阶段的 stderr
+            finished_callback: 流水线结束时回调 (run_id, status)
+
+        Returns:
+            run_id: 流水线运行ID
+        """
+        db = self.session_factory()
+        try:
+            pipeline = db.get(Pipeline, pipeline_id)
+            if pipeline is None:
+                raise ValueError(f"Pipeline {pipeline_id} not found")
+            chains = validate_stages(json.loads(pipeline.stages))
+            script_ids = {stage["script_id"] for chain in chains for stage in chain}
+            scripts = {row.id: (row.content, row.resource_limits) for row in db.query(
+                Script.id, Script.content, Script.resource_limits).filter(Script.id.in_(script_ids))}
+        finally:
+            db.close()
+        missing = script_ids - set(scripts)
+        if missing:
+            raise ValueError(f"Scripts not found: {', '.join(map(str, sorted(missing)))}")
+        for chain in chains:
+            for stage in chain:
+                content, limits = scripts[stage["script_id"]]
+                stage["content"] = content
+                stage["limits"] = json.loads(limits) if limits else None
+
+        run_id = self.executor.writer.insert(PipelineRun(
+            pipeline_id=pipeline_id, status="running",
+            parameters=json.dumps(parameters) if parameters else None
+        )).result()
+        state = _RunState(run_id, chains, parameters or {}, priority,
+                          output_callback, finished_callback)
+        with self._lock:
+            self._runs[run_id] = state
+        logger.info(f"Started pipeline {pipeline_id} run {run_id} with {len(chains)} chains")
+        self._advance(state)
+        return run_id
+
+    def stop(self, run_id: int):
+        """停止流水线：未启动的阶段记为取消，运行中的阶段被停止"""
+        with self._lock:
+            state = self._runs.get(run_id)
+            if state is None:
+                return
+            state.stopped = True
+            executions = list(state.executions.values())
+        # 先处理未启动的链，避免停止运行中的阶段后又启动下游
+        self._advance(state)
+        for execution_id in executions:
+            self.executor.stop_execution(execution_id)
+
+    def _advance(self, state: _RunState):
+        """提交依赖已满足的链，跳过依赖失败的链，全部结束后完成运行"""
+        with self._lock:
+            ready = []
+            skipped = []
+            changed = True
+            while changed:
+                changed = False
+                for index, chain_state in enumerate(state.states):
+                    if chain_state is not None:
+                        continue
+                    dep_states = [state.states[dep] for dep in state.dependencies[index]]
+                    if state.stopped:
+                        state.states[index] = "cancelled"
+                    elif any(dep in ("failed", "skipped", "cancelled") for dep in dep_states):
+                        state.states[index] = "skipped"
+                    elif all(dep == "completed" for dep in dep_states):
+                        state.states[index] = "running"
+                        ready.append(index)
+                        continue
+                    else:
+                        continue
+                    skipped.append(index)
+                    changed = True
+            finished = not state.done and all(chain_state not in (None, "running")
+                                              for chain_state in state.states)
+            if finished:
+                state.done = True
+                self._runs.pop(state.run_id, None)
+
+        if skipped:
+            self._record_skipped(state, skipped)
+        for index in ready:
+            self._submit(state, index)
+        if finished:
+            self._finish(state)
+
+    def _submit(self, state: _RunState, index: int):
+        stages = []
+        for stage in state.chains[index]:
+            parameters = dict(state.parameters)
+            parameters.update(stage.get("parameters") or {})
+            stages.append(ChainStage(
+                stage["script_id"], stage["content"], parameters,
+                stage.get("timeout") or self.default_timeout,
+                output_callback=self._stage_output(state, stage["name"]),
+                limits=stage["limits"],
+                finished_callback=lambda execution_id, status, exit_code:
+                    self._on_stage_finished(state, index, status),
+                record_fields={"pipeline_run_id": state.run_id, "stage": stage["name"]}
+            ))
+        try:
+            execution_ids = self.executor.execute_chain(stages, state.priority)
+        except Exception as e:
+            logger.error(f"Pipeline run {state.run_id} failed to submit stages: {str(e)}")
+            with self._lock:
+                state.states[index] = "failed"
+                state.failed = True
+            self._advance(state)
+            return
+        with self._lock:
+            for stage, execution_id in zip(state.chains[index], execution_ids):
+                state.executions[stage["name"]] = execution_id
+            stopped = state.stopped
+        if stopped:
+            # 提交期间流水线被停止
+            for execution_id in execution_ids:
+                self.executor.stop_execution(execution_id)
+
+    def _stage_output(self, state: _RunState, name: str) -> Optional[Callable[[str], None]]:
+        if state.output_callback is None:
+            return None
+        return lambda text: state.output_callback(name, text)
+
+    def _on_stage_finished(self, state: _RunState, index: int, status: str):
+        with self._lock:
+            state.pending[index] -= 1
+            if status != "completed":
+                state.failed = True
+                state.states[index] = "failed"
+            if state.pending[index] > 0:
+                return
+            if state.states[index] == "running":
+                state.states[index] = "completed"
+        self._advance(state)
+
+    def _record_skipped(self, state: _RunState, indexes: List[int]):
+        """为未运行的阶段写入执行记录，执行历史中每个阶段都有状态"""
+        now = datetime.now()
+        executions = [
+            ScriptExecution(script_id=stage["script_id"], status=state.states[index],
+                            pipeline_run_id=state.run_id, stage=stage["name"], finished_at=now)
+            for index in indexes for stage in state.chains[index]
+        ]
+        self.executor.writer.submit(lambda session: session.add_all(executions))
+
+    def _finish(self, state: _RunState):
+        if state.stopped:
+            status = "cancelled"
+        elif state.failed:
+            status = "failed"
+        else:
+            status = "completed"
+        self.executor.writer.update(PipelineRun, state.run_id, status=status,
+                                    finished_at=datetime.now())
+        logger.info(f"Pipeline run {state.run_id} finished with status {status}")
+        if state.finished_callback:
+            try:
+                state.finished_callback(state.run_id, status)
+            except Exception as e:
+                logger.error(f"Finished callback failed for pipeline run {state.run_id}: {str(e)}")
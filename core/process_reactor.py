@@ -0,0 +1,383 @@
+import codecs
+import heapq
+import itertools
+import os
+import queue
+import selectors
+import socket
+import subprocess
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 进程退出后等待管道读完的宽限时间（子进程的后代可能仍持有管道）
+DRAIN_GRACE = 2.0
+# 不支持 pidfd 时轮询进程退出的间隔
+POLL_INTERVAL = 0.05
+READ_SIZE = 65536
+# 不完整的行超过该字符数时不再等待换行，作为一段输出交出
+MAX_PARTIAL = READ_SIZE
+
+OutputHandler = Callable[[Any, str, str], None]
+ExitHandler = Callable[[Any, int, bool], None]
+
+
+class _Stream:
+    """单个输出管道的读取状态"""
+
+    def __init__(self, name: str, pipe):
+        self.name = name
+        self.pipe = pipe
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        # 不完整的行按读取的片段保存，遇到换行时才拼接，避免每次读取都复制整个缓冲
+        self.pending: List[str] = []
+        self.pending_size = 0
+        self.closed = False
+
+    def feed(self, data: bytes, final: bool = False) -> str:
+        """
+        解码数据，返回完整的行，不完整的行留到下次
+
+        不完整的行超过 MAX_PARTIAL 个字符时直接返回，没有换行的输出也只占用有界的内存。
+        """
+        text = self.decoder.decode(data, final)
+        cut = len(text) if final else text.rfind("\n") + 1
+        complete = ""
+        if cut:
+            self.pending.append(text[:cut])
+            complete = "".join(self.pending)
+            self.pending = []
+            self.pending_size = 0
+        rest = text[cut:]
+        if rest:
+            self.pending.append(rest)
+            self.pending_size += len(rest)
+            if self.pending_size >= MAX_PARTIAL:
+                complete += "".join(self.pending)
+                self.pending = []
+                self.pending_size = 0
+        return complete
+
+
+class _Watch:
+    """被监控的进程"""
+
+    def __init__(self, key: Any, process: subprocess.Popen,
+                 on_output: OutputHandler, on_exit: ExitHandler,
+                 extra_streams: Optional[Dict[str, Any]] = None):
+        self.key = key
+        self.process = process
+        self.on_output = on_output
+        self.on_exit = on_exit
+        self.streams: List[_Stream] = []
+        if process.stdout is not None:
+            self.streams.append(_Stream("stdout", process.stdout))
+        if process.stderr is not None:
+            self.streams.append(_Stream("stderr", process.stderr))
+        for name, pipe in (extra_streams or {}).items():
+            self.streams.append(_Stream(name, pipe))
+        self.pidfd: Optional[int] = None
+        self.exit_fd: Optional[int] = None
+        self.returncode: Optional[int] = None
+        self.timed_out = False
+        self.done = False
+
+
+class ProcessReactor:
+    """
+    进程 I/O 复用器
+
+    用一个线程通过 selectors 读取所有子进程的 stdout/stderr，
+    通过 pidfd（Linux）或定期 poll 回收退出的进程，超时由同一个截止时间堆处理。
+    线程数与并发执行数量无关。
+
+    Windows 的 select 不支持管道，此时每个管道改由一个读取线程转发数据。
+    """
+
+    def __init__(self):
+        self._selector = selectors.DefaultSelector()
+        self._use_selector = os.name == "posix"
+        self._use_pidfd = self._use_selector and hasattr(os, "pidfd_open")
+
+        self._lock = threading.Lock()
+        self._incoming: List[tuple] = []
+        self._events: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(False)
+        self._wakeup_w.setblocking(False)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ, None)
+
+        self._watches: Dict[Any, _Watch] = {}
+        self._deadlines: List[tuple] = []
+        self._seq = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    def register(self, key: Any, process: subprocess.Popen, timeout: Optional[float],
+                 on_output: OutputHandler, on_exit: ExitHandler,
+                 extra_streams: Optional[Dict[str, Any]] = None):
+        """
+        监控一个进程
+
+        Args:
+            key: 进程标识（如执行ID）
+            process: 以二进制管道启动的进程
+            timeout: 超时时间（秒），None 表示不限制
+            on_output: 输出回调 (key, stream, text)，text 由完整的行组成；
+                超过 MAX_PARTIAL 个字符的行分段交出，此时 text 不以换行结尾
+            on_exit: 结束回调 (key, returncode, timed_out)
+            extra_streams: 除 stdout/stderr 外要读取的管道（流名 -> 二进制文件对象），
+                输出同样交给 on_output，全部读完后才调用 on_exit
+        """
+        watch = _Watch(key, process, on_output, on_exit, extra_streams)
+        with self._lock:
+            self._incoming.append((watch, timeout))
+            self._ensure_started()
+        self._wakeup()
+
+    def kill(self, key: Any):
+        """请求结束进程，实际的回收仍由事件循环完成"""
+        with self._lock:
+            self._incoming.append((key, None))
+        self._wakeup()
+
+    def call_later(self, delay: float, callback: Callable[[], None]):
+        """在事件循环线程中延迟执行回调"""
+        with self._lock:
+            self._incoming.append((callback, delay))
+            self._ensure_started()
+        self._wakeup()
+
+    @property
+    def active_count(self) -> int:
+        return len(self._watches)
+
+    def stop(self):
+        """停止事件循环"""
+        self._running = False
+        self._wakeup()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="ProcessReactor")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _wakeup(self):
+        try:
+            self._wakeup_w.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass
+
+    def _run(self):
+        """事件循环"""
+        while self._running:
+            timeout = self._next_timeout()
+            try:
+                ready = self._selector.select(timeout)
+            except OSError as e:
+                logger.error(f"Reactor select failed: {str(e)}")
+                ready = []
+
+            for selector_key, _ in ready:
+                data = selector_key.data
+                if data is None:
+                    self._drain_wakeup()
+                else:
+                    watch, stream = data
+                    if stream is None:
+                        self._reap(watch)
+                    else:
+                        self._read(watch, stream)
+
+            self._accept_incoming()
+            self._process_thread_events()
+            if not self._use_selector or not self._use_pidfd:
+                for watch in list(self._watches.values()):
+                    if watch.returncode is None and watch.exit_fd is None:
+                        self._reap(watch)
+            self._check_deadlines()
+
+    def _next_timeout(self) -> Optional[float]:
+        timeout = None
+        if self._deadlines:
+            timeout = max(0.0, self._deadlines[0][0] - time.monotonic())
+        if self._watches and not self._use_pidfd:
+            timeout = POLL_INTERVAL if timeout is None else min(timeout, POLL_INTERVAL)
+        return timeout
+
+    def _drain_wakeup(self):
+        try:
+            while self._wakeup_r.recv(4096):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+
+    def _accept_incoming(self):
+        with self._lock:
+            incoming, self._incoming = self._incoming, []
+        for item, timeout in incoming:
+            if isinstance(item, _Watch):
+                self._add_watch(item, timeout)
+            elif callable(item):
+                self._push_deadline(time.monotonic() + timeout, item, "call")
+            else:
+                watch = self._watches.get(item)
+                if watch and watch.returncode is None:
+                    self._kill_process(watch)
+
+    def _add_watch(self, watch: _Watch, timeout: Optional[float]):
+        self._watches[watch.key] = watch
+        for stream in watch.streams:
+            if self._use_selector:
+                os.set_blocking(stream.pipe.fileno(), False)
+                self._selector.register(stream.pipe, selectors.EVENT_READ, (watch, stream))
+            else:
+                reader = threading.Thread(target=self._thread_reader, args=(watch, stream))
+                reader.daemon = True
+                reader.start()
+        exit_fd = getattr(watch.process, "exit_fd", None)
+        if exit_fd is not None and self._use_selector:
+            # 非本进程子进程（如 fork 服务创建的进程），退出信息由 exit_fd 通知
+            watch.exit_fd = exit_fd
+            self._selector.register(exit_fd, selectors.EVENT_READ, (watch, None))
+        elif self._use_pidfd:
+            try:
+                watch.pidfd = os.pidfd_open(watch.process.pid)
+                self._selector.register(watch.pidfd, selectors.EVENT_READ, (watch, None))
+            except OSError:
+                # 进程可能已经退出，交给下面的 poll 处理
+                watch.pidfd = None
+        if timeout:
+            self._push_deadline(time.monotonic() + timeout, watch.key, "timeout")
+        if watch.pidfd is None and watch.exit_fd is None:
+            self._reap(watch)
+
+    def _push_deadline(self, when: float, key: Any, kind: str):
+        heapq.heappush(self._deadlines, (when, next(self._seq), key, kind))
+
+    def _read(self, watch: _Watch, stream: _Stream):
+        try:
+            data = os.read(stream.pipe.fileno(), READ_SIZE)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if data:
+            self._emit(watch, stream, stream.feed(data))
+        else:
+            self._close_stream(watch, stream)
+
+    def _thread_reader(self, watch: _Watch, stream: _Stream):
+        """不支持管道 select 的平台上的读取线程"""
+        while True:
+            try:
+                data = stream.pipe.read1(READ_SIZE)
+            except (OSError, ValueError):
+                data = b""
+            self._events.put((watch, stream, data))
+            self._wakeup()
+            if not data:
+                return
+
+    def _process_thread_events(self):
+        while True:
+            try:
+                watch, stream, data = self._events.get_nowait()
+            except queue.Empty:
+                return
+            if watch.done:
+                continue
+            if data:
+                self._emit(watch, stream, stream.feed(data))
+            else:
+                self._close_stream(watch, stream)
+
+    def _emit(self, watch: _Watch, stream: _Stream, text: str):
+        if not text:
+            return
+        try:
+            watch.on_output(watch.key, stream.name, text)
+        except Exception as e:
+            logger.error(f"Output handler failed for {watch.key}: {str(e)}")
+
+    def _close_stream(self, watch: _Watch, stream: _Stream):
+        if stream.closed:
+            return
+        stream.closed = True
+        self._emit(watch, stream, stream.feed(b"", final=True))
+        if self._use_selector:
+            try:
+                self._selector.unregister(stream.pipe)
+            except (KeyError, ValueError):
+                pass
+        try:
+            stream.pipe.close()
+        except OSError:
+            pass
+        self._maybe_finish(watch)
+
+    def _reap(self, watch: _Watch):
+        if watch.returncode is not None:
+            return
+        returncode = watch.process.poll()
+        if returncode is None:
+            return
+        watch.returncode = returncode
+        if watch.exit_fd is not None:
+            try:
+                self._selector.unregister(watch.exit_fd)
+            except (KeyError, ValueError):
+                pass
+            watch.exit_fd = None
+        if watch.pidfd is not None:
+            self._selector.unregister(watch.pidfd)
+            os.close(watch.pidfd)
+            watch.pidfd = None
+        self._push_deadline(time.monotonic() + DRAIN_GRACE, watch.key, "drain")
+        self._maybe_finish(watch)
+
+    def _kill_process(self, watch: _Watch):
+        try:
+            watch.process.kill()
+        except OSError:
+            pass
+
+    def _check_deadlines(self):
+        now = time.monotonic()
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, _, key, kind = heapq.heappop(self._deadlines)
+            if kind == "call":
+                try:
+                    key()
+                except Exception as e:
+                    logger.error(f"Reactor callback failed: {str(e)}")
+                continue
+            watch = self._watches.get(key)
+            if watch is None or watch.done:
+                continue
+            if kind == "timeout" and watch.returncode is None:
+                watch.timed_out = True
+                self._kill_process(watch)
+            elif kind == "drain":
+                # 后代进程仍持有管道，不再等待剩余输出
+                for stream in watch.streams:
+                    self._close_stream(watch, stream)
+
+    def _maybe_finish(self, watch: _Watch):
+        if watch.done or watch.returncode is None:
+            return
+        if not all(stream.closed for stream in watch.streams):
+            return
+        watch.done = True
+        self._watches.pop(watch.key, None)
+        try:
+            watch.on_exit(watch.key, watch.returncode, watch.timed_out)
+        except Exception as e:
+            logger.error(f"Exit handler failed for {watch.key}: {str(e)}")
@@ -0,0 +1,260 @@
+"""
+执行资源限制
+
+setrlimit 限制在子进程启动前生效（普通启动通过 preexec_fn，预热池由 fork 服务在子进程中设置）：
+    address_space  RLIMIT_AS，地址空间字节数
+    cpu_time       RLIMIT_CPU，CPU 秒数（按进程计算，超出时进程收到 SIGXCPU）
+    open_files     RLIMIT_NOFILE，打开的文件数
+    processes      RLIMIT_NPROC，按用户计算的进程数；cgroup 模式下同时作为 pids.max
+
+可选的 cgroup v2 模式为每个执行创建子 cgroup，用 cpu.weight 在并发执行间按权重分配 CPU，
+并通过 memory.max 限制整个进程树的内存：
+    memory         memory.max 字节数
+    cpu_weight     cpu.weight（1-10000，默认 100）
+
+取值为 0 或 None 表示不限制。
+"""
+import errno
+import os
+import signal
+from typing import Dict, List, Optional, Tuple
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+RLIMITS = {
+    "address_space": "RLIMIT_AS",
+    "cpu_time": "RLIMIT_CPU",
+    "open_files": "RLIMIT_NOFILE",
+    "processes": "RLIMIT_NPROC"
+}
+CGROUP_LIMITS = ("memory", "cpu_weight")
+
+# 超出限制时的执行状态
+LIMIT_STATUSES = {
+    "address_space": "memory_limit",
+    "memory": "memory_limit",
+    "cpu_time": "cpu_limit",
+    "open_files": "file_limit",
+    "processes": "process_limit"
+}
+
+CGROUP_FS = "/sys/fs/cgroup"
+CGROUP_CONTROLLERS = ("cpu", "memory", "pids")
+
+
+def merge_limits(*sources: Optional[Dict[str, int]]) -> Dict[str, int]:
+    """合并全局与脚本的限制，同一项取更严格（更小）的值；cpu_weight 以后面的为准"""
+    merged: Dict[str, int] = {}
+    for source in sources:
+        for key, value in (source or {}).items():
+            if key not in RLIMITS and key not in CGROUP_LIMITS:
+                raise ValueError(f"Unknown resource limit: {key}")
+            if not value:
+                continue
+            if key == "cpu_weight" or key not in merged:
+                merged[key] = int(value)
+            else:
+                merged[key] = min(merged[key], int(value))
+    return merged
+
+
+def rlimit_settings(limits: Dict[str, int]) -> Dict[str, Tuple[int, int]]:
+    """
+    转换为 {RLIMIT 名称: (soft, hard)}，可序列化后交给 fork 服务
+
+    CPU 时间的硬限制比软限制多 1 秒，进程先收到可识别的 SIGXCPU，仍不退出时被 SIGKILL。
+    """
+    settings = {}
+    for key, name in RLIMITS.items():
+        value = limits.get(key)
+        if not value or resource is None or not hasattr(resource, name):
+            continue
+        hard = value + 1 if key == "cpu_time" else value
+        settings[name] = (value, hard)
+    return settings
+
+
+def apply_rlimits(settings: Dict[str, Tuple[int, int]]):
+    """在子进程中设置限制，不能超过当前的硬限制"""
+    for name, (soft, hard) in settings.items():
+        number = getattr(resource, name)
+        _, current_hard = resource.getrlimit(number)
+        if current_hard != resource.RLIM_INFINITY:
+            soft = min(soft, current_hard)
+            hard = min(hard, current_hard)
+        resource.setrlimit(number, (soft, hard))
+
+
+def make_preexec(settings: Dict[str, Tuple[int, int]], cgroup_procs: Optional[str] = None):
+    """
+    生成 Popen 的 preexec_fn：先加入 cgroup 再设置限制
+
+    preexec_fn 在 fork 之后、exec 之前运行，只使用 os 层面的调用，不加锁不导入模块。
+    """
+    if not settings and not cgroup_procs:
+        return None
+
+    def preexec():
+        if cgroup_procs:
+            fd = os.open(cgroup_procs, os.O_WRONLY)
+            try:
+                os.write(fd, b"0")
+            finally:
+                os.close(fd)
+        apply_rlimits(settings)
+    return preexec
+
+
+def classify_exit(return_code: int, limits: Dict[str, int], stderr_tail: str,
+                  cgroup_events: Optional[Dict[str, int]] = None,
+                  cpu_seconds: Optional[float] = None) -> Optional[str]:
+    """
+    判断非零退出是否由资源限制引起
+
+    Returns:
+        限制对应的执行状态（memory_limit、cpu_limit、file_limit、process_limit），否则为 None
+    """
+    if return_code == 0:
+        return None
+    cgroup_events = cgroup_events or {}
+    if cgroup_events.get("oom_kill"):
+        return LIMIT_STATUSES["memory"]
+    cpu_limit = limits.get("cpu_time")
+    if cpu_limit and hasattr(signal, "SIGXCPU"):
+        # 忽略 SIGXCPU 的进程在硬限制处被 SIGKILL，此时根据采样的 CPU 时间判断
+        if return_code == -signal.SIGXCPU or (
+                return_code == -signal.SIGKILL and cpu_seconds is not None
+                and cpu_seconds >= cpu_limit):
+            return LIMIT_STATUSES["cpu_time"]
+    if cgroup_events.get("pids_max"):
+        return LIMIT_STATUSES["processes"]
+    # Python 脚本超出限制时通常以异常退出，根据错误输出的结尾判断
+    if limits.get("address_space") and "MemoryError" in stderr_tail:
+        return LIMIT_STATUSES["address_space"]
+    if limits.get("open_files") and f"[Errno {errno.EMFILE}]" in stderr_tail:
+        return LIMIT_STATUSES["open_files"]
+    if limits.get("processes") and f"[Errno {errno.EAGAIN}]" in stderr_tail:
+        return LIMIT_STATUSES["processes"]
+    return None
+
+
+class CgroupManager:
+    """
+    cgroup v2 执行分组
+
+    在 root（默认为当前进程所在的 cgroup）下创建 script-runner 子树，每个执行一个子 cgroup。
+    cgroup v2 不允许有进程的 cgroup 向子 cgroup 分配控制器，当前进程位于 root 中时
+    先把自身移入 root/manager。需要 root 可写（如 systemd 的 Delegate=yes）。
+    """
+
+    def __init__(self, root: Optional[str] = None, default_cpu_weight: int = 100):
+        self.root = root
+        self.default_cpu_weight = default_cpu_weight
+        self.runner: Optional[str] = None
+        self.controllers: List[str] = []
+
+    @staticmethod
+    def is_supported() -> bool:
+        return os.path.exists(os.path.join(CGROUP_FS, "cgroup.controllers"))
+
+    def setup(self) -> bool:
+        """创建 script-runner 子树并启用控制器，失败时返回 False"""
+        if not self.is_supported():
+            return False
+        try:
+            root = self.root or self._own_cgroup()
+            available = _read(os.path.join(root, "cgroup.controllers")).split()
+            self.controllers = [name for name in CGROUP_CONTROLLERS if name in available]
+            if not self.controllers:
+                raise OSError("no cpu, memory or pids controller delegated")
+            enable = " ".join(f"+{name}" for name in self.controllers)
+            try:
+                _write(os.path.join(root, "cgroup.subtree_control"), enable)
+            except OSError as e:
+                if e.errno != errno.EBUSY:
+                    raise
+                manager = os.path.join(root, "manager")
+                os.makedirs(manager, exist_ok=True)
+                _write(os.path.join(manager, "cgroup.procs"), str(os.getpid()))
+                _write(os.path.join(root, "cgroup.subtree_control"), enable)
+            self.runner = os.path.join(root, "script-runner")
+            os.makedirs(self.runner, exist_ok=True)
+            _write(os.path.join(self.runner, "cgroup.subtree_control"), enable)
+            logger.info(f"Using cgroup {self.runner} with controllers {self.controllers}")
+            return True
+        except OSError as e:
+            logger.warning(f"cgroup v2 mode is unavailable: {str(e)}")
+            self.runner = None
+            return False
+
+    def create(self, name: str, limits: Dict[str, int]) -> str:
+        """为一个执行创建 cgroup，返回其路径"""
+        path = os.path.join(self.runner, name)
+        os.makedirs(path, exist_ok=True)
+        if "cpu" in self.controllers:
+            weight = limits.get("cpu_weight") or self.default_cpu_weight
+            _write(os.path.join(path, "cpu.weight"), str(max(1, min(10000, weight))))
+        if "memory" in self.controllers and limits.get("memory"):
+            _write(os.path.join(path, "memory.max"), str(limits["memory"]))
+            try:
+                # 不允许用 swap 绕过内存限制
+                _write(os.path.join(path, "memory.swap.max"), "0")
+            except OSError:
+                pass
+        if "pids" in self.controllers and limits.get("processes"):
+            _write(os.path.join(path, "pids.max"), str(limits["processes"]))
+        return path
+
+    def events(self, path: str) -> Dict[str, int]:
+        """读取内存 OOM 与进程数超限的次数"""
+        return {
+            "oom_kill": _read_counter(os.path.join(path, "memory.events"), "oom_kill"),
+            "pids_max": _read_counter(os.path.join(path, "pids.events"), "max")
+        }
+
+    def remove(self, path: str) -> bool:
+        """结束残留的后代进程并删除 cgroup，仍有进程未退出时返回 False"""
+        kill_file = os.path.join(path, "cgroup.kill")
+        try:
+            if os.path.exists(kill_file):
+                _write(kill_file, "1")
+            os.rmdir(path)
+            return True
+        except FileNotFoundError:
+            return True
+        except OSError:
+            return False
+
+    @staticmethod
+    def _own_cgroup() -> str:
+        for line in _read("/proc/self/cgroup").splitlines():
+            if line.startswith("0::"):
+                return os.path.join(CGROUP_FS, line[3:].lstrip("/"))
+        raise OSError("process is not in a cgroup v2 hierarchy")
+
+
+def _read(path: str) -> str:
+    with open(path, "r") as f:
+        return f.read()
+
+
+def _write(path: str, value: str):
+    with open(path, "w") as f:
+        f.write(value)
+
+
+def _read_counter(path: str, name: str) -> int:
+    try:
+        for line in _read(path).splitlines():
+            key, _, value = line.partition(" ")
+            if key == name:
+                return int(value)
+    except (OSError, ValueError):
+        pass
+    return 0
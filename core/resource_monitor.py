@@ -0,0 +1,261 @@
+import os
+import threading
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+PROC = "/proc"
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+# 时间序列的列，每列是一个 array('d')
+SERIES = ("elapsed", "cpu_seconds", "rss", "read_bytes", "write_bytes")
+
+
+class ResourceUsage:
+    """
+    单个执行的资源采样
+
+    时间序列按列保存在 array 中，每个采样点 5 个 double。
+    采样点超过 max_samples 时隔一个丢弃一个，并把采样步长加倍，长时间运行的内存占用有上限。
+    """
+
+    def __init__(self, root_pid: int, max_samples: int = 3600):
+        self.root_pid = root_pid
+        self.max_samples = max(2, max_samples)
+        self.started = time.monotonic()
+        self.series: Dict[str, array] = {name: array("d") for name in SERIES}
+        self.stride = 1
+        self._skipped = 0
+
+        # 汇总
+        self.cpu_seconds = 0.0
+        self.peak_rss = 0
+        self.read_bytes = 0
+        self.write_bytes = 0
+        self.peak_processes = 0
+
+    def add(self, cpu_seconds: float, rss: int, peak_rss: int,
+            read_bytes: int, write_bytes: int, processes: int):
+        # 已退出的后代未被父进程回收时累计值会回落，汇总只增不减
+        self.cpu_seconds = max(self.cpu_seconds, cpu_seconds)
+        self.peak_rss = max(self.peak_rss, rss, peak_rss)
+        self.read_bytes = max(self.read_bytes, read_bytes)
+        self.write_bytes = max(self.write_bytes, write_bytes)
+        self.peak_processes = max(self.peak_processes, processes)
+
+        self._skipped += 1
+        if self._skipped < self.stride:
+            return
+        self._skipped = 0
+        values = (time.monotonic() - self.started, self.cpu_seconds, rss,
+                  self.read_bytes, self.write_bytes)
+        for name, value in zip(SERIES, values):
+            self.series[name].append(value)
+        if len(self.series["elapsed"]) >= self.max_samples:
+            for name in SERIES:
+                self.series[name] = self.series[name][::2]
+            self.stride *= 2
+
+    @property
+    def sample_count(self) -> int:
+        return len(self.series["elapsed"])
+
+    def summary(self) -> Dict[str, float]:
+        """返回写入执行记录的汇总字段"""
+        return {
+            "cpu_time": round(self.cpu_seconds, 3),
+            "peak_rss": self.peak_rss,
+            "read_bytes": self.read_bytes,
+            "write_bytes": self.write_bytes
+        }
+
+    def encode(self) -> Dict[str, bytes]:
+        """把各列编码为字节串，用于保存到数据库"""
+        return {name: self.series[name].tobytes() for name in SERIES}
+
+    @staticmethod
+    def decode(data: bytes) -> array:
+        values = array("d")
+        values.frombytes(data or b"")
+        return values
+
+
+class ResourceMonitor:
+    """
+    执行资源采样器
+
+    一个后台线程按固定间隔读取每个运行中执行的整个进程树的 /proc/<pid>/stat、status、io，
+    累计 CPU 时间、RSS 与 I/O 字节数。CPU 时间包含已被回收的后代进程（cutime/cstime）。
+    没有被监控的执行时线程空闲等待，不访问 /proc。
+
+    只支持有 /proc 的系统（Linux），其他平台上 is_supported() 返回 False。
+    """
+
+    def __init__(self, interval: float = 1.0, max_samples: int = 3600):
+        self.interval = max(0.05, interval)
+        self.max_samples = max_samples
+        self._usages: Dict[int, ResourceUsage] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self._children_supported = os.path.exists(
+            os.path.join(PROC, "self", "task", str(os.getpid()), "children"))
+
+    @staticmethod
+    def is_supported() -> bool:
+        return os.path.exists(os.path.join(PROC, "self", "stat"))
+
+    def register(self, key: int, pid: int) -> ResourceUsage:
+        """开始采样一个进程及其后代"""
+        usage = ResourceUsage(pid, self.max_samples)
+        with self._lock:
+            self._usages[key] = usage
+            self._ensure_started()
+        # 唤醒采样线程立即采样一次，短时间运行的脚本也有记录
+        self._wakeup.set()
+        return usage
+
+    def unregister(self, key: int) -> Optional[ResourceUsage]:
+        """停止采样并返回采样结果"""
+        with self._lock:
+            return self._usages.pop(key, None)
+
+    def stop(self):
+        self._running = False
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="ResourceMonitor")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _run(self):
+        while self._running:
+            with self._lock:
+                usages = list(self._usages.items())
+            if not usages:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            started = time.monotonic()
+            children = None if self._children_supported else self._scan_children()
+            for key, usage in usages:
+                try:
+                    self._sample(key, usage, children)
+                except Exception as e:
+                    logger.error(f"Resource sampling failed for pid {usage.root_pid}: {str(e)}")
+            self._wakeup.wait(max(0.0, self.interval - (time.monotonic() - started)))
+            self._wakeup.clear()
+
+    def _sample(self, key: int, usage: ResourceUsage,
+                children: Optional[Dict[int, List[int]]] = None):
+        cpu_ticks = 0
+        rss_pages = 0
+        peak_rss = 0
+        read_bytes = 0
+        write_bytes = 0
+        processes = 0
+        for pid in self._process_tree(usage.root_pid, children):
+            stat = _read_stat(pid)
+            if stat is None:
+                continue
+            processes += 1
+            # utime, stime, cutime, cstime
+            cpu_ticks += int(stat[11]) + int(stat[12]) + int(stat[13]) + int(stat[14])
+            rss_pages += int(stat[21])
+            peak_rss = max(peak_rss, _read_peak_rss(pid))
+            io = _read_io(pid)
+            read_bytes += io.get("read_bytes", 0)
+            write_bytes += io.get("write_bytes", 0)
+        with self._lock:
+            # 读取期间执行可能已经结束，结束后的采样结果不再变化
+            if processes and self._usages.get(key) is usage:
+                usage.add(cpu_ticks / CLOCK_TICKS, rss_pages * PAGE_SIZE, peak_rss,
+                          read_bytes, write_bytes, processes)
+
+    def _process_tree(self, root: int,
+                      children: Optional[Dict[int, List[int]]]) -> Iterable[int]:
+        pending = [root]
+        seen = set()
+        while pending:
+            pid = pending.pop()
+            if pid in seen:
+                continue
+            seen.add(pid)
+            yield pid
+            if children is not None:
+                pending.extend(children.get(pid, ()))
+            else:
+                pending.extend(_read_children(pid))
+
+    @staticmethod
+    def _scan_children() -> Dict[int, List[int]]:
+        """内核不提供 children 文件时扫描 /proc 建立父子关系"""
+        children: Dict[int, List[int]] = {}
+        try:
+            entries = os.listdir(PROC)
+        except OSError:
+            return children
+        for entry in entries:
+            if not entry.isdigit():
+                continue
+            stat = _read_stat(int(entry))
+            if stat is not None:
+                children.setdefault(int(stat[1]), []).append(int(entry))
+        return children
+
+
+def _read_stat(pid: int) -> Optional[List[str]]:
+    """读取 /proc/<pid>/stat，返回进程名之后的字段（state 为第 0 项）"""
+    try:
+        with open(f"{PROC}/{pid}/stat", "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    # 进程名可能包含空格和括号，从最后一个右括号之后开始分割
+    return data[data.rfind(b")") + 2:].decode("ascii", "replace").split()
+
+
+def _read_peak_rss(pid: int) -> int:
+    """读取 VmHWM（进程的 RSS 峰值），覆盖两次采样之间的峰值"""
+    try:
+        with open(f"{PROC}/{pid}/status", "rb") as f:
+            for line in f:
+                if line.startswith(b"VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+def _read_io(pid: int) -> Dict[str, int]:
+    values = {}
+    try:
+        with open(f"{PROC}/{pid}/io", "rb") as f:
+            for line in f:
+                name, _, value = line.partition(b":")
+                values[name.decode("ascii")] = int(value)
+    except (OSError, ValueError):
+        pass
+    return values
+
+
+def _read_children(pid: int) -> List[int]:
+    children = []
+    try:
+        for tid in os.listdir(f"{PROC}/{pid}/task"):
+            with open(f"{PROC}/{pid}/task/{tid}/children", "rb") as f:
+                children.extend(int(child) for child in f.read().split())
+    except (OSError, ValueError):
+        pass
+    return children
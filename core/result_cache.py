@@ -0,0 +1,145 @@
+import hashlib
+import json
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy import delete, update
+from sqlalchemy.orm import Session
+from database.db_writer import DBWriter
+from database.models import ResultCacheEntry
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class CachedResult:
+    """缓存的一次执行结果，输出保存在源执行的记录中"""
+
+    def __init__(self, execution_id: int, script_id: int, exit_code: Optional[int],
+                 size: int, created_at: float):
+        self.execution_id = execution_id
+        self.script_id = script_id
+        self.exit_code = exit_code
+        self.size = size
+        self.created_at = created_at
+
+
+class ResultCache:
+    """
+    可缓存脚本的结果缓存
+
+    以目标解释器（版本与 sys.prefix）、脚本内容与参数的 SHA-256 为键，指向成功完成的源执行。
+    索引在内存中按最近使用排序，按 TTL、条目数与源执行的输出总大小做 LRU 淘汰；
+    条目通过批量写入器保存在 result_cache 表中，启动时恢复。
+    被缓存引用的执行不会被历史清理删除。
+    """
+
+    def __init__(self, writer: DBWriter, python: str = "python", ttl: float = 86400,
+                 max_entries: int = 10000, max_size: int = 268435456):
+        self.writer = writer
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, CachedResult]" = OrderedDict()
+        self._total_size = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._interpreter = self._probe_interpreter(python)
+        self._load()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def key(self, content: str, parameters: Optional[Dict[str, str]]) -> str:
+        digest = hashlib.sha256()
+        digest.update(self._interpreter.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(content.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(json.dumps(parameters or {}, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[CachedResult]:
+        """查找未过期的结果，命中时更新最近使用时间"""
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None and time.time() - result.created_at > self.ttl:
+                self._remove(key)
+                result = None
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # 条目可能已被淘汰，不使用 writer.update（找不到记录时报错）
+        now = datetime.now()
+        self.writer.submit(lambda session: session.execute(
+            update(ResultCacheEntry).where(ResultCacheEntry.key == key).values(last_used_at=now)))
+        return result
+
+    def put(self, key: str, result: CachedResult):
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = result
+            self._total_size += result.size
+            self._evict()
+        entry = ResultCacheEntry(key=key, script_id=result.script_id,
+                                 execution_id=result.execution_id, exit_code=result.exit_code,
+                                 size=result.size,
+                                 created_at=datetime.fromtimestamp(result.created_at),
+                                 last_used_at=datetime.now())
+        self.writer.submit(lambda session: session.merge(entry))
+
+    def discard(self, key: str):
+        with self._lock:
+            self._remove(key)
+
+    def _evict(self):
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries
+                                          or self._total_size > self.max_size):
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str):
+        result = self._entries.pop(key, None)
+        if result is None:
+            return
+        self._total_size -= result.size
+        self.writer.submit(lambda session: session.execute(
+            delete(ResultCacheEntry).where(ResultCacheEntry.key == key)))
+
+    def _load(self):
+        """按最近使用时间从旧到新恢复索引，丢弃已过期的条目"""
+        now = time.time()
+        with Session(self.writer.engine) as session:
+            rows = session.query(ResultCacheEntry).order_by(ResultCacheEntry.last_used_at).all()
+        expired = []
+        with self._lock:
+            for row in rows:
+                created_at = row.created_at.timestamp()
+                if now - created_at > self.ttl:
+                    expired.append(row.key)
+                    continue
+                self._entries[row.key] = CachedResult(row.execution_id, row.script_id,
+                                                      row.exit_code, row.size or 0, created_at)
+                self._total_size += row.size or 0
+            self._evict()
+        if expired:
+            self.writer.submit(lambda session: session.execute(
+                delete(ResultCacheEntry).where(ResultCacheEntry.key.in_(expired))))
+
+    @staticmethod
+    def _probe_interpreter(python: str) -> str:
+        """同一版本的不同虚拟环境安装的包不同，结果也可能不同"""
+        try:
+            result = subprocess.run([python, "-c", "import sys; print(sys.version, sys.prefix)"],
+                                    capture_output=True, text=True, timeout=30)
+            return result.stdout.strip()
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning(f"Failed to probe interpreter {python}: {str(e)}")
+            return python
@@ -0,0 +1,298 @@
+"""
+定时执行
+
+每个脚本可以有多个计划（ScriptSchedule），按 cron 表达式（见 core.cron）或固定间隔触发，
+到期时交给执行器（ScriptExecutor，或分布式模式下的 Coordinator）执行。
+
+错过的运行（调度器未运行或晚于计划时间超过 scheduler_misfire_grace 秒）按计划的策略处理：
+    skip      跳过错过的运行，等待下一次计划时间
+    coalesce  只补运行一次
+    catch_up  按错过的每个计划时间各运行一次（最多 scheduler_max_catch_up 次）
+jitter 让每次运行在计划时间后随机推迟 0~jitter 秒，避免大量计划同时在整点启动。
+每次运行的环境变量 SCRIPT_SCHEDULED_AT 为对应的计划时间。
+"""
+import heapq
+import itertools
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from core.config import Config
+from core.cron import CronExpression
+from database.db_manager import SessionLocal
+from database.models import Script, ScriptSchedule
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+MISFIRE_POLICIES = ("skip", "coalesce", "catch_up")
+# 最长睡眠时间，系统时间被调整或休眠恢复后也能及时重新计算
+MAX_SLEEP = 60
+LOAD_BATCH_SIZE = 500
+
+
+def validate_schedule(cron: Optional[str], interval: Optional[int],
+                      misfire_policy: str, jitter: int):
+    """检查计划定义，无效时抛出 ValueError"""
+    if bool(cron) == bool(interval):
+        raise ValueError("Give either a cron expression or an interval")
+    if cron:
+        CronExpression(cron)
+    elif interval < 1:
+        raise ValueError("Interval must be at least 1 second")
+    if misfire_policy not in MISFIRE_POLICIES:
+        raise ValueError(f"Misfire policy must be one of {', '.join(MISFIRE_POLICIES)}")
+    if jitter < 0:
+        raise ValueError("Jitter must not be negative")
+
+
+def next_fire_time(cron: Optional[str], interval: Optional[int], after: datetime) -> datetime:
+    """after 之后的第一个计划时间，新建或重新启用计划时使用"""
+    if cron:
+        return CronExpression(cron).next_after(after)
+    return after + timedelta(seconds=interval)
+
+
+class _Entry:
+    """堆中的一个计划"""
+
+    def __init__(self, schedule: ScriptSchedule, now: datetime):
+        self.schedule_id = schedule.id
+        self.script_id = schedule.script_id
+        self.cron = CronExpression(schedule.cron) if schedule.cron else None
+        self.interval = schedule.interval
+        self.parameters = json.loads(schedule.parameters) if schedule.parameters else {}
+        self.misfire_policy = schedule.misfire_policy or "coalesce"
+        self.jitter = schedule.jitter or 0
+        self.timeout = schedule.timeout
+        self.priority = schedule.priority or 0
+        self.updated_at = schedule.updated_at
+        self.next_run = schedule.next_run_at or self.next_after(now)
+        self.delay = 0.0
+        self.wake = 0.0
+        self.plan_wake()
+
+    def next_after(self, after: datetime) -> datetime:
+        """上一个计划时间之后的计划时间"""
+        if self.cron:
+            return self.cron.next_after(after)
+        return after + timedelta(seconds=self.interval)
+
+    def first_after(self, now: datetime) -> datetime:
+        """now 之后的第一个计划时间，间隔计划保持原来的相位"""
+        if self.cron:
+            return self.cron.next_after(now)
+        periods = int((now - self.next_run).total_seconds() // self.interval) + 1
+        return self.next_run + timedelta(seconds=periods * self.interval)
+
+    def plan_wake(self):
+        self.delay = random.uniform(0, self.jitter) if self.jitter else 0.0
+        self.wake = self.next_run.timestamp() + self.delay
+
+
+class Scheduler:
+    """
+    定时执行调度器
+
+    所有启用的计划按唤醒时间放在一个最小堆中，线程睡眠到堆顶到期，每次唤醒的开销为 O(log n)，
+    不会每个周期扫描全部计划。计划的修改通过 sync() 或定期与数据库同步发现，
+    被替换的堆条目在出堆时丢弃。
+    """
+
+    def __init__(self, executor, session_factory=SessionLocal,
+                 misfire_grace: Optional[float] = None,
+                 max_catch_up: Optional[int] = None,
+                 sync_interval: Optional[float] = None):
+        config = Config()
+        self.executor = executor
+        self.session_factory = session_factory
+        self.misfire_grace = misfire_grace if misfire_grace is not None else \
+            config.get_system_config("scheduler_misfire_grace", 60)
+        self.max_catch_up = max(1, max_catch_up if max_catch_up is not None else
+                                config.get_system_config("scheduler_max_catch_up", 100))
+        self.sync_interval = sync_interval if sync_interval is not None else \
+            config.get_system_config("scheduler_sync_interval", 30)
+        self.default_timeout = config.get_system_config("max_execution_time", 3600)
+
+        self._condition = threading.Condition()
+        self._heap: List[Tuple[float, int, _Entry]] = []
+        self._entries: Dict[int, _Entry] = {}
+        self._seq = itertools.count()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+        # 统计
+        self.fired = 0
+        self.skipped = 0
+
+    @property
+    def schedule_count(self) -> int:
+        with self._condition:
+            return len(self._entries)
+
+    def start(self):
+        """加载启用的计划并启动调度线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped = False
+        self.sync()
+        self._thread = threading.Thread(target=self._run, name="Scheduler")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def sync(self) -> int:
+        """与数据库同步：加载新增与修改过的计划，移除已删除或停用的计划，返回变化的计划数"""
+        db = self.session_factory()
+        try:
+            current = dict(db.query(ScriptSchedule.id, ScriptSchedule.updated_at).filter(
+                ScriptSchedule.enabled.is_(True)).all())
+            with self._condition:
+                removed = [schedule_id for schedule_id in self._entries
+                           if schedule_id not in current]
+                changed = [schedule_id for schedule_id, updated_at in current.items()
+                           if schedule_id not in self._entries
+                           or self._entries[schedule_id].updated_at != updated_at]
+            now = datetime.now()
+            entries = []
+            for start in range(0, len(changed), LOAD_BATCH_SIZE):
+                for schedule in db.query(ScriptSchedule).filter(
+                        ScriptSchedule.id.in_(changed[start:start + LOAD_BATCH_SIZE])):
+                    try:
+                        entries.append(_Entry(schedule, now))
+                    except ValueError as e:
+                        logger.error(f"Invalid schedule {schedule.id}: {str(e)}")
+        finally:
+            db.close()
+
+        with self._condition:
+            for schedule_id in removed:
+                self._entries.pop(schedule_id, None)
+            for entry in entries:
+                self._entries[entry.schedule_id] = entry
+                self._push(entry)
+            # 被替换的条目过多时重建堆
+            if len(self._heap) > 2 * len(self._entries) + 64:
+                self._heap = [item for item in self._heap
+                              if self._entries.get(item[2].schedule_id) is item[2]]
+                heapq.heapify(self._heap)
+            self._condition.notify()
+        if removed or entries:
+            logger.info(f"Scheduler synced: {len(entries)} loaded, {len(removed)} removed")
+        return len(removed) + len(entries)
+
+    def _push(self, entry: _Entry):
+        heapq.heappush(self._heap, (entry.wake, next(self._seq), entry))
+
+    def _run(self):
+        next_sync = time.monotonic() + self.sync_interval
+        while True:
+            with self._condition:
+                if self._stopped:
+                    return
+                timeout = min(MAX_SLEEP, max(0.0, next_sync - time.monotonic()))
+                if self._heap:
+                    timeout = min(timeout, self._heap[0][0] - time.time())
+                if timeout > 0:
+                    self._condition.wait(timeout)
+                    if self._stopped:
+                        return
+                due = self._pop_due(time.time())
+            if due:
+                try:
+                    self._fire(due)
+                except Exception as e:
+                    logger.error(f"Scheduler failed to fire schedules: {str(e)}")
+            if time.monotonic() >= next_sync:
+                next_sync = time.monotonic() + self.sync_interval
+                try:
+                    self.sync()
+                except Exception as e:
+                    logger.error(f"Scheduler sync failed: {str(e)}")
+
+    def _pop_due(self, now: float) -> List[_Entry]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, entry = heapq.heappop(self._heap)
+            if self._entries.get(entry.schedule_id) is entry:
+                due.append(entry)
+        return due
+
+    def _plan(self, entry: _Entry, now: datetime) -> List[datetime]:
+        """返回本次要运行的计划时间，并把计划推进到下一次"""
+        nominal = entry.next_run
+        if (now - nominal).total_seconds() - entry.delay <= self.misfire_grace:
+            entry.next_run = entry.next_after(nominal)
+            return [nominal]
+
+        missed = [nominal]
+        following = entry.next_after(nominal)
+        while following <= now and len(missed) < self.max_catch_up:
+            missed.append(following)
+            following = entry.next_after(following)
+        entry.next_run = following if following > now else entry.first_after(now)
+        logger.warning(f"Schedule {entry.schedule_id} missed {len(missed)}"
+                       f"{'+' if following <= now else ''} runs, policy {entry.misfire_policy}")
+        if entry.misfire_policy == "skip":
+            self.skipped += len(missed)
+            return []
+        if entry.misfire_policy == "coalesce":
+            self.skipped += len(missed) - 1
+            return [missed[-1]]
+        return missed
+
+    def _fire(self, due: List[_Entry]):
+        now = datetime.now()
+        runs = []
+        for entry in due:
+            planned = self._plan(entry, now)
+            runs.extend((entry, scheduled_at) for scheduled_at in planned)
+            entry.plan_wake()
+            with self._condition:
+                if self._entries.get(entry.schedule_id) is entry:
+                    self._push(entry)
+            # 记录下一次的计划时间，重启后据此判断错过的运行
+            fields = {"next_run_at": entry.next_run}
+            if planned:
+                fields["last_run_at"] = now
+            self.executor.writer.update(ScriptSchedule, entry.schedule_id, **fields)
+        if not runs:
+            return
+
+        # 一次查询取出本批所有脚本，运行时使用脚本的最新内容
+        script_ids = list({entry.script_id for entry, _ in runs})
+        db = self.session_factory()
+        try:
+            scripts = {row.id: (row.content, row.resource_limits, bool(row.cacheable))
+                       for row in db.query(Script.id, Script.content, Script.resource_limits,
+                                           Script.cacheable).filter(Script.id.in_(script_ids))}
+        finally:
+            db.close()
+
+        for entry, scheduled_at in runs:
+            script = scripts.get(entry.script_id)
+            if script is None:
+                logger.error(f"Schedule {entry.schedule_id}: script {entry.script_id} not found")
+                continue
+            content, limits, cacheable = script
+            parameters = dict(entry.parameters)
+            parameters["SCRIPT_SCHEDULED_AT"] = scheduled_at.isoformat()
+            try:
+                self.executor.execute(entry.script_id, content, parameters,
+                                      entry.timeout or self.default_timeout,
+                                      priority=entry.priority,
+                                      limits=json.loads(limits) if limits else None,
+                                      cacheable=cacheable)
+                self.fired += 1
+            except Exception as e:
+                logger.error(f"Schedule {entry.schedule_id} failed to submit: {str(e)}")
@@ -1,19 +1,38 @@
+import json
 import os
-from datetime import datetime
-from typing import List, Optional
+from datetime import datetime, timedelta
+from array import array
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func, or_, select, text
 from sqlalchemy.orm import Session
-from database.models import Script, ScriptParameter, User
+from core.compile_cache import CompileCache, shared_compile_cache
+from core.resource_limits import merge_limits
+from core.resource_monitor import SERIES, ResourceUsage
+from core.pipeline import validate_stages
+from core.scheduler import next_fire_time, validate_schedule
+from database.models import (Script, ScriptParameter, User, ScriptExecution, ExecutionOutputChunk,
+                             ExecutionRecord, ExecutionResourceSamples, ScriptSchedule, ResultCacheEntry,
+                             Pipeline, PipelineRun, Sweep, SweepItem)
+from database.search_index import FTS_TABLE, RANK_WEIGHTS, build_match_query, has_search_index
 from utils.logger import get_logger
 from utils.file_utils import ensure_directory, read_file, write_file
 
 logger = get_logger(__name__)
 
 class ScriptManager:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, compile_cache: Optional[CompileCache] = None):
         self.db = db
+        self._compile_cache = compile_cache
         self.scripts_dir = "scripts"
         ensure_directory(self.scripts_dir)
     
+    @property
+    def compile_cache(self) -> Optional[CompileCache]:
+        """脚本更新或删除时失效的字节码缓存，未指定时使用执行器共用的实例"""
+        if self._compile_cache is None:
+            self._compile_cache = shared_compile_cache()
+        return self._compile_cache
+    
     def create_script(self, name: str, content: str, script_type: str,
                      description: str = "", user_id: int = None) -> Script:
         """创建新脚本"""
@@ -54,6 +73,10 @@ class ScriptManager:
             if description:
                 script.description = description
             
+            # 旧内容的字节码不会再被使用
+            if self.compile_cache and script.content != content:
+                self.compile_cache.invalidate(script.content)
+            
             script.content = content
             script.updated_at = datetime.now()
             
@@ -82,8 +105,45 @@ class ScriptManager:
             if os.path.exists(file_path):
                 os.remove(file_path)
             
+            if self.compile_cache:
+                self.compile_cache.invalidate(script.content)
+            
+            # 删除参数、定时计划与执行历史
+            self.db.query(ScriptParameter).filter(
+                ScriptParameter.script_id == script_id
+            ).delete(synchronize_session=False)
+            self.db.query(ScriptSchedule).filter(
+                ScriptSchedule.script_id == script_id
+            ).delete(synchronize_session=False)
+            sweep_ids = select(Sweep.id).where(Sweep.script_id == script_id)
+            self.db.query(SweepItem).filter(
+                SweepItem.sweep_id.in_(sweep_ids)
+            ).delete(synchronize_session=False)
+            self.db.query(Sweep).filter(
+                Sweep.script_id == script_id
+            ).delete(synchronize_session=False)
+            execution_ids = select(ScriptExecution.id).where(ScriptExecution.script_id == script_id)
+            output_files = self._get_output_files(execution_ids)
+            self.db.query(ResultCacheEntry).filter(or_(
+                ResultCacheEntry.script_id == script_id,
+                ResultCacheEntry.execution_id.in_(execution_ids)
+            )).delete(synchronize_session=False)
+            self.db.query(ExecutionOutputChunk).filter(
+                ExecutionOutputChunk.execution_id.in_(execution_ids)
+            ).delete(synchronize_session=False)
+            self.db.query(ExecutionRecord).filter(
+                ExecutionRecord.execution_id.in_(execution_ids)
+            ).delete(synchronize_session=False)
+            self.db.query(ExecutionResourceSamples).filter(
+                ExecutionResourceSamples.execution_id.in_(execution_ids)
+            ).delete(synchronize_session=False)
+            self.db.query(ScriptExecution).filter(
+                ScriptExecution.script_id == script_id
+            ).delete(synchronize_session=False)
+            
             self.db.delete(script)
             self.db.commit()
+            self._remove_files(output_files)
             
             logger.info(f"Deleted script: {script_id}")
         except Exception as e:
@@ -105,6 +165,340 @@ class ScriptManager:
             query = query.filter(Script.type == script_type)
         return query.all()
     
+    def list_scripts(self, limit: int = 500, after_id: Optional[int] = None,
+                     script_type: Optional[str] = None,
+                     tag: Optional[str] = None) -> List[Tuple[int, str, str]]:
+        """
+        按ID顺序分页获取脚本摘要（键集分页），不加载脚本内容
+        
+        Returns:
+            (id, name, type) 列表
+        """
+        query = self.db.query(Script.id, Script.name, Script.type)
+        if script_type:
+            query = query.filter(Script.type == script_type)
+        if tag:
+            query = query.filter(Script.tags.like(f"%,{tag.strip().lower()},%"))
+        if after_id:
+            query = query.filter(Script.id > after_id)
+        return [tuple(row) for row in query.order_by(Script.id).limit(limit)]
+    
+    def search_scripts(self, query: str, limit: int = 50, offset: int = 0,
+                       script_type: Optional[str] = None) -> List[Tuple[int, str, str]]:
+        """
+        全文搜索脚本名称、描述与内容，按相关度排序分页返回
+        
+        每个词做前缀匹配，多个词需同时出现。相关度在全文索引内计算并按 bm25 取前 offset + limit 个，
+        只保留这些行而不是排序全部匹配，宽泛的搜索词也不会遗漏相关度高的旧脚本。
+        按类型过滤时类型不在索引中，需要对全部匹配排序后再过滤。
+        没有全文索引时退化为名称与描述的模糊匹配。
+        
+        Returns:
+            (id, name, type) 列表
+        """
+        match = build_match_query(query)
+        if not match:
+            return []
+        
+        connection = self.db.connection()
+        if not has_search_index(connection):
+            like = f"%{query.strip()}%"
+            fallback = self.db.query(Script.id, Script.name, Script.type).filter(
+                or_(Script.name.like(like), Script.description.like(like))
+            )
+            if script_type:
+                fallback = fallback.filter(Script.type == script_type)
+            rows = fallback.order_by(Script.id).offset(offset).limit(limit)
+            return [tuple(row) for row in rows]
+        
+        type_filter = "AND s.type = :script_type" if script_type else ""
+        # LIMIT -1 表示不限
+        window = -1 if script_type else offset + limit
+        weights = ", ".join(str(weight) for weight in RANK_WEIGHTS)
+        rows = self.db.execute(text(f"""
+            SELECT s.id, s.name, s.type
+            FROM (
+                SELECT rowid, bm25({FTS_TABLE}, {weights}) AS score
+                FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match
+                ORDER BY score, rowid LIMIT :window
+            ) AS matches JOIN scripts s ON s.id = matches.rowid
+            WHERE 1 = 1 {type_filter}
+            ORDER BY matches.score, s.id
+            LIMIT :limit OFFSET :offset
+        """), {"match": match, "script_type": script_type, "window": window,
+               "limit": limit, "offset": offset})
+        return [tuple(row) for row in rows]
+    
+    def set_tags(self, script_id: int, tags: List[str]):
+        """设置脚本的标签"""
+        try:
+            script = self.db.query(Script).get(script_id)
+            if not script:
+                raise ValueError(f"Script {script_id} not found")
+            tags = sorted({tag.strip().lower() for tag in tags if tag.strip()})
+            if any("," in tag for tag in tags):
+                raise ValueError("Tags must not contain commas")
+            script.tags = f",{','.join(tags)}," if tags else None
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Failed to set tags: {str(e)}")
+            raise
+    
+    def find_scripts(self, ids: Optional[List[int]] = None,
+                     names: Optional[List[str]] = None,
+                     tags: Optional[List[str]] = None,
+                     script_type: Optional[str] = None) -> List[Script]:
+        """
+        按ID、名称或标签查找脚本（任一条件匹配即可），按ID排序
+        
+        未给出任何ID、名称或标签时返回全部脚本（可按类型过滤）。
+        """
+        conditions = []
+        if ids:
+            conditions.append(Script.id.in_(ids))
+        if names:
+            conditions.append(Script.name.in_(names))
+        for tag in tags or []:
+            conditions.append(Script.tags.like(f"%,{tag.strip().lower()},%"))
+        query = self.db.query(Script)
+        if conditions:
+            query = query.filter(or_(*conditions))
+        if script_type:
+            query = query.filter(Script.type == script_type)
+        return query.order_by(Script.id).all()
+    
+    def set_resource_limits(self, script_id: int, limits: Optional[Dict[str, int]]):
+        """设置脚本的资源限制（见 core.resource_limits），None 表示只使用全局限制"""
+        try:
+            script = self.db.query(Script).get(script_id)
+            if not script:
+                raise ValueError(f"Script {script_id} not found")
+            script.resource_limits = json.dumps(merge_limits(limits)) if limits else None
+            self.db.commit()
+            logger.info(f"Updated resource limits of script {script_id}")
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Failed to set resource limits: {str(e)}")
+            raise
+    
+    def get_resource_limits(self, script_id: int) -> Dict[str, int]:
+        """获取脚本的资源限制，用作 ScriptExecutor.execute 的 limits 参数"""
+        value = self.db.query(Script.resource_limits).filter(Script.id == script_id).scalar()
+        return json.loads(value) if value else {}
+    
+    def set_cacheable(self, script_id: int, cacheable: bool):
+        """
+        设置脚本的结果是否可缓存
+        
+        可缓存的脚本输出只取决于内容与参数（没有副作用、不读取外部状态），
+        相同的执行直接复用缓存的结果（见 core.result_cache）。关闭时同时清除该脚本的缓存。
+        """
+        try:
+            script = self.db.query(Script).get(script_id)
+            if not script:
+                raise ValueError(f"Script {script_id} not found")
+            script.cacheable = cacheable
+            if not cacheable:
+                self.db.query(ResultCacheEntry).filter(
+                    ResultCacheEntry.script_id == script_id
+                ).delete(synchronize_session=False)
+            self.db.commit()
+            logger.info(f"Set script {script_id} cacheable: {cacheable}")
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Failed to set cacheable: {str(e)}")
+            raise
+    
+    def clear_result_cache(self, script_id: Optional[int] = None) -> int:
+        """
+        清除结果缓存（script_id 为 None 时清除全部），返回删除的条目数
+        
+        运行中的执行器在内存中保留索引，重启后生效。
+        """
+        try:
+            query = self.db.query(ResultCacheEntry)
+            if script_id is not None:
+                query = query.filter(ResultCacheEntry.script_id == script_id)
+            count = query.delete(synchronize_session=False)
+            self.db.commit()
+            logger.info(f"Cleared {count} result cache entries")
+            return count
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Failed to clear result cache: {str(e)}")
+            raise
+    
+    def add_schedule(self, script_id: int, cron: Optional[str] = None,
+                     interval: Optional[int] = None,
+                     parameters: Optional[Dict[str, str]] = None,
+                     misfire_policy: str = "coalesce", jitter: int = 0,
+                     timeout: Optional[int] = None, priority: int = 0) -> ScriptSchedule:
+        """
+        为脚本添加定时计划（见 core.scheduler），cron 与 interval（秒）二选一
+        
+        运行中的调度器在下一次同步时加载新计划。
+        """
+        try:
+            if not self.db.query(Script).get(script_id):
+                raise ValueError(f"Script {script_id} not found")
+            validate_schedule(cron, interval, misfire_policy, jitter)
+            now = datetime.now()
+            schedule = ScriptSchedule(
+                script_id=script_id,
+                cron=cron or None,
+                interval=interval or None,
+                parameters=json.dumps(parameters) if parameters else None,
+                misfire_policy=misfire_policy,
+                jitter=jitter,
+                timeout=timeout,
+                priority=priority,
+                next_run_at=next_fire_time(cron, interval, now),
+                updated_at=now
+            )
+            self.db.add(schedule)
+            self.db.commit()
+            logger.info(f"Added schedule {schedule.id} for script {script_id}")
+            return schedule
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Failed to add schedule: {str(e)}")
+            raise
+    
+    def set_schedule_enabled(self, schedule_id: int, enabled: bool):
+        """启用或停用定时计划，重新启用时从当前时间开始计算，不补运行停用期间的计划"""
+        try:
+            schedule = self.db.query(ScriptSchedule).get(schedule_id)
+            if not schedule:
+                raise ValueError(f"Schedule {schedule_id} not found")
+            now = datetime.now()
+            if enabled and not schedule.enabled:
+                schedule.next_run_at = next_fire_time(schedule.cron, schedule.interval, now)
+            schedule.enabled = enabled
+            schedule.updated_at = now
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Failed to update schedule: {str(e)}")
+            raise
+    
+    def delete_schedule(self, schedule_id: int):
+        try:
+            deleted = self.db.query(ScriptSchedule).filter(
+                ScriptSchedule.id == schedule_id
+            ).delete(synchronize_session=False)
+            if not deleted:
+                raise ValueError(f"Schedule {schedule_id} not found")
+            self.db.commit()
+            logger.info(f"Deleted schedule {schedule_id}")
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Failed to delete schedule: {str(e)}")
+            raise
+    
+    def list_schedules(self, script_id: Optional[int] = None, limit: int = 500,
+                       after_id: Optional[int] = None) -> List[ScriptSchedule]:
+        """按ID顺序分页获取定时计划"""
+        query = self.db.query(ScriptSchedule)
+        if script_id is not None:
+            query = query.filter(ScriptSchedule.script_id == script_id)
+        if after_id:
+            query = query.filter(ScriptSchedule.id > after_id)
+        return query.order_by(ScriptSchedule.id).limit(limit).all()
+    
+    def create_pipeline(self, name: str, stages: List[dict], description: str = "") -> Pipeline:
+        """
+        创建流水线（见 core.pipeline）
+        
+        每个阶段为 {"name", "script", "input", "after", "parameters", "timeout"}，
+        script 为脚本ID或名称，保存时解析为 script_id。
+        """
+        try:
+            if self.db.query(Pipeline.id).filter(Pipeline.name == name).first():
+                raise ValueError(f"Pipeline {name!r} already exists")
+            normalized = []
+            for stage in stages:
+                script = stage.get("script", stage.get("script_id"))
+                if isinstance(script, str) and not script.isdigit():
+                    found = self.find_scripts(names=[script])
+                    if len(found) != 1:
+                        raise ValueError(f"Script {script!r} not found or ambiguous")
+                    script_id = found[0].id
+                elif script is not None and self.db.query(Script).get(int(script)):
+                    script_id = int(script)
+                else:
+                    raise ValueError(f"Script {script!r} not found")
+                normalized.append({
+                    "name": stage.get("name"),
+                    "script_id": script_id,
+                    "input": stage.get("input"),
+                    "after": list(stage.get("after") or []),
+                    "parameters": {key: str(value) for key, value in
+                                   (stage.get("parameters") or {}).items()},
+                    "timeout": stage.get("timeout")
+                })
+            validate_stages(normalized)
+            pipeline = Pipeline(name=name, description=description,
+                                stages=json.dumps(normalized, ensure_ascii=False))
+            self.db.add(pipeline)
+            self.db.commit()
+            logger.info(f"Created pipeline {pipeline.id} with {len(normalized)} stages")
+            return pipeline
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Failed to create pipeline: {str(e)}")
+            raise
+    
+    def find_pipeline(self, selector: str) -> Optional[Pipeline]:
+        """按ID或名称查找流水线"""
+        if selector.isdigit():
+            return self.db.query(Pipeline).get(int(selector))
+        return self.db.query(Pipeline).filter(Pipeline.name == selector).first()
+    
+    def list_pipelines(self) -> List[Pipeline]:
+        return self.db.query(Pipeline).order_by(Pipeline.id).all()
+    
+    def delete_pipeline(self, pipeline_id: int):
+        """删除流水线与运行记录，各阶段的执行记录保留在脚本的执行历史中"""
+        try:
+            pipeline = self.db.query(Pipeline).get(pipeline_id)
+            if not pipeline:
+                raise ValueError(f"Pipeline {pipeline_id} not found")
+            run_ids = select(PipelineRun.id).where(PipelineRun.pipeline_id == pipeline_id)
+            self.db.query(ScriptExecution).filter(
+                ScriptExecution.pipeline_run_id.in_(run_ids)
+            ).update({ScriptExecution.pipeline_run_id: None}, synchronize_session=False)
+            self.db.query(PipelineRun).filter(
+                PipelineRun.pipeline_id == pipeline_id
+            ).delete(synchronize_session=False)
+            self.db.delete(pipeline)
+            self.db.commit()
+            logger.info(f"Deleted pipeline {pipeline_id}")
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Failed to delete pipeline: {str(e)}")
+            raise
+    
+    def get_pipeline_run(self, run_id: int) -> Tuple[Optional[PipelineRun], List[ScriptExecution]]:
+        """获取流水线运行与各阶段的执行记录"""
+        run = self.db.query(PipelineRun).get(run_id)
+        if run is None:
+            return None, []
+        executions = self.db.query(ScriptExecution).filter(
+            ScriptExecution.pipeline_run_id == run_id
+        ).order_by(ScriptExecution.id).all()
+        return run, executions
+    
+    def get_sweep(self, sweep_id: int) -> Optional[Sweep]:
+        """获取参数扫描（见 core.sweep）"""
+        return self.db.query(Sweep).get(sweep_id)
+    
+    def get_sweep_status_counts(self, sweep_id: int) -> Dict[str, int]:
+        """参数扫描中已有最终结果的参数集按状态计数"""
+        return dict(self.db.query(SweepItem.status, func.count()).filter(
+            SweepItem.sweep_id == sweep_id
+        ).group_by(SweepItem.status).all())
+    
     def add_parameter(self, script_id: int, name: str,
                      description: str = "", default_value: str = "",
                      param_type: str = "string") -> ScriptParameter:
@@ -128,6 +522,211 @@ class ScriptManager:
             logger.error(f"Failed to add parameter: {str(e)}")
             raise
     
+    def get_execution_history(self, script_id: int, limit: int = 50,
+                              before: Optional[Tuple[datetime, int]] = None) -> List[ScriptExecution]:
+        """
+        按开始时间倒序分页获取脚本的执行历史（键集分页）
+        
+        Args:
+            script_id: 脚本ID
+            limit: 每页条数
+            before: 上一页最后一条记录的 (started_at, id)，为 None 时返回第一页
+        """
+        query = self.db.query(ScriptExecution).filter(
+            ScriptExecution.script_id == script_id,
+            ScriptExecution.started_at.isnot(None)
+        )
+        if before:
+            started_at, execution_id = before
+            query = query.filter(
+                ScriptExecution.started_at <= started_at,
+                or_(ScriptExecution.started_at < started_at,
+                    ScriptExecution.id < execution_id)
+            )
+        return query.order_by(
+            ScriptExecution.started_at.desc(), ScriptExecution.id.desc()
+        ).limit(limit).all()
+    
+    def get_executions_by_status(self, status: str, limit: int = 50,
+                                 after_id: Optional[int] = None) -> List[ScriptExecution]:
+        """按ID顺序分页获取指定状态的执行记录（如排队中的执行）"""
+        query = self.db.query(ScriptExecution).filter(ScriptExecution.status == status)
+        if after_id:
+            query = query.filter(ScriptExecution.id > after_id)
+        return query.order_by(ScriptExecution.id).limit(limit).all()
+    
+    def get_execution_output(self, execution_id: int, stream: str = "stdout") -> str:
+        """获取执行的输出摘要，完整输出见执行记录的 output_file/error_file"""
+        chunks = self.db.query(ExecutionOutputChunk.data).filter(
+            ExecutionOutputChunk.execution_id == execution_id,
+            ExecutionOutputChunk.stream == stream
+        ).order_by(ExecutionOutputChunk.seq)
+        return "".join(chunk.data for chunk in chunks)
+    
+    def get_execution_records(self, execution_id: int, kind: Optional[str] = None,
+                              name: Optional[str] = None,
+                              limit: Optional[int] = None) -> List[ExecutionRecord]:
+        """获取执行通过结构化记录通道发出的记录，按发出顺序排列"""
+        query = self.db.query(ExecutionRecord).filter(ExecutionRecord.execution_id == execution_id)
+        if kind:
+            query = query.filter(ExecutionRecord.kind == kind)
+        if name:
+            query = query.filter(ExecutionRecord.name == name)
+        query = query.order_by(ExecutionRecord.seq)
+        if limit:
+            query = query.limit(limit)
+        return query.all()
+    
+    def get_record_history(self, script_id: int, name: str, kind: str = "result",
+                           limit: int = 100) -> List[tuple]:
+        """
+        脚本最近各次执行中同名记录的值，从新到旧排列，供看板与下游任务使用，不需要读取输出
+        
+        Returns:
+            (执行ID, 执行结束时间, 数值, 记录 JSON) 列表，同一执行的多条记录取最后一条
+        """
+        latest = select(
+            ExecutionRecord.execution_id,
+            func.max(ExecutionRecord.seq).label("seq")
+        ).join(ScriptExecution, ScriptExecution.id == ExecutionRecord.execution_id).where(
+            ScriptExecution.script_id == script_id,
+            ExecutionRecord.kind == kind,
+            ExecutionRecord.name == name
+        ).group_by(ExecutionRecord.execution_id).subquery()
+        rows = self.db.query(
+            ExecutionRecord.execution_id,
+            ScriptExecution.finished_at,
+            ExecutionRecord.value,
+            ExecutionRecord.data
+        ).join(latest, (ExecutionRecord.execution_id == latest.c.execution_id)
+               & (ExecutionRecord.seq == latest.c.seq)).join(
+            ScriptExecution, ScriptExecution.id == ExecutionRecord.execution_id
+        ).order_by(ExecutionRecord.execution_id.desc()).limit(limit)
+        return [tuple(row) for row in rows]
+    
+    def get_resource_samples(self, execution_id: int) -> Dict[str, array]:
+        """
+        获取执行的资源采样时间序列
+        
+        Returns:
+            列名（elapsed、cpu_seconds、rss、read_bytes、write_bytes）到 array('d') 的映射，
+            没有采样时为空字典
+        """
+        samples = self.db.get(ExecutionResourceSamples, execution_id)
+        if samples is None:
+            return {}
+        return {name: ResourceUsage.decode(getattr(samples, name)) for name in SERIES}
+    
+    def get_resource_usage_by_script(self, since: Optional[datetime] = None,
+                                     limit: int = 20) -> List[tuple]:
+        """
+        按脚本汇总资源占用，按 CPU 时间总和倒序，用于找出占用资源最多的脚本
+        
+        Returns:
+            (script_id, 执行次数, CPU 时间总和, 最大峰值 RSS, 读字节总和, 写字节总和) 列表
+        """
+        query = self.db.query(
+            ScriptExecution.script_id,
+            func.count(ScriptExecution.id),
+            func.sum(ScriptExecution.cpu_time).label("cpu_time"),
+            func.max(ScriptExecution.peak_rss),
+            func.sum(ScriptExecution.read_bytes),
+            func.sum(ScriptExecution.write_bytes)
+        ).filter(ScriptExecution.cpu_time.isnot(None))
+        if since:
+            query = query.filter(ScriptExecution.started_at >= since)
+        return [tuple(row) for row in query.group_by(ScriptExecution.script_id)
+                .order_by(text("cpu_time DESC")).limit(limit)]
+    
+    def compact_execution_history(self, keep_days: int = 30, keep_per_script: int = 100,
+                                  batch_size: int = 1000) -> int:
+        """
+        清理执行历史
+        
+        删除开始时间早于 keep_days 天前的已结束执行及其输出（排队时被取消的执行没有开始时间，
+        按结束或入队时间计），每个脚本至少保留最近 keep_per_script 条，结果缓存引用的执行不删除。
+        分批删除，避免长时间锁库。
+        
+        Returns:
+            删除的执行记录数
+        """
+        cutoff = datetime.now() - timedelta(days=keep_days)
+        happened_at = func.coalesce(ScriptExecution.started_at, ScriptExecution.finished_at,
+                                    ScriptExecution.queued_at)
+        ranked = select(
+            ScriptExecution.id,
+            happened_at.label("happened_at"),
+            func.row_number().over(
+                partition_by=ScriptExecution.script_id,
+                order_by=(happened_at.desc(), ScriptExecution.id.desc())
+            ).label("rank")
+        ).where(ScriptExecution.finished_at.isnot(None)).subquery()
+        expired = select(ranked.c.id).where(
+            ranked.c.rank > keep_per_script,
+            ranked.c.happened_at < cutoff,
+            ranked.c.id.notin_(select(ResultCacheEntry.execution_id))
+        )
+        
+        deleted = 0
+        try:
+            # 每批只取 batch_size 个过期的执行；删除过期记录不改变其他记录是否过期
+            while True:
+                ids = self.db.execute(expired.limit(batch_size)).scalars().all()
+                if not ids:
+                    break
+                output_files = self._get_output_files(ids)
+                self.db.query(ExecutionOutputChunk).filter(
+                    ExecutionOutputChunk.execution_id.in_(ids)
+                ).delete(synchronize_session=False)
+                self.db.query(ExecutionRecord).filter(
+                    ExecutionRecord.execution_id.in_(ids)
+                ).delete(synchronize_session=False)
+                self.db.query(ExecutionResourceSamples).filter(
+                    ExecutionResourceSamples.execution_id.in_(ids)
+                ).delete(synchronize_session=False)
+                self.db.query(ScriptExecution).filter(
+                    ScriptExecution.id.in_(ids)
+                ).delete(synchronize_session=False)
+                self.db.commit()
+                self._remove_files(output_files)
+                deleted += len(ids)
+            
+            if deleted and self.db.get_bind().dialect.name == "sqlite":
+                # 把 WAL 中的内容写回主库并截断 WAL 文件
+                self.db.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+            
+            logger.info(f"Compacted execution history: {deleted} executions removed")
+            return deleted
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Failed to compact execution history: {str(e)}")
+            raise
+    
+    def _get_output_files(self, execution_ids) -> List[str]:
+        """获取执行记录关联的完整输出文件"""
+        rows = self.db.query(ScriptExecution.output_file, ScriptExecution.error_file).filter(
+            ScriptExecution.id.in_(execution_ids)
+        )
+        return [path for row in rows for path in row if path]
+    
+    def _remove_files(self, paths: List[str]):
+        """删除输出文件，复用结果的执行与源执行共用文件，仍被引用的文件保留"""
+        if not paths:
+            return
+        referenced = set()
+        for start in range(0, len(paths), 500):
+            batch = paths[start:start + 500]
+            for row in self.db.query(ScriptExecution.output_file, ScriptExecution.error_file).filter(
+                    or_(ScriptExecution.output_file.in_(batch), ScriptExecution.error_file.in_(batch))):
+                referenced.update(row)
+        for path in paths:
+            if path in referenced:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    
     def _get_script_path(self, script: Script) -> str:
         """获取脚本文件路径"""
         extension = {
@@ -0,0 +1,337 @@
+"""
+参数扫描
+
+用同一个脚本运行大量参数集，参数集来自 CSV、JSON Lines 文件或调用方提供的可迭代对象（如生成器）。
+参数集按需读取，同时提交给执行器的执行数有上限，内存占用与参数集总数无关。
+
+batch_size > 1 时一个进程依次运行多组参数，解释器启动与模块导入的开销只付一次。
+每组之间恢复环境变量，但脚本的模块级状态（已导入的模块等）会保留，只适合不依赖全新进程的脚本。
+每组参数运行时环境变量 SCRIPT_SWEEP_INDEX 为参数集的序号。
+
+失败的参数集最多运行 max_attempts 次。最终结果写入 sweep_items 表并追加到汇总文件，
+每行一个 JSON：index、parameters、status、exit_code、attempts、execution_id、output。
+中断后以同一扫描ID再次运行时跳过已有最终结果的参数集（来源需按相同顺序给出参数集）。
+"""
+import csv
+import json
+import os
+import queue
+import secrets
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from core.config import Config
+from database.db_manager import SessionLocal
+from database.models import Script, Sweep, SweepItem
+from utils.file_utils import ensure_directory
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 批量运行的子进程入口，__SOURCE__ 替换为脚本源码。每组参数结束后在 stdout 与 stderr
+# 各写一行结束标记，运行器据此把两路输出分别归属到各组参数
+BATCH_RUNNER = '''\
+import json as _json, os as _os, sys as _sys, traceback as _traceback
+_code = compile(__SOURCE__, "<string>", "exec")
+_marker = _os.environ.pop("SCRIPT_SWEEP_MARKER")
+for _index, _parameters in _json.loads(_os.environ.pop("SCRIPT_SWEEP_ITEMS")):
+    _saved = dict(_os.environ)
+    _os.environ.update(_parameters)
+    _os.environ["SCRIPT_SWEEP_INDEX"] = str(_index)
+    _status = 0
+    try:
+        exec(_code, {"__name__": "__main__", "__builtins__": __builtins__})
+    except SystemExit as _e:
+        if isinstance(_e.code, int):
+            _status = _e.code
+        elif _e.code is not None:
+            print(_e.code, file=_sys.stderr)
+            _status = 1
+    except BaseException as _e:
+        # 去掉入口自身的栈帧
+        _traceback.print_exception(type(_e), _e, _e.__traceback__.tb_next)
+        _status = 1
+    _os.environ.clear()
+    _os.environ.update(_saved)
+    for _stream in (_sys.stdout, _sys.stderr):
+        _stream.write("%s %d %d\\n" % (_marker, _index, _status))
+        _stream.flush()
+'''
+
+
+def read_parameter_sets(path: str) -> Iterator[Dict[str, str]]:
+    """逐个读取参数集：.csv 的每行以表头为参数名，其他文件按 JSON Lines 读取（每行一个对象）"""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            for row in csv.DictReader(f):
+                yield {name: value for name, value in row.items() if name}
+            return
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if not isinstance(item, dict):
+                raise ValueError(f"{path}:{number}: expected a JSON object")
+            yield {str(name): value if isinstance(value, str) else json.dumps(value)
+                   for name, value in item.items()}
+
+
+class _Batch:
+    """一次提交（一个进程）中的参数集与按结束标记归属的输出"""
+
+    def __init__(self, items: List[Tuple[int, Dict[str, str], int]], marker: Optional[str],
+                 output_limit: int):
+        # (序号, 参数, 已运行次数)
+        self.items = items
+        self.marker = marker
+        self.output_limit = output_limit
+        self.outputs: List[List[str]] = [[] for _ in items]
+        self.output_sizes = [0] * len(items)
+        self.exit_codes: Dict[int, int] = {}
+        self.stdout_position = 0
+        self.stderr_position = 0
+        self.execution_id: Optional[int] = None
+
+    def feed(self, text: str):
+        """收集输出（在执行器的事件循环线程中调用），stderr 的行带有 ERROR: 前缀"""
+        for line in text.splitlines(keepends=True):
+            is_stderr = line.startswith("ERROR: ")
+            position = self.stderr_position if is_stderr else self.stdout_position
+            found = line.find(self.marker) if self.marker else -1
+            if found >= 0:
+                prefix = line[:found]
+                if prefix and prefix != "ERROR: ":
+                    self._append(position, prefix + "\n")
+                fields = line[found + len(self.marker):].split()
+                if is_stderr:
+                    self.stderr_position += 1
+                else:
+                    if len(fields) == 2 and fields[1].lstrip("-").isdigit():
+                        self.exit_codes[position] = int(fields[1])
+                    self.stdout_position += 1
+                continue
+            self._append(position, line)
+
+    def _append(self, position: int, text: str):
+        if position >= len(self.items) or self.output_sizes[position] >= self.output_limit:
+            return
+        text = text[:self.output_limit - self.output_sizes[position]]
+        self.outputs[position].append(text)
+        self.output_sizes[position] += len(text)
+
+
+class SweepRunner:
+    """
+    参数扫描运行器
+
+    run() 在调用线程中读取参数集、提交执行并处理结果，直到全部参数集有最终结果或被 stop()。
+    executor 为 ScriptExecutor，同时提交的执行数默认按其并发上限计算。
+    """
+
+    def __init__(self, executor, session_factory=SessionLocal):
+        config = Config()
+        self.executor = executor
+        self.session_factory = session_factory
+        self.output_dir = config.get_system_config("sweep_dir", "sweeps")
+        self.output_limit = config.get_system_config("sweep_item_output_limit", 65536)
+        self.default_batch_size = config.get_system_config("sweep_batch_size", 1)
+        self.default_max_attempts = config.get_system_config("sweep_max_attempts", 3)
+        self.default_timeout = config.get_system_config("max_execution_time", 3600)
+        self._events: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._stopped = threading.Event()
+        self._in_flight: Dict[int, _Batch] = {}
+
+    def create(self, script_id: int, source: Optional[str] = None,
+               parameters: Optional[Dict[str, str]] = None,
+               batch_size: Optional[int] = None, max_attempts: Optional[int] = None) -> int:
+        """创建扫描记录，返回扫描ID"""
+        sweep = Sweep(script_id=script_id, source=os.path.abspath(source) if source else None,
+                      parameters=json.dumps(parameters) if parameters else None,
+                      batch_size=max(1, batch_size or self.default_batch_size),
+                      max_attempts=max(1, max_attempts or self.default_max_attempts),
+                      status="running")
+        sweep_id = self.executor.writer.insert(sweep).result()
+        output_file = os.path.abspath(os.path.join(self.output_dir, f"{sweep_id}.jsonl"))
+        self.executor.writer.update(Sweep, sweep_id, output_file=output_file).result()
+        return sweep_id
+
+    def stop(self):
+        """停止扫描：不再提交新的参数集，正在运行的执行被停止（可在其他线程中调用）"""
+        self._stopped.set()
+        self._events.put(None)
+
+    def run(self, sweep_id: int, items: Optional[Iterable[Dict[str, str]]] = None,
+            max_in_flight: Optional[int] = None, timeout: Optional[int] = None,
+            progress_callback: Optional[Callable[[int, int, int], None]] = None) -> str:
+        """
+        运行（或续跑）扫描
+
+        Args:
+            sweep_id: 扫描ID
+            items: 参数集，为空时读取扫描的来源文件
+            max_in_flight: 同时提交的执行数，默认为执行器并发上限的两倍
+            timeout: 每组参数的超时时间（秒），批量运行时按组数累加
+            progress_callback: 每个执行结束后回调 (completed, failed, 已读取的参数集数)
+
+        Returns:
+            扫描状态：completed（全部成功）、failed（有参数集最终失败）或 interrupted
+        """
+        db = self.session_factory()
+        try:
+            sweep = db.get(Sweep, sweep_id)
+            if sweep is None:
+                raise ValueError(f"Sweep {sweep_id} not found")
+            script = db.get(Script, sweep.script_id)
+            if script is None:
+                raise ValueError(f"Script {sweep.script_id} not found")
+            done = set(db.execute(select(SweepItem.item_index).where(
+                SweepItem.sweep_id == sweep_id)).scalars())
+            content = script.content
+            limits = json.loads(script.resource_limits) if script.resource_limits else None
+        finally:
+            db.close()
+        try:
+            compile(content, "<string>", "exec")
+        except SyntaxError as e:
+            # 批量运行时语法错误要到子进程中才会发现，每组参数都会失败
+            raise ValueError(f"Script {sweep.script_id} has a syntax error: {e}")
+        if items is None:
+            if not sweep.source:
+                raise ValueError(f"Sweep {sweep_id} has no source file, pass the parameter sets")
+            items = read_parameter_sets(sweep.source)
+
+        self._stopped.clear()
+        batch_size = sweep.batch_size or 1
+        runner = None
+        marker = None
+        if batch_size > 1:
+            marker = f"@@sweep-{secrets.token_hex(8)}"
+            runner = BATCH_RUNNER.replace("__SOURCE__", repr(content))
+        common = json.loads(sweep.parameters) if sweep.parameters else {}
+        timeout = timeout or self.default_timeout
+        max_in_flight = max_in_flight or 2 * self.executor.queue.max_concurrency
+        counts = {"completed": sweep.completed or 0, "failed": sweep.failed or 0,
+                  "total": max(sweep.total or 0, len(done))}
+        source = self._pending_items(items, done, counts)
+        retries: Deque[Tuple[int, Dict[str, str], int]] = deque()
+        ensure_directory(os.path.dirname(sweep.output_file))
+        self.executor.writer.update(Sweep, sweep_id, status="running", finished_at=None)
+        logger.info(f"Running sweep {sweep_id}, {len(done)} parameter sets already done")
+
+        status = "interrupted"
+        with open(sweep.output_file, "a", encoding="utf-8") as output:
+            try:
+                exhausted = False
+                while not self._stopped.is_set():
+                    while len(self._in_flight) < max_in_flight and not self._stopped.is_set():
+                        batch_items = [retries.popleft() for _ in range(min(batch_size, len(retries)))]
+                        while len(batch_items) < batch_size and not exhausted:
+                            item = next(source, None)
+                            if item is None:
+                                exhausted = True
+                            else:
+                                batch_items.append(item)
+                        if not batch_items:
+                            break
+                        self._submit(sweep.script_id, content, runner, marker, common, batch_items,
+                                     timeout, limits)
+                    if not self._in_flight:
+                        if exhausted and not retries:
+                            status = "failed" if counts["failed"] else "completed"
+                        break
+                    event = self._events.get()
+                    if event is None:
+                        continue
+                    batch, execution_status, exit_code = event
+                    self._in_flight.pop(batch.execution_id, None)
+                    self._collect(sweep_id, batch, execution_status, exit_code, sweep.max_attempts,
+                                  retries, output, counts)
+                    self.executor.writer.update(Sweep, sweep_id, completed=counts["completed"],
+                                                failed=counts["failed"], total=counts["total"])
+                    if progress_callback:
+                        progress_callback(counts["completed"], counts["failed"], counts["total"])
+            finally:
+                for execution_id in list(self._in_flight):
+                    self.executor.stop_execution(execution_id)
+                self._in_flight.clear()
+                self.executor.writer.update(Sweep, sweep_id, status=status,
+                                            completed=counts["completed"], failed=counts["failed"],
+                                            total=counts["total"], finished_at=datetime.now())
+                logger.info(f"Sweep {sweep_id} {status}: {counts['completed']} completed, "
+                            f"{counts['failed']} failed")
+        return status
+
+    @staticmethod
+    def _pending_items(items: Iterable[Dict[str, str]], done: set,
+                       counts: Dict[str, int]) -> Iterator[Tuple[int, Dict[str, str], int]]:
+        for index, parameters in enumerate(items):
+            counts["total"] = max(counts["total"], index + 1)
+            if index not in done:
+                yield index, parameters, 0
+
+    def _submit(self, script_id: int, content: str, runner: Optional[str], marker: Optional[str],
+                common: Dict[str, str], items: List[Tuple[int, Dict[str, str], int]],
+                timeout: int, limits: Optional[Dict[str, int]]):
+        batch = _Batch(items, marker, self.output_limit)
+        parameters = dict(common)
+        if runner:
+            parameters["SCRIPT_SWEEP_MARKER"] = marker
+            parameters["SCRIPT_SWEEP_ITEMS"] = json.dumps(
+                [[index, item] for index, item, _ in items], ensure_ascii=False)
+        else:
+            index, item, _ = items[0]
+            parameters.update(item)
+            parameters["SCRIPT_SWEEP_INDEX"] = str(index)
+
+        def on_finished(execution_id: int, status: str, exit_code: Optional[int]):
+            self._events.put((batch, status, exit_code))
+
+        try:
+            batch.execution_id = self.executor.execute(
+                script_id, runner or content, parameters, timeout * len(items),
+                output_callback=batch.feed, limits=limits, finished_callback=on_finished)
+        except Exception as e:
+            logger.error(f"Failed to submit sweep batch: {str(e)}")
+            self._events.put((batch, "failed", None))
+            batch.execution_id = -id(batch)
+        self._in_flight[batch.execution_id] = batch
+
+    def _collect(self, sweep_id: int, batch: _Batch, execution_status: str,
+                 exit_code: Optional[int], max_attempts: int,
+                 retries: Deque[Tuple[int, Dict[str, str], int]], output, counts: Dict[str, int]):
+        """按结束标记确定各组参数的结果，失败的重新排队，得到最终结果的写入汇总"""
+        finished = []
+        for position, (index, parameters, attempts) in enumerate(batch.items):
+            if batch.marker is None:
+                status, code = execution_status, exit_code
+            elif position in batch.exit_codes:
+                code = batch.exit_codes[position]
+                status = "completed" if code == 0 else "failed"
+            elif position == batch.stdout_position:
+                # 进程在这组参数运行期间结束（超时、被终止或退出了解释器）
+                status, code = execution_status, exit_code
+            else:
+                # 尚未开始运行，不计入运行次数
+                retries.append((index, parameters, attempts))
+                continue
+            attempts += 1
+            if status != "completed" and attempts < max_attempts:
+                retries.append((index, parameters, attempts))
+                continue
+            counts["completed" if status == "completed" else "failed"] += 1
+            finished.append(SweepItem(sweep_id=sweep_id, item_index=index, status=status,
+                                      exit_code=code, attempts=attempts,
+                                      execution_id=batch.execution_id))
+            output.write(json.dumps({
+                "index": index, "parameters": parameters, "status": status, "exit_code": code,
+                "attempts": attempts, "execution_id": batch.execution_id,
+                "output": "".join(batch.outputs[position])
+            }, ensure_ascii=False) + "\n")
+        if finished:
+            output.flush()
+            self.executor.writer.submit(lambda session: [session.merge(item) for item in finished])
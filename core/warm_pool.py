@@ -0,0 +1,264 @@
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+FORK_SERVER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           "runtime", "fork_server.py")
+
+
+class ForkedProcess:
+    """
+    由 fork 服务创建的子进程
+
+    提供执行器用到的 subprocess.Popen 接口子集（pid、stdout、stderr、poll、wait、
+    terminate、kill）。子进程不是当前进程的子进程，退出码由 fork 服务通过
+    连接回报，exit_fd 可读即表示退出信息已到达。
+    """
+
+    def __init__(self, conn: socket.socket, pid: int, stdout, stderr):
+        self.pid = pid
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode: Optional[int] = None
+        self._conn = conn
+        self._buffer = b""
+
+    @property
+    def exit_fd(self) -> int:
+        return self._conn.fileno()
+
+    def poll(self) -> Optional[int]:
+        if self.returncode is None:
+            self._read_exit(block=False)
+        return self.returncode
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        if self.returncode is None:
+            self._conn.settimeout(timeout)
+            try:
+                self._read_exit(block=True)
+            except socket.timeout:
+                raise subprocess.TimeoutExpired("fork-server", timeout)
+        return self.returncode
+
+    def send_signal(self, sig: int):
+        if self.returncode is None:
+            try:
+                os.kill(self.pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def terminate(self):
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
+
+    def _read_exit(self, block: bool):
+        if not block:
+            self._conn.setblocking(False)
+        while b"\n" not in self._buffer:
+            try:
+                chunk = self._conn.recv(4096)
+            except BlockingIOError:
+                return
+            if not chunk:
+                # fork 服务意外退出，无法得知退出码
+                self.returncode = -signal.SIGKILL
+                self._conn.close()
+                return
+            self._buffer += chunk
+        message = json.loads(self._buffer.split(b"\n", 1)[0])
+        self.returncode = message.get("exit", 1)
+        self._conn.close()
+
+
+class WarmPool:
+    """
+    预热解释器池
+
+    启动一个预先导入了常用模块的 fork 服务进程，每次执行从中 fork 出独立子进程，
+    省去解释器启动与模块导入的时间。每次执行有独立的 stdout/stderr、环境变量与工作目录。
+    仅支持提供 fork 与 Unix socket 的平台。
+    """
+
+    def __init__(self, python: str = "python", preload: Optional[List[str]] = None):
+        self.python = python
+        self.preload = list(preload or [])
+        self._server: Optional[subprocess.Popen] = None
+        self._socket_dir: Optional[str] = None
+        self._socket_path: Optional[str] = None
+        self._lock = threading.Lock()
+        # 最近的启动耗时（秒）
+        self.spawn_latencies = {"warm": deque(maxlen=1000), "cold": deque(maxlen=1000)}
+
+    @staticmethod
+    def is_supported() -> bool:
+        return hasattr(os, "fork") and hasattr(socket, "AF_UNIX") and hasattr(socket, "send_fds")
+
+    def start(self, timeout: float = 30):
+        """启动 fork 服务并等待预加载完成"""
+        with self._lock:
+            if self._server and self._server.poll() is None:
+                return
+            self._socket_dir = tempfile.mkdtemp(prefix="script-fork-")
+            self._socket_path = os.path.join(self._socket_dir, "fork.sock")
+            self._server = subprocess.Popen(
+                [self.python, FORK_SERVER, self._socket_path] + self.preload,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE
+            )
+            ready = self._wait_ready(timeout)
+            if not ready:
+                self._server.kill()
+                raise RuntimeError("Fork server failed to start")
+            logger.info(f"Started fork server {self._server.pid} with preload {self.preload}")
+
+    def stop(self):
+        """关闭 fork 服务（已创建的子进程不受影响）"""
+        with self._lock:
+            if self._server:
+                try:
+                    self._server.stdin.close()
+                    self._server.wait(timeout=5)
+                except (OSError, subprocess.TimeoutExpired):
+                    self._server.kill()
+                self._server = None
+            if self._socket_path and os.path.exists(self._socket_path):
+                os.remove(self._socket_path)
+            if self._socket_dir and os.path.isdir(self._socket_dir):
+                os.rmdir(self._socket_dir)
+
+    def spawn(self, code: Optional[str] = None, path: Optional[str] = None,
+              env: Optional[Dict[str, str]] = None,
+              cwd: Optional[str] = None,
+              rlimits: Optional[Dict[str, Tuple[int, int]]] = None,
+              cgroup: Optional[str] = None,
+              stdin: Optional[int] = None,
+              stdout: Optional[int] = None,
+              results: Optional[int] = None) -> ForkedProcess:
+        """
+        从 fork 服务创建子进程
+
+        Args:
+            code: 要执行的源码
+            path: 要执行的脚本或 .pyc 文件（与 code 二选一）
+            env: 子进程环境变量，默认继承当前进程
+            cwd: 子进程工作目录，默认为当前目录
+            rlimits: 在子进程中设置的资源限制 {RLIMIT 名称: (soft, hard)}
+            cgroup: 子进程加入的 cgroup 目录
+            stdin: 子进程的标准输入描述符，默认为 /dev/null
+            stdout: 子进程的标准输出描述符，默认新建管道
+            results: 结构化记录通道的写端，子进程中的号码通过环境变量 SCRIPT_RESULTS_FD 传递
+
+        Returns:
+            类似 Popen 的进程对象，stdout/stderr 为二进制管道（指定 stdout 时 stdout 为 None）
+        """
+        if self._server is None or self._server.poll() is not None:
+            self.start()
+
+        started = time.perf_counter()
+        out_r, out_w = os.pipe() if stdout is None else (None, os.dup(stdout))
+        err_r, err_w = os.pipe()
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            conn.connect(self._socket_path)
+            request = {
+                "code": code,
+                "path": path,
+                "env": dict(os.environ if env is None else env),
+                "cwd": cwd or os.getcwd(),
+                "rlimits": rlimits or {},
+                "cgroup": cgroup,
+                "stdin": stdin is not None,
+                "results": results is not None
+            }
+            fds = [out_w, err_w] + [fd for fd in (stdin, results) if fd is not None]
+            socket.send_fds(conn, [(json.dumps(request) + "\n").encode("utf-8")], fds)
+            reply = b""
+            while not reply.endswith(b"\n"):
+                chunk = conn.recv(4096)
+                if not chunk:
+                    raise RuntimeError("Fork server closed the connection")
+                reply += chunk
+            message = json.loads(reply)
+            if "error" in message:
+                raise RuntimeError(f"Fork server error: {message['error']}")
+        except Exception:
+            conn.close()
+            if out_r is not None:
+                os.close(out_r)
+            os.close(err_r)
+            raise
+        finally:
+            os.close(out_w)
+            os.close(err_w)
+
+        self.spawn_latencies["warm"].append(time.perf_counter() - started)
+        return ForkedProcess(conn, message["pid"],
+                             os.fdopen(out_r, "rb", buffering=0) if out_r is not None else None,
+                             os.fdopen(err_r, "rb", buffering=0))
+
+    def record_cold_spawn(self, seconds: float):
+        """记录一次普通启动的耗时，便于与预热模式对比"""
+        self.spawn_latencies["cold"].append(seconds)
+
+    def startup_stats(self) -> Dict[str, Dict[str, float]]:
+        """返回冷启动与预热启动的耗时统计（毫秒）"""
+        stats = {}
+        for mode, samples in self.spawn_latencies.items():
+            values = sorted(samples)
+            if not values:
+                continue
+            stats[mode] = {
+                "count": len(values),
+                "mean_ms": statistics.fmean(values) * 1000,
+                "p50_ms": values[len(values) // 2] * 1000,
+                "p95_ms": values[min(len(values) - 1, int(len(values) * 0.95))] * 1000
+            }
+        return stats
+
+    def compare_startup(self, code: str = "pass", runs: int = 10) -> Dict[str, float]:
+        """
+        测量从启动到脚本结束的平均耗时（毫秒），对比普通启动与预热启动
+
+        普通启动同样导入 preload 模块，结果反映的是真实脚本的启动开销。
+        """
+        preamble = "".join(f"import {module}\n" for module in self.preload)
+        cold = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            subprocess.run([self.python, "-c", preamble + code],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            cold.append(time.perf_counter() - started)
+
+        warm = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            process = self.spawn(code=code)
+            process.stdout.close()
+            process.stderr.close()
+            process.wait()
+            warm.append(time.perf_counter() - started)
+
+        return {"cold_ms": statistics.fmean(cold) * 1000,
+                "warm_ms": statistics.fmean(warm) * 1000}
+
+    def _wait_ready(self, timeout: float) -> bool:
+        result = []
+        reader = threading.Thread(target=lambda: result.append(self._server.stdout.readline()))
+        reader.daemon = True
+        reader.start()
+        reader.join(timeout)
+        return bool(result) and result[0].strip() == b"ready"
@@ -1,14 +1,28 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from .models import Base
+from .migrations import migrate_schema
+from .search_index import create_search_index
 
 DATABASE_URL = "sqlite:///script_manager.db"
 
 engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(bind=engine)
 
+@event.listens_for(engine, "connect")
+def _configure_sqlite(dbapi_connection, connection_record):
+    """WAL 模式下读写互不阻塞，写入线程批量提交时也不会阻塞读取"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
 def init_db():
     Base.metadata.create_all(engine)
+    # 旧版本创建的数据库补上后来加入的列与索引
+    migrate_schema(engine)
+    create_search_index(engine)
 
 def get_db():
     db = SessionLocal()
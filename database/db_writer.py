@@ -0,0 +1,153 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_STOP = object()
+
+
+class _Operation:
+    def __init__(self, fn: Optional[Callable[[Session], Any]] = None,
+                 model=None, pk: Any = None, fields: Optional[Dict[str, Any]] = None):
+        self.fn = fn
+        self.model = model
+        self.pk = pk
+        self.fields = fields
+        self.future: Future = Future()
+
+
+class DBWriter:
+    """
+    数据库批量写入器
+
+    独占一个连接，由单独的线程执行所有写操作。排队中的操作按批合并到同一个事务中提交，
+    同一批内对同一条记录的多次更新合并为一次。其他线程不共享会话，读操作应使用各自的会话。
+    """
+
+    def __init__(self, engine: Engine, batch_size: int = 500):
+        self.engine = engine
+        self.batch_size = batch_size
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        # 统计
+        self.commits = 0
+        self.operations = 0
+        # 每次提交后在写入线程中调用 (耗时秒数, 操作数)
+        self.on_commit: Optional[Callable[[float, int], None]] = None
+
+    def submit(self, fn: Callable[[Session], Any]) -> Future:
+        """提交任意写操作，fn 在写入线程中以会话为参数调用，返回值通过 Future 获取"""
+        return self._put(_Operation(fn=fn))
+
+    def update(self, model, pk: Any, **fields) -> Future:
+        """更新一条记录的字段"""
+        return self._put(_Operation(model=model, pk=pk, fields=fields))
+
+    def insert(self, obj) -> Future:
+        """插入一条记录，Future 的结果为主键"""
+        def _insert(session: Session):
+            session.add(obj)
+            session.flush()
+            return obj.id
+        return self.submit(_insert)
+
+    def flush(self, timeout: Optional[float] = None):
+        """等待此前提交的所有操作完成"""
+        self.submit(lambda session: None).result(timeout)
+
+    def stop(self):
+        """写完排队中的操作后停止写入线程"""
+        with self._lock:
+            if self._thread is None:
+                return
+            self._queue.put(_STOP)
+            thread, self._thread = self._thread, None
+        thread.join()
+
+    def _put(self, operation: _Operation) -> Future:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="DBWriter")
+                self._thread.daemon = True
+                self._thread.start()
+            self._queue.put(operation)
+        return operation.future
+
+    def _run(self):
+        with self.engine.connect() as connection:
+            session = Session(bind=connection, expire_on_commit=False)
+            while True:
+                first = self._queue.get()
+                if first is _STOP:
+                    break
+                # 上一批提交期间积压的操作合并为一批，不额外等待
+                batch = [first]
+                stop = False
+                while len(batch) < self.batch_size:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stop = True
+                        break
+                    batch.append(item)
+
+                if not self._apply(session, batch):
+                    # 整批失败时逐条重试，避免一条错误影响其他操作
+                    for operation in batch:
+                        self._apply(session, [operation])
+                if stop:
+                    break
+            session.close()
+
+    def _apply(self, session: Session, batch: List[_Operation]) -> bool:
+        results: List[Tuple[_Operation, Any]] = []
+        started = time.perf_counter()
+        try:
+            merged: Dict[Tuple[Any, Any], Dict[str, Any]] = {}
+            for operation in batch:
+                if operation.fn is not None:
+                    self._flush_updates(session, merged)
+                    results.append((operation, operation.fn(session)))
+                else:
+                    key = (operation.model, operation.pk)
+                    merged.setdefault(key, {}).update(operation.fields)
+                    results.append((operation, None))
+            self._flush_updates(session, merged)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            if len(batch) == 1:
+                logger.error(f"Database write failed: {str(e)}")
+                batch[0].future.set_exception(e)
+            return False
+
+        self.commits += 1
+        self.operations += len(batch)
+        if self.on_commit:
+            try:
+                self.on_commit(time.perf_counter() - started, len(batch))
+            except Exception as e:
+                logger.error(f"Commit observer failed: {str(e)}")
+        for operation, result in results:
+            operation.future.set_result(result)
+        return True
+
+    @staticmethod
+    def _flush_updates(session: Session, merged: Dict[Tuple[Any, Any], Dict[str, Any]]):
+        for (model, pk), fields in merged.items():
+            primary_key = model.__mapper__.primary_key[0]
+            result = session.execute(update(model).where(primary_key == pk).values(**fields))
+            if result.rowcount == 0:
+                raise ValueError(f"{model.__name__} {pk} not found")
+        merged.clear()
@@ -0,0 +1,54 @@
+"""
+数据库结构迁移
+
+create_all 只创建不存在的表，不会修改已有的表。旧版本创建的数据库缺少后来加入的列与索引，
+启动时逐表比较数据库中的列（PRAGMA table_info）与模型定义，用 ALTER TABLE ... ADD COLUMN
+补上缺少的列，已有行取列的 server_default（没有时为 NULL），再创建缺少的索引。
+"""
+from typing import List
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.schema import CreateColumn
+from .models import Base
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def _existing_columns(connection, table_name: str) -> set:
+    return {row[1] for row in connection.execute(text(f'PRAGMA table_info("{table_name}")'))}
+
+
+def migrate_schema(engine: Engine) -> List[str]:
+    """
+    为已有的表补上缺少的列与索引，在 create_all 之后调用
+
+    Returns:
+        新增的列（"表名.列名"）
+    """
+    added = []
+    existing_tables = set(inspect(engine).get_table_names())
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            columns = _existing_columns(connection, table.name)
+            for column in table.columns:
+                if column.name in columns:
+                    continue
+                # 外键约束不能通过 ADD COLUMN 补上，只添加列本身
+                ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                try:
+                    connection.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN {ddl}'))
+                except OperationalError:
+                    # 其他进程（如共用目录的工作节点）同时在迁移
+                    if column.name not in _existing_columns(connection, table.name):
+                        raise
+                    continue
+                added.append(f"{table.name}.{column.name}")
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+    if added:
+        logger.info(f"Migrated database schema, added columns: {', '.join(added)}")
+    return added
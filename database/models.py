@@ -1,16 +1,199 @@
 from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text
+from sqlalchemy import create_engine, Column, Boolean, Integer, Float, String, DateTime, Text, ForeignKey, Index, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
 
+class User(Base):
+    __tablename__ = 'users'
+    
+    id = Column(Integer, primary_key=True)
+    username = Column(String(50), nullable=False, unique=True)
+    created_at = Column(DateTime, default=datetime.now)
+
 class Script(Base):
     __tablename__ = 'scripts'
     
     id = Column(Integer, primary_key=True)
     name = Column(String(100), nullable=False)
     description = Column(Text)
-    type = Column(String(20), default='python')  # python, shell等
+    type = Column(String(20), default='python', index=True)  # python, shell等
     content = Column(Text, nullable=False)
+    resource_limits = Column(Text)  # JSON，见 core.resource_limits
+    tags = Column(String(255))  # 以逗号分隔并包围，如 ",daily,report,"，便于按标签匹配
+    cacheable = Column(Boolean, default=False, server_default="0")  # 结果只取决于内容与参数，可复用缓存的结果（见 core.result_cache）
+    user_id = Column(Integer, ForeignKey('users.id'))
+    created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+class ScriptParameter(Base):
+    __tablename__ = 'script_parameters'
+    
+    id = Column(Integer, primary_key=True)
+    script_id = Column(Integer, ForeignKey('scripts.id'), nullable=False, index=True)
+    name = Column(String(100), nullable=False)
+    description = Column(Text)
+    default_value = Column(Text)
+    parameter_type = Column(String(20), default='string')
+
+class ScriptExecution(Base):
+    __tablename__ = 'script_executions'
+    __table_args__ = (
+        # 按脚本分页查询执行历史
+        Index('ix_script_executions_script_started', 'script_id', 'started_at'),
+        Index('ix_script_executions_status', 'status'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    script_id = Column(Integer, ForeignKey('scripts.id'), nullable=False)
+    # queued, running, completed, failed, timeout, cancelled,
+    # 超出资源限制时为 memory_limit, cpu_limit, file_limit, process_limit，
+    # 流水线中因上游失败未运行的阶段为 skipped
+    status = Column(String(20), default='queued')
+    priority = Column(Integer, default=0)
+    exit_code = Column(Integer)
+    error_message = Column(String(255))  # 失败原因摘要，输出内容见 ExecutionOutputChunk
+    output_file = Column(String(255))  # 输出超过上限时的完整输出文件
+    error_file = Column(String(255))
+    output_size = Column(Integer, default=0)
+    error_size = Column(Integer, default=0)
+    # 资源占用汇总，时间序列见 ExecutionResourceSamples
+    cpu_time = Column(Float)  # 进程树的 CPU 时间（秒）
+    peak_rss = Column(Integer)  # 字节
+    read_bytes = Column(Integer)
+    write_bytes = Column(Integer)
+    worker = Column(String(100))  # 分布式模式下执行该记录的工作节点，本机执行时为空
+    cached_from = Column(Integer)  # 结果复用自缓存或同时进行的相同执行时，为提供结果的执行ID
+    pipeline_run_id = Column(Integer, ForeignKey('pipeline_runs.id'), index=True)  # 所属的流水线运行
+    stage = Column(String(100))  # 流水线中的阶段名
+    # 脚本通过结构化记录通道报告的最新进度（0~1）与说明，其他记录见 ExecutionRecord
+    progress = Column(Float)
+    progress_message = Column(String(255))
+    queued_at = Column(DateTime, default=datetime.now)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+class ExecutionOutputChunk(Base):
+    __tablename__ = 'execution_output_chunks'
+    __table_args__ = (
+        Index('ix_execution_output_chunks_execution', 'execution_id', 'stream', 'seq'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    execution_id = Column(Integer, ForeignKey('script_executions.id'), nullable=False)
+    stream = Column(String(10), nullable=False)  # stdout, stderr
+    seq = Column(Integer, nullable=False)
+    data = Column(Text, nullable=False)
+
+class ExecutionRecord(Base):
+    __tablename__ = 'execution_records'
+    __table_args__ = (
+        Index('ix_execution_records_execution', 'execution_id', 'kind', 'name'),
+        # 跨执行按名称查询结果与指标（如某个脚本历次运行的 accuracy）
+        Index('ix_execution_records_kind_name', 'kind', 'name'),
+    )
+    
+    # 脚本通过结构化记录通道（runtime/script_results.py）发出的记录，每行 JSON 一条
+    id = Column(Integer, primary_key=True)
+    execution_id = Column(Integer, ForeignKey('script_executions.id'), nullable=False)
+    seq = Column(Integer, nullable=False)
+    kind = Column(String(50), nullable=False)  # metric, result 或脚本自定义的类型
+    name = Column(String(255))
+    value = Column(Float)  # 数值记录的值，便于排序与聚合
+    step = Column(Integer)
+    data = Column(Text, nullable=False)  # 完整记录的 JSON
+    created_at = Column(DateTime, default=datetime.now)
+
+class ExecutionResourceSamples(Base):
+    __tablename__ = 'execution_resource_samples'
+    
+    # 每个执行一行，各列为 array('d') 的原始字节
+    execution_id = Column(Integer, ForeignKey('script_executions.id'), primary_key=True)
+    sample_count = Column(Integer, nullable=False, default=0)
+    elapsed = Column(LargeBinary)  # 距开始的秒数
+    cpu_seconds = Column(LargeBinary)
+    rss = Column(LargeBinary)
+    read_bytes = Column(LargeBinary)
+    write_bytes = Column(LargeBinary)
+
+class ScriptSchedule(Base):
+    __tablename__ = 'script_schedules'
+    
+    id = Column(Integer, primary_key=True)
+    script_id = Column(Integer, ForeignKey('scripts.id'), nullable=False, index=True)
+    # cron 与 interval 二选一，见 core.cron 与 core.scheduler
+    cron = Column(String(100))
+    interval = Column(Integer)  # 秒
+    parameters = Column(Text)  # JSON
+    misfire_policy = Column(String(20), default='coalesce')  # skip, coalesce, catch_up
+    jitter = Column(Integer, default=0)  # 每次运行随机推迟 0~jitter 秒
+    timeout = Column(Integer)
+    priority = Column(Integer, default=0)
+    enabled = Column(Boolean, default=True)
+    next_run_at = Column(DateTime)  # 下一次的计划时间（不含随机推迟）
+    last_run_at = Column(DateTime)
     created_at = Column(DateTime, default=datetime.now)
-    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now) 
\ No newline at end of file
+    # 只在修改定义时更新，调度器记录运行时间不改变它，调度器据此发现修改
+    updated_at = Column(DateTime, default=datetime.now)
+
+class ResultCacheEntry(Base):
+    __tablename__ = 'result_cache'
+    
+    # 脚本内容、参数与解释器的 SHA-256，见 core.result_cache
+    key = Column(String(64), primary_key=True)
+    script_id = Column(Integer, nullable=False, index=True)
+    execution_id = Column(Integer, ForeignKey('script_executions.id'), nullable=False)
+    exit_code = Column(Integer)
+    size = Column(Integer, default=0)  # 源执行的输出字节数
+    created_at = Column(DateTime, default=datetime.now)
+    last_used_at = Column(DateTime, default=datetime.now)
+
+class Pipeline(Base):
+    __tablename__ = 'pipelines'
+    
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False, unique=True)
+    description = Column(Text)
+    # JSON 阶段列表：[{"name", "script_id", "input", "after", "parameters", "timeout"}]，见 core.pipeline
+    stages = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+class PipelineRun(Base):
+    __tablename__ = 'pipeline_runs'
+    
+    id = Column(Integer, primary_key=True)
+    pipeline_id = Column(Integer, ForeignKey('pipelines.id'), nullable=False, index=True)
+    status = Column(String(20), default='running')  # running, completed, failed, cancelled
+    parameters = Column(Text)  # JSON，传给每个阶段
+    started_at = Column(DateTime, default=datetime.now)
+    finished_at = Column(DateTime)
+
+class Sweep(Base):
+    __tablename__ = 'sweeps'
+    
+    id = Column(Integer, primary_key=True)
+    script_id = Column(Integer, ForeignKey('scripts.id'), nullable=False, index=True)
+    source = Column(String(255))  # 参数集文件（CSV 或 JSON Lines），由调用方提供参数集时为空
+    parameters = Column(Text)  # JSON，所有参数集共用的参数
+    batch_size = Column(Integer, default=1)
+    max_attempts = Column(Integer, default=3)
+    status = Column(String(20), default='running')  # running, completed, failed, interrupted
+    total = Column(Integer, default=0)  # 已读取的参数集数
+    completed = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    output_file = Column(String(255))  # 汇总结果，每个参数集一行 JSON，见 core.sweep
+    created_at = Column(DateTime, default=datetime.now)
+    finished_at = Column(DateTime)
+
+class SweepItem(Base):
+    __tablename__ = 'sweep_items'
+    
+    # 只保存已有最终结果的参数集，续跑时跳过
+    sweep_id = Column(Integer, ForeignKey('sweeps.id'), primary_key=True)
+    item_index = Column(Integer, primary_key=True)  # 参数集在来源中的序号
+    status = Column(String(20), nullable=False)
+    exit_code = Column(Integer)
+    attempts = Column(Integer, default=1)
+    execution_id = Column(Integer)  # 最后一次运行所在的执行（批量运行时多个参数集共用）
+    finished_at = Column(DateTime, default=datetime.now)
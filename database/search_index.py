@@ -0,0 +1,91 @@
+"""
+脚本全文索引
+
+使用 SQLite FTS5 外部内容表索引 scripts 表的 name、description、content，
+由触发器在插入、更新、删除脚本时增量同步，不论写入来自 ScriptManager 还是直接的 ORM 操作。
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+FTS_TABLE = "scripts_fts"
+
+# 排序权重：名称 > 描述 > 内容
+RANK_WEIGHTS = (10.0, 5.0, 1.0)
+
+_CREATE_STATEMENTS = [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        name, description, content,
+        content='scripts', content_rowid='id',
+        tokenize='unicode61', prefix='2 3 4'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS scripts_fts_insert AFTER INSERT ON scripts BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, description, content)
+        VALUES (new.id, new.name, coalesce(new.description, ''), new.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS scripts_fts_delete AFTER DELETE ON scripts BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description, content)
+        VALUES ('delete', old.id, old.name, coalesce(old.description, ''), old.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS scripts_fts_update
+    AFTER UPDATE OF name, description, content ON scripts BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description, content)
+        VALUES ('delete', old.id, old.name, coalesce(old.description, ''), old.content);
+        INSERT INTO {FTS_TABLE}(rowid, name, description, content)
+        VALUES (new.id, new.name, coalesce(new.description, ''), new.content);
+    END
+    """,
+]
+
+
+def create_search_index(engine: Engine) -> bool:
+    """
+    创建全文索引表与同步触发器，已有脚本在首次创建时一次性写入索引
+
+    Returns:
+        当前 SQLite 是否支持 FTS5
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+    try:
+        with engine.begin() as connection:
+            if has_search_index(connection):
+                return True
+            for statement in _CREATE_STATEMENTS:
+                connection.execute(text(statement))
+            connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+        logger.info("Created full-text search index")
+        return True
+    except Exception as e:
+        logger.warning(f"Full-text search is unavailable: {str(e)}")
+        return False
+
+
+def has_search_index(connection) -> bool:
+    if connection.dialect.name != "sqlite":
+        return False
+    return connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": FTS_TABLE}
+    ).first() is not None
+
+
+def build_match_query(query: str) -> str:
+    """
+    把用户输入转换为 FTS5 查询：每个词按短语处理并做前缀匹配，词之间为 AND
+
+    例如 'load csv' -> '"load"* "csv"*'
+    """
+    terms = []
+    for term in query.split():
+        terms.append('"' + term.replace('"', '""') + '"*')
+    return " ".join(terms)
@@ -0,0 +1,464 @@
+"""
+分布式执行的协调器
+
+协调器持有执行队列与执行记录，本身不运行脚本。工作节点（distributed.worker）通过 TCP
+或 Unix socket 连接并注册执行槽数，协调器按 ExecutionQueue 的优先级与公平顺序把排队的执行
+租给工作节点，工作节点回传输出与结果，由协调器写入数据库：
+
+    python main.py coordinator [--port 8766 | --socket PATH]
+    python main.py worker --connect HOST:PORT --slots 8
+
+- 租约：每个租出的执行有到期时间，工作节点的心跳为其持有的执行续约。
+  工作节点断开或心跳超时后，它持有的执行重新排队，超过 coordinator_max_attempts 次记为失败
+- 预取：工作节点最多持有 slots + prefetch 个执行，多出的在节点本地排队
+- 工作窃取：队列为空而有工作节点空闲时，从积压的节点收回尚未启动的执行（revoke）交给空闲节点
+
+执行至少运行一次：与协调器失联但仍在运行的节点可能与重新租到该执行的节点重复运行，
+脚本应能容忍重复执行。协调器提供与 ScriptExecutor 相同的 execute/stop_execution，
+可直接作为 api.server.APIServer 的执行器。
+"""
+import asyncio
+import hmac
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import insert
+
+from core.config import Config
+from core.execution_queue import ExecutionQueue
+from core.executor import OUTPUT_CHUNK_SIZE
+from database.db_manager import engine
+from database.db_writer import DBWriter
+from database.models import ScriptExecution, ExecutionOutputChunk, ExecutionRecord
+from distributed.protocol import encode, read_message, start_server
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 工作节点在结果中回传、直接写入执行记录的字段
+RESULT_FIELDS = ("error_message", "output_file", "error_file", "output_size", "error_size",
+                 "cpu_time", "peak_rss", "read_bytes", "write_bytes", "progress", "progress_message")
+# 工作节点回传的结构化记录字段
+RECORD_FIELDS = ("seq", "kind", "name", "value", "step", "data")
+
+
+class _Run:
+    """协调器中的一个执行"""
+
+    def __init__(self, execution_id: int, script_id: int, content: str,
+                 parameters: Optional[Dict[str, str]], timeout: float,
+                 limits: Optional[Dict[str, int]], priority: int,
+                 output_callback: Optional[Callable[[str], None]],
+                 finished_callback: Optional[Callable[[int, str, Optional[int]], None]],
+                 cacheable: bool = False):
+        self.execution_id = execution_id
+        self.script_id = script_id
+        self.content = content
+        self.parameters = parameters or {}
+        self.timeout = timeout
+        self.limits = limits or {}
+        self.priority = priority
+        self.output_callback = output_callback
+        self.finished_callback = finished_callback
+        self.cacheable = cacheable
+        # 因工作节点失联而重新排队的次数
+        self.attempts = 0
+        self.worker: Optional["_Worker"] = None
+        self.started = False
+        self.revoking = False
+        self.lease_expires = 0.0
+
+
+class _Worker:
+    """一个已注册的工作节点连接"""
+
+    def __init__(self, worker_id: str, host: str, slots: int, prefetch: int,
+                 writer: asyncio.StreamWriter):
+        self.worker_id = worker_id
+        self.host = host
+        self.slots = slots
+        self.capacity = slots + prefetch
+        self.writer = writer
+        # 按租出顺序排列
+        self.runs: Dict[int, _Run] = {}
+        self.last_seen = time.monotonic()
+
+    @property
+    def free_slots(self) -> int:
+        return self.slots - len(self.runs)
+
+    def send(self, message_type: str, **fields):
+        if not self.writer.is_closing():
+            self.writer.write(encode(message_type, **fields))
+
+
+class Coordinator:
+    """
+    分布式执行的协调器
+
+    所有状态只在事件循环线程中修改；execute 与 stop_execution 可在任意线程中调用，
+    输出与结束回调在事件循环线程中调用。
+    """
+
+    def __init__(self, writer: Optional[DBWriter] = None, host: Optional[str] = None,
+                 port: Optional[int] = None, socket_path: Optional[str] = None,
+                 token: Optional[str] = None):
+        config = Config()
+        self.writer = writer or DBWriter(engine)
+        self.host = host or config.get_system_config("coordinator_host", "127.0.0.1")
+        self.port = port if port is not None else config.get_system_config("coordinator_port", 8766)
+        self.socket_path = socket_path
+        self.token = token
+        self.lease_ttl = config.get_system_config("coordinator_lease_ttl", 30)
+        self.heartbeat_interval = config.get_system_config("coordinator_heartbeat_interval", 5)
+        self.max_attempts = config.get_system_config("coordinator_max_attempts", 3)
+        # 租出的执行在队列中计为运行中，总数只受工作节点容量限制
+        self.queue = ExecutionQueue(sys.maxsize,
+                                    config.get_system_config("max_concurrent_per_script", 0))
+        self._runs: Dict[int, _Run] = {}
+        self._workers: Dict[str, _Worker] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._lease_timer: Optional[asyncio.TimerHandle] = None
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self._server = await start_server(self._handle, self.host, self.port, self.socket_path)
+        if self.socket_path:
+            os.chmod(self.socket_path, 0o600)
+            logger.info(f"Coordinator listening on {self.socket_path}")
+        else:
+            self.port = self._server.sockets[0].getsockname()[1]
+            logger.info(f"Coordinator listening on {self.host}:{self.port}")
+        self._lease_timer = self._loop.call_later(self.heartbeat_interval, self._check_leases)
+
+    async def stop(self):
+        if self._lease_timer:
+            self._lease_timer.cancel()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for worker in list(self._workers.values()):
+            worker.writer.close()
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    def shutdown(self):
+        """写完排队中的执行记录后停止写入线程"""
+        self.writer.flush()
+        self.writer.stop()
+
+    @property
+    def workers(self) -> List[dict]:
+        """已注册工作节点的概况（在事件循环线程中读取）"""
+        return [{"worker_id": worker.worker_id, "host": worker.host, "slots": worker.slots,
+                 "executions": len(worker.runs)} for worker in self._workers.values()]
+
+    # 执行器接口
+
+    def execute(self, script_id: int, content: str,
+                parameters: Dict[str, str] = None,
+                timeout: int = 3600,
+                output_callback: Optional[Callable[[str], None]] = None,
+                priority: int = 0,
+                limits: Optional[Dict[str, int]] = None,
+                finished_callback: Optional[Callable[[int, str, Optional[int]], None]] = None,
+                cacheable: bool = False,
+                attachments: Optional[Dict[str, object]] = None) -> int:
+        """
+        提交执行，参数与 ScriptExecutor.execute 相同，但不支持输入附件
+
+        执行记录创建后进入协调器的队列，由工作节点编译与运行，语法错误由工作节点报告为失败。
+        可缓存的执行由工作节点查各自的结果缓存。
+        工作节点报告的 output_file 与 error_file 是工作节点本地文件系统上的路径，
+        在协调器所在的机器上不一定存在；输出摘要与结构化记录已复制到协调器的数据库中。
+
+        Raises:
+            ValueError: 指定了输入附件（共享内存与本地文件无法传给其他机器上的工作节点）
+        """
+        if attachments:
+            raise ValueError("Input attachments are not supported in distributed mode")
+        if self._loop is None:
+            raise RuntimeError("Coordinator is not running")
+        execution = ScriptExecution(script_id=script_id, status="queued", priority=priority)
+        try:
+            execution_id = self.writer.insert(execution).result()
+        except Exception as e:
+            logger.error(f"Failed to queue script {script_id}: {str(e)}")
+            raise
+        run = _Run(execution_id, script_id, content, parameters, timeout, limits, priority,
+                   output_callback, finished_callback, cacheable)
+        self._loop.call_soon_threadsafe(self._enqueue, run)
+        logger.info(f"Queued execution {execution_id} for script {script_id}")
+        return execution_id
+
+    def stop_execution(self, execution_id: int):
+        """停止执行：排队中的直接取消，已租出的通知工作节点停止"""
+        self._loop.call_soon_threadsafe(self._stop, execution_id)
+
+    def _enqueue(self, run: _Run):
+        self._runs[run.execution_id] = run
+        self.queue.push(run.execution_id, run.script_id, run.priority, payload=run)
+        self._assign()
+
+    def _stop(self, execution_id: int):
+        if self.queue.cancel(execution_id):
+            run = self._runs.pop(execution_id)
+            self._update_execution(execution_id, status="cancelled", finished_at=datetime.now())
+            self._notify_finished(run, "cancelled", None)
+            logger.info(f"Cancelled queued execution {execution_id}")
+            return
+        run = self._runs.get(execution_id)
+        if run and run.worker:
+            run.worker.send("cancel", execution_id=execution_id)
+            logger.info(f"Stopping execution {execution_id} on worker {run.worker.worker_id}")
+
+    # 调度
+
+    def _assign(self):
+        """把排队的执行租给还有容量的工作节点，负载最低的节点优先"""
+        while True:
+            waiting = [worker for worker in self._workers.values()
+                       if len(worker.runs) < worker.capacity]
+            if not waiting:
+                return
+            entry = self.queue.pop_ready()
+            if entry is None:
+                if not self.queue.queued_count:
+                    self._steal()
+                return
+            worker = min(waiting, key=lambda w: len(w.runs) / w.slots)
+            self._lease(worker, entry.payload)
+
+    def _lease(self, worker: _Worker, run: _Run):
+        run.worker = worker
+        run.started = False
+        run.revoking = False
+        run.lease_expires = time.monotonic() + self.lease_ttl
+        worker.runs[run.execution_id] = run
+        worker.send("run", execution_id=run.execution_id, script_id=run.script_id,
+                    content=run.content, parameters=run.parameters, timeout=run.timeout,
+                    limits=run.limits, priority=run.priority, cacheable=run.cacheable)
+
+    def _steal(self):
+        """队列为空时，从有积压的工作节点收回尚未启动的执行，交给有空闲执行槽的节点"""
+        revoking = sum(1 for run in self._runs.values() if run.revoking)
+        wanted = sum(max(0, worker.free_slots) for worker in self._workers.values()) - revoking
+        if wanted <= 0:
+            return
+        for worker in sorted(self._workers.values(), key=lambda w: w.free_slots):
+            backlog = len(worker.runs) - worker.slots
+            if backlog <= 0:
+                break
+            # 最后租出的最晚启动
+            for run in reversed(list(worker.runs.values())):
+                if backlog <= 0 or wanted <= 0:
+                    break
+                if run.started or run.revoking:
+                    continue
+                run.revoking = True
+                worker.send("revoke", execution_id=run.execution_id)
+                backlog -= 1
+                wanted -= 1
+            if wanted <= 0:
+                return
+
+    def _check_leases(self):
+        """收回心跳超时的工作节点与过期租约上的执行（定时在事件循环中调用）"""
+        now = time.monotonic()
+        for worker in list(self._workers.values()):
+            if now - worker.last_seen > self.lease_ttl:
+                self._drop_worker(worker, f"Worker {worker.worker_id} missed heartbeats")
+                continue
+            for run in [run for run in worker.runs.values() if run.lease_expires < now]:
+                # 通知节点停止，避免与重新租出的执行重复运行
+                worker.send("cancel", execution_id=run.execution_id)
+                del worker.runs[run.execution_id]
+                self._requeue(run, f"Lease expired on worker {worker.worker_id}")
+        self._assign()
+        self._lease_timer = self._loop.call_later(self.heartbeat_interval, self._check_leases)
+
+    def _drop_worker(self, worker: _Worker, reason: str):
+        """移除工作节点并重新排队它持有的执行"""
+        logger.warning(reason)
+        if self._workers.get(worker.worker_id) is worker:
+            del self._workers[worker.worker_id]
+        worker.writer.close()
+        runs = list(worker.runs.values())
+        worker.runs.clear()
+        for run in runs:
+            self._requeue(run, reason)
+        self._assign()
+
+    def _requeue(self, run: _Run, reason: str):
+        run.worker = None
+        run.revoking = False
+        run.attempts += 1
+        self.queue.finish(run.execution_id)
+        if run.attempts >= self.max_attempts:
+            self._finish(run, "failed", None, error_message=reason[:255])
+            return
+        self._update_execution(run.execution_id, status="queued", started_at=None, worker=None)
+        self._publish(run, f"ERROR: {reason}, execution requeued\n")
+        self.queue.push(run.execution_id, run.script_id, run.priority, payload=run)
+        logger.info(f"Requeued execution {run.execution_id} (attempt {run.attempts + 1})")
+
+    def _finish(self, run: _Run, status: str, exit_code: Optional[int], **fields):
+        self.queue.finish(run.execution_id)
+        self._runs.pop(run.execution_id, None)
+        self._update_execution(run.execution_id, status=status, exit_code=exit_code,
+                               finished_at=datetime.now(), **fields)
+        self._notify_finished(run, status, exit_code)
+        logger.info(f"Execution {run.execution_id} finished with status {status}")
+
+    # 工作节点连接
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        worker = None
+        try:
+            message = await asyncio.wait_for(read_message(reader), self.lease_ttl)
+            worker = self._register(message, writer)
+            if worker is None:
+                await writer.drain()
+                return
+            while True:
+                message = await read_message(reader)
+                if message is None:
+                    break
+                worker.last_seen = time.monotonic()
+                self._on_message(worker, message)
+                await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError) as e:
+            logger.warning(f"Worker connection closed: {type(e).__name__} {str(e)}")
+        finally:
+            if worker is not None and self._workers.get(worker.worker_id) is worker:
+                self._drop_worker(worker, f"Worker {worker.worker_id} disconnected")
+            writer.close()
+
+    def _register(self, message: Optional[dict], writer: asyncio.StreamWriter) -> Optional[_Worker]:
+        def reject(reason: str):
+            logger.warning(f"Rejected worker: {reason}")
+            writer.write(encode("error", message=reason))
+
+        if not message or message["type"] != "register":
+            reject("Expected register")
+            return None
+        if self.token and not hmac.compare_digest(str(message.get("token") or ""), self.token):
+            reject("Invalid token")
+            return None
+        slots = message.get("slots")
+        prefetch = message.get("prefetch") or 0
+        worker_id = message.get("worker_id")
+        if not isinstance(worker_id, str) or not worker_id or not isinstance(slots, int) \
+                or slots < 1 or not isinstance(prefetch, int) or prefetch < 0:
+            reject("Invalid registration")
+            return None
+
+        old = self._workers.get(worker_id)
+        if old is not None:
+            self._drop_worker(old, f"Worker {worker_id} registered again")
+        worker = _Worker(worker_id[:100], str(message.get("host") or ""), slots, prefetch, writer)
+        self._workers[worker.worker_id] = worker
+        worker.send("registered", lease_ttl=self.lease_ttl,
+                    heartbeat_interval=self.heartbeat_interval)
+        logger.info(f"Worker {worker.worker_id} registered with {slots} slots")
+        self._assign()
+        return worker
+
+    def _on_message(self, worker: _Worker, message: dict):
+        message_type = message["type"]
+        if message_type == "heartbeat":
+            expires = time.monotonic() + self.lease_ttl
+            for execution_id in message.get("executions") or []:
+                run = worker.runs.get(execution_id)
+                if run:
+                    run.lease_expires = expires
+            return
+
+        # 不再由该节点持有的执行（已收回或租约过期）的消息直接丢弃
+        run = worker.runs.get(message.get("execution_id"))
+        if run is None:
+            return
+        if message_type == "output":
+            self._publish(run, str(message.get("data") or ""))
+        elif message_type == "started":
+            run.started = True
+            self._update_execution(run.execution_id, status="running",
+                                   started_at=datetime.now(), worker=worker.worker_id)
+        elif message_type == "revoked":
+            run.revoking = False
+            if message.get("ok"):
+                del worker.runs[run.execution_id]
+                run.worker = None
+                self.queue.finish(run.execution_id)
+                self.queue.push(run.execution_id, run.script_id, run.priority, payload=run)
+                self._assign()
+        elif message_type == "result":
+            del worker.runs[run.execution_id]
+            self._on_result(worker, run, message)
+            self._assign()
+
+    def _on_result(self, worker: _Worker, run: _Run, message: dict):
+        status = message.get("status")
+        exit_code = message.get("exit_code")
+        if not isinstance(status, str):
+            status = "failed"
+        fields = {name: message.get(name) for name in RESULT_FIELDS}
+        fields["worker"] = worker.worker_id
+        if not run.started:
+            fields["started_at"] = datetime.now()
+        self._store_output(run.execution_id, "stdout", message.get("stdout"))
+        self._store_output(run.execution_id, "stderr", message.get("stderr"))
+        self._store_records(run.execution_id, message.get("records"))
+        self._finish(run, status[:20], exit_code if isinstance(exit_code, int) else None, **fields)
+
+    # 记录与回调
+
+    def _update_execution(self, execution_id: int, **fields):
+        return self.writer.update(ScriptExecution, execution_id, **fields)
+
+    def _store_output(self, execution_id: int, stream: str, text: Optional[str]):
+        """把工作节点回传的输出摘要分块写入输出表"""
+        if not text or not isinstance(text, str):
+            return
+        chunks = [
+            ExecutionOutputChunk(execution_id=execution_id, stream=stream, seq=seq,
+                                 data=text[start:start + OUTPUT_CHUNK_SIZE])
+            for seq, start in enumerate(range(0, len(text), OUTPUT_CHUNK_SIZE))
+        ]
+        self.writer.submit(lambda session: session.add_all(chunks))
+
+    def _store_records(self, execution_id: int, records):
+        """保存工作节点回传的结构化记录"""
+        if not isinstance(records, list):
+            return
+        now = datetime.now()
+        rows = [dict({name: record.get(name) for name in RECORD_FIELDS},
+                     execution_id=execution_id, created_at=now)
+                for record in records
+                if isinstance(record, dict) and isinstance(record.get("seq"), int)
+                and isinstance(record.get("kind"), str) and isinstance(record.get("data"), str)]
+        if rows:
+            self.writer.submit(lambda session: session.execute(insert(ExecutionRecord), rows))
+
+    @staticmethod
+    def _publish(run: _Run, text: str):
+        if run.output_callback and text:
+            try:
+                run.output_callback(text)
+            except Exception as e:
+                logger.error(f"Output callback failed for {run.execution_id}: {str(e)}")
+
+    @staticmethod
+    def _notify_finished(run: _Run, status: str, exit_code: Optional[int]):
+        if run.finished_callback:
+            try:
+                run.finished_callback(run.execution_id, status, exit_code)
+            except Exception as e:
+                logger.error(f"Finished callback failed for {run.execution_id}: {str(e)}")
@@ -0,0 +1,59 @@
+"""
+协调器与工作节点之间的消息协议
+
+每条消息是一行 UTF-8 JSON，带有 "type" 字段，通过 TCP 或 Unix socket 传输。
+
+工作节点 -> 协调器：
+    register   {"worker_id": "...", "host": "...", "slots": n, "token": "..."}
+    lease      {"count": n}                     还可以接收 n 个执行（包括预取）
+    started    {"execution_id": n}              执行已在工作节点上启动
+    output     {"execution_id": n, "data": "..."} 合并后的输出帧，stderr 的行带有 "ERROR: " 前缀
+    result     {"execution_id": n, "status": "...", "exit_code": n, "stdout": "...",
+                "records": [{"seq": n, "kind": "...", "name": "...", "value": x, ...}], ...}
+    heartbeat  {"executions": [n, ...]}         续约所列执行的租约
+    revoked    {"execution_id": n, "ok": true}  回应 revoke，执行已启动时 ok 为 false
+
+协调器 -> 工作节点：
+    registered {"lease_ttl": s, "heartbeat_interval": s}
+    run        {"execution_id": n, "script_id": n, "content": "...", "parameters": {...},
+                "timeout": s, "limits": {...}, "priority": n, "cacheable": false}
+    cancel     {"execution_id": n}              停止执行
+    revoke     {"execution_id": n}              收回尚未启动的执行，交给空闲的工作节点
+    error      {"message": "..."}               之后关闭连接
+"""
+import asyncio
+import json
+from typing import Optional, Tuple
+
+# 单条消息的上限，执行结果带有 stdout/stderr 摘要
+MAX_MESSAGE_SIZE = 67108864
+
+
+def encode(message_type: str, **fields) -> bytes:
+    fields["type"] = message_type
+    return (json.dumps(fields, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+async def read_message(reader: asyncio.StreamReader) -> Optional[dict]:
+    """读取一条消息，连接关闭时返回 None，格式错误时抛出 ValueError"""
+    line = await reader.readline()
+    if not line:
+        return None
+    message = json.loads(line)
+    if not isinstance(message, dict) or not isinstance(message.get("type"), str):
+        raise ValueError("Malformed message")
+    return message
+
+
+async def start_server(handler, host: str, port: int, socket_path: Optional[str] = None):
+    if socket_path:
+        return await asyncio.start_unix_server(handler, path=socket_path,
+                                               limit=MAX_MESSAGE_SIZE)
+    return await asyncio.start_server(handler, host, port, limit=MAX_MESSAGE_SIZE)
+
+
+async def open_connection(host: str, port: int, socket_path: Optional[str] = None
+                          ) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    if socket_path:
+        return await asyncio.open_unix_connection(socket_path, limit=MAX_MESSAGE_SIZE)
+    return await asyncio.open_connection(host, port, limit=MAX_MESSAGE_SIZE)
@@ -0,0 +1,284 @@
+"""
+分布式执行的工作节点
+
+连接协调器（distributed.coordinator），接收租给本节点的执行，用本地的 ScriptExecutor 运行，
+输出帧与结果回传协调器。执行槽数即本地执行器的并发上限，预取的执行在本地队列中等待。
+
+本地执行记录与完整输出文件保存在 worker_dir 下（同一主机上的多个工作节点可共用），
+协调器的数据库只保存结果、输出摘要与输出文件在工作节点上的路径。
+与协调器断开后停止本节点所有执行（协调器会重新排队），并以退避间隔重连。
+"""
+import asyncio
+import os
+import socket
+from typing import Dict, Optional, Set
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from core.config import Config
+from core.execution_queue import QueuedExecution
+from core.executor import ScriptExecutor
+from core.script_manager import ScriptManager
+from database.db_manager import _configure_sqlite
+from database.db_writer import DBWriter
+from database.migrations import migrate_schema
+from database.models import Base, ScriptExecution
+from distributed.coordinator import RECORD_FIELDS, RESULT_FIELDS
+from distributed.protocol import encode, open_connection, read_message
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 发往协调器的缓冲超过该值时丢弃输出帧（结果不受影响）
+MAX_OUTPUT_BUFFER = 4194304
+RECONNECT_DELAY = 1
+MAX_RECONNECT_DELAY = 30
+
+
+class _WorkerExecutor(ScriptExecutor):
+    """执行实际启动进程时通知工作节点"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_started = None
+
+    def _start(self, entry: QueuedExecution):
+        super()._start(entry)
+        if self.on_started and entry.execution_id in self.running_processes:
+            self.on_started(entry.execution_id)
+
+
+class Worker:
+    """
+    工作节点
+
+    网络消息在事件循环中处理；执行器在自己的事件循环线程中运行，回调通过
+    call_soon_threadsafe 回到工作节点的事件循环。
+    """
+
+    def __init__(self, host: Optional[str] = None, port: Optional[int] = None,
+                 socket_path: Optional[str] = None, worker_id: Optional[str] = None,
+                 slots: Optional[int] = None, prefetch: Optional[int] = None,
+                 token: Optional[str] = None, work_dir: Optional[str] = None):
+        config = Config()
+        self.host = host or config.get_system_config("coordinator_host", "127.0.0.1")
+        self.port = port if port is not None else config.get_system_config("coordinator_port", 8766)
+        self.socket_path = socket_path
+        self.token = token
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.slots = max(1, slots or config.get_system_config("worker_slots", os.cpu_count() or 4))
+        self.prefetch = max(0, prefetch if prefetch is not None
+                            else config.get_system_config("worker_prefetch", 1))
+
+        # 本地执行记录，独立于协调器的数据库
+        self.work_dir = os.path.abspath(work_dir or config.get_system_config("worker_dir", "worker"))
+        os.makedirs(self.work_dir, exist_ok=True)
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.work_dir, 'executions.db')}")
+        event.listen(self.engine, "connect", _configure_sqlite)
+        try:
+            Base.metadata.create_all(self.engine)
+        except OperationalError:
+            # 共用目录的其他工作节点同时在建表
+            Base.metadata.create_all(self.engine)
+        migrate_schema(self.engine)
+        self.session_factory = sessionmaker(bind=self.engine)
+        self.executor = _WorkerExecutor(writer=DBWriter(self.engine), max_concurrency=self.slots)
+        self.executor.outputs_dir = os.path.join(self.work_dir, "outputs")
+
+        # 协调器的执行ID -> 本地执行ID（提交到本地执行器之前为 None）
+        self._held: Dict[int, Optional[int]] = {}
+        self._remote: Dict[int, int] = {}
+        # 本地执行ID 尚未登记时已启动的执行
+        self._early_started: Set[int] = set()
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.dropped_output_bytes = 0
+
+    async def run(self):
+        """连接协调器并处理执行，断开后重连，直到被取消"""
+        self._loop = asyncio.get_running_loop()
+        self.executor.on_started = lambda local_id: self._loop.call_soon_threadsafe(
+            self._on_started, local_id)
+        delay = RECONNECT_DELAY
+        while True:
+            try:
+                reader, writer = await open_connection(self.host, self.port, self.socket_path)
+            except OSError as e:
+                logger.warning(f"Cannot connect to coordinator: {str(e)}, retrying in {delay}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+                continue
+            delay = RECONNECT_DELAY
+            try:
+                await self._session(reader, writer)
+            except (asyncio.IncompleteReadError, ConnectionError, ValueError) as e:
+                logger.warning(f"Lost connection to coordinator: {type(e).__name__} {str(e)}")
+            finally:
+                self._writer = None
+                writer.close()
+                self._abandon()
+            await asyncio.sleep(delay)
+
+    def shutdown(self):
+        """停止本地执行与后台线程"""
+        self._abandon()
+        self.executor.shutdown()
+
+    async def _session(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        writer.write(encode("register", worker_id=self.worker_id, host=socket.gethostname(),
+                            slots=self.slots, prefetch=self.prefetch, token=self.token))
+        await writer.drain()
+        message = await read_message(reader)
+        if message is None:
+            raise ConnectionError("Coordinator closed the connection")
+        if message["type"] != "registered":
+            # 注册被拒绝（如令牌错误）时重试没有意义
+            raise PermissionError(message.get("message") or "Registration rejected")
+        self._writer = writer
+        logger.info(f"Worker {self.worker_id} registered with {self.slots} slots")
+
+        heartbeat = asyncio.ensure_future(self._heartbeat(writer, message["heartbeat_interval"]))
+        try:
+            while True:
+                message = await read_message(reader)
+                if message is None:
+                    raise ConnectionError("Coordinator closed the connection")
+                message_type = message["type"]
+                if message_type == "run":
+                    await self._on_run(message)
+                elif message_type == "cancel":
+                    self._on_cancel(message["execution_id"])
+                elif message_type == "revoke":
+                    self._on_revoke(message["execution_id"])
+                elif message_type == "error":
+                    raise ConnectionError(message.get("message") or "Coordinator error")
+                await writer.drain()
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, writer: asyncio.StreamWriter, interval: float):
+        while True:
+            writer.write(encode("heartbeat", executions=list(self._held)))
+            await writer.drain()
+            await asyncio.sleep(interval)
+
+    def _send(self, message_type: str, **fields):
+        if self._writer is not None and not self._writer.is_closing():
+            self._writer.write(encode(message_type, **fields))
+
+    # 执行
+
+    async def _on_run(self, message: dict):
+        remote_id = message["execution_id"]
+        self._held[remote_id] = None
+        loop = self._loop
+
+        def on_output(text: str):
+            loop.call_soon_threadsafe(self._send_output, remote_id, text)
+
+        def on_finished(local_id: int, status: str, exit_code: Optional[int]):
+            loop.call_soon_threadsafe(self._on_finished, remote_id, local_id, status, exit_code)
+
+        # 提交时会编译脚本并写入本地记录，放到线程池中避免阻塞心跳与输出转发
+        try:
+            local_id = await loop.run_in_executor(
+                None, lambda: self.executor.execute(
+                    message["script_id"], message["content"], message.get("parameters"),
+                    message.get("timeout") or 3600, output_callback=on_output,
+                    priority=message.get("priority") or 0, limits=message.get("limits"),
+                    finished_callback=on_finished, cacheable=bool(message.get("cacheable"))))
+        except Exception as e:
+            self._held.pop(remote_id, None)
+            self._send("result", execution_id=remote_id, status="failed", exit_code=None,
+                       error_message=str(e)[:255])
+            return
+        if remote_id not in self._held:
+            # 提交期间已结束并回报
+            return
+        self._held[remote_id] = local_id
+        self._remote[local_id] = remote_id
+        if local_id in self._early_started:
+            self._early_started.discard(local_id)
+            self._send("started", execution_id=remote_id)
+
+    def _on_started(self, local_id: int):
+        remote_id = self._remote.get(local_id)
+        if remote_id is None:
+            self._early_started.add(local_id)
+        else:
+            self._send("started", execution_id=remote_id)
+
+    def _on_cancel(self, remote_id: int):
+        local_id = self._held.get(remote_id)
+        if local_id is not None:
+            self.executor.stop_execution(local_id)
+
+    def _on_revoke(self, remote_id: int):
+        """只有仍在本地排队的执行可以收回"""
+        local_id = self._held.get(remote_id)
+        ok = local_id is not None and self.executor.cancel_queued(local_id)
+        if ok:
+            self._forget(remote_id)
+        self._send("revoked", execution_id=remote_id, ok=ok)
+
+    def _send_output(self, remote_id: int, text: str):
+        if remote_id not in self._held or self._writer is None:
+            return
+        if self._writer.transport.get_write_buffer_size() > MAX_OUTPUT_BUFFER:
+            self.dropped_output_bytes += len(text)
+            return
+        self._send("output", execution_id=remote_id, data=text)
+
+    def _on_finished(self, remote_id: int, local_id: int, status: str, exit_code: Optional[int]):
+        # 提交尚未返回时本地ID还未登记
+        if remote_id not in self._held or self._held[remote_id] not in (None, local_id):
+            return
+        self._forget(remote_id)
+        self._early_started.discard(local_id)
+        writer = self._writer
+        asyncio.ensure_future(self._report(writer, remote_id, local_id, status, exit_code))
+
+    async def _report(self, writer: Optional[asyncio.StreamWriter], remote_id: int,
+                      local_id: int, status: str, exit_code: Optional[int]):
+        result = await self._loop.run_in_executor(None, self._read_result, local_id)
+        # 结果只发给提交该执行的连接
+        if writer is not None and writer is self._writer:
+            self._send("result", execution_id=remote_id, status=status,
+                       exit_code=exit_code, **result)
+
+    def _read_result(self, local_id: int) -> dict:
+        """从本地执行记录读取结果字段与输出摘要"""
+        self.executor.writer.flush()
+        db = self.session_factory()
+        try:
+            execution = db.get(ScriptExecution, local_id)
+            result = {name: getattr(execution, name) for name in RESULT_FIELDS} if execution else {}
+            for name in ("output_file", "error_file"):
+                if result.get(name):
+                    result[name] = os.path.abspath(result[name])
+            manager = ScriptManager(db)
+            result["stdout"] = manager.get_execution_output(local_id, "stdout")
+            result["stderr"] = manager.get_execution_output(local_id, "stderr")
+            result["records"] = [{name: getattr(record, name) for name in RECORD_FIELDS}
+                                 for record in manager.get_execution_records(local_id)]
+            return result
+        finally:
+            db.close()
+
+    def _forget(self, remote_id: int):
+        local_id = self._held.pop(remote_id, None)
+        if local_id is not None:
+            self._remote.pop(local_id, None)
+
+    def _abandon(self):
+        """与协调器断开：协调器会重新排队这些执行，本地不再运行"""
+        held = [local_id for local_id in self._held.values() if local_id is not None]
+        self._held.clear()
+        self._remote.clear()
+        self._early_started.clear()
+        for local_id in held:
+            self.executor.stop_execution(local_id)
+        if held:
+            logger.warning(f"Stopped {len(held)} executions after losing the coordinator")
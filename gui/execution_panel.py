@@ -1,6 +1,13 @@
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QTextEdit, QPushButton
-from PyQt6.QtCore import QProcess
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
+                           QLineEdit, QSpinBox, QCheckBox, QLabel)
+from PyQt6.QtCore import QProcess, QTimer
+import codecs
+import os
 import sys
+from core.config import Config
+from core.output_batcher import OutputBatcher
+from gui.log_viewer import LogViewer
+from utils.file_utils import ensure_directory
 from utils.i18n import I18n
 
 class ExecutionPanel(QWidget):
@@ -9,10 +16,36 @@ class ExecutionPanel(QWidget):
         self.i18n = I18n()
         self.layout = QVBoxLayout(self)
         
+        # 输出写入日志文件，由日志视图按需读取可见的行
+        outputs_dir = Config().get_system_config("outputs_dir", "outputs")
+        ensure_directory(outputs_dir)
+        self.log_path = os.path.join(outputs_dir, "execution_panel.log")
+        self.log_file = None
+        
+        # 搜索、跳转与跟随
+        tool_layout = QHBoxLayout()
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText(self.i18n.tr("搜索输出..."))
+        self.search_edit.textChanged.connect(lambda text: self.output_view.find(text, from_top=True))
+        self.search_edit.returnPressed.connect(lambda: self.output_view.find(self.search_edit.text()))
+        tool_layout.addWidget(self.search_edit)
+        
+        tool_layout.addWidget(QLabel(self.i18n.tr("跳转到行")))
+        self.line_spin = QSpinBox()
+        self.line_spin.setRange(1, 2 ** 31 - 1)
+        self.line_spin.editingFinished.connect(lambda: self.output_view.jump_to_line(self.line_spin.value()))
+        tool_layout.addWidget(self.line_spin)
+        
+        self.follow_check = QCheckBox(self.i18n.tr("跟随输出"))
+        self.follow_check.setChecked(True)
+        self.follow_check.toggled.connect(lambda checked: self.output_view.set_follow_tail(checked))
+        tool_layout.addWidget(self.follow_check)
+        self.layout.addLayout(tool_layout)
+        
         # 创建输出显示区域
-        self.output_text = QTextEdit()
-        self.output_text.setReadOnly(True)
-        self.layout.addWidget(self.output_text)
+        self.output_view = LogViewer()
+        self.output_view.follow_tail_changed.connect(self.follow_check.setChecked)
+        self.layout.addWidget(self.output_view)
         
         # 清除按钮
         self.clear_button = QPushButton(self.i18n.tr("清除输出"))
@@ -21,6 +54,15 @@ class ExecutionPanel(QWidget):
         
         # 进程对象
         self.process = None
+        # 每次运行的增量解码器，跨两次读取的多字节字符不会被替换为 U+FFFD
+        self.stdout_decoder = None
+        self.stderr_decoder = None
+        
+        # 合并输出，定时写入日志并刷新视图，避免大量输出卡住 UI 线程
+        self.output_batcher = OutputBatcher(self.append_output, max_pending=16 * 1024 * 1024)
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setInterval(int(self.output_batcher.flush_interval * 1000))
+        self.flush_timer.timeout.connect(self.output_batcher.flush)
     
     def run_script(self, content: str):
         if self.process is None:
@@ -29,8 +71,11 @@ class ExecutionPanel(QWidget):
             self.process.readyReadStandardError.connect(self.handle_error)
             self.process.finished.connect(self.handle_finished)
         
-        self.output_text.clear()
-        self.output_text.append(self.i18n.tr("开始执行脚本...") + "\n")
+        self.clear_output()
+        self.stdout_decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.stderr_decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.append_output(self.i18n.tr("开始执行脚本...") + "\n\n")
+        self.flush_timer.start()
         
         # 将脚本内容写入临时文件
         with open("temp_script.py", "w", encoding="utf-8") as f:
@@ -40,16 +85,41 @@ class ExecutionPanel(QWidget):
         self.process.start(sys.executable, ["temp_script.py"])
     
     def handle_output(self):
-        output = bytes(self.process.readAllStandardOutput()).decode()
-        self.output_text.append(output)
+        output = self.stdout_decoder.decode(bytes(self.process.readAllStandardOutput()))
+        if output:
+            self.output_batcher.push(output)
     
     def handle_error(self):
-        error = bytes(self.process.readAllStandardError()).decode()
-        self.output_text.append(f"错误：{error}")
+        error = self.stderr_decoder.decode(bytes(self.process.readAllStandardError()))
+        if error:
+            self.output_batcher.push(f"错误：{error}")
+    
+    def append_output(self, text: str):
+        """将一帧输出追加到日志文件并刷新视图"""
+        if self.log_file is None:
+            self.log_file = open(self.log_path, "ab")
+            self.output_view.set_file(self.log_path)
+        self.log_file.write(text.encode("utf-8"))
+        self.log_file.flush()
+        self.output_view.refresh()
     
     def handle_finished(self, exit_code, exit_status):
-        self.output_text.append(f"\n脚本执行{'成功' if exit_code == 0 else '失败'}")
+        # 输出以不完整的字符结尾时按替换字符输出
+        output = self.stdout_decoder.decode(b"", final=True)
+        error = self.stderr_decoder.decode(b"", final=True)
+        if output:
+            self.output_batcher.push(output)
+        if error:
+            self.output_batcher.push(f"错误：{error}")
+        self.flush_timer.stop()
+        self.output_batcher.flush(force=True)
+        self.append_output(f"\n脚本执行{'成功' if exit_code == 0 else '失败'}\n")
         self.process = None
     
     def clear_output(self):
-        self.output_text.clear()
\ No newline at end of file
+        self.output_view.close_file()
+        if self.log_file:
+            self.log_file.close()
+            self.log_file = None
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
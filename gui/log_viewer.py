@@ -0,0 +1,232 @@
+import mmap
+import os
+import re
+from array import array
+from bisect import bisect_right
+from typing import Optional
+from PyQt6.QtWidgets import QAbstractScrollArea
+from PyQt6.QtCore import pyqtSignal
+from PyQt6.QtGui import QPainter, QColor, QFontDatabase
+
+# 每次建立索引处理的字节数
+INDEX_CHUNK = 4 * 1024 * 1024
+# 单行最多绘制的字符数
+MAX_RENDER_CHARS = 4096
+MARGIN = 4
+
+
+class LogViewer(QAbstractScrollArea):
+    """
+    只读日志视图
+
+    内容来自内存映射的日志文件，并维护一份行偏移索引。
+    绘制时只读取可见的行，内存占用与文件大小无关（索引每行 8 字节），
+    滚动开销只与可见行数有关。支持跳转到行、跟随尾部与增量搜索。
+    """
+
+    follow_tail_changed = pyqtSignal(bool)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setFont(QFontDatabase.systemFont(QFontDatabase.SystemFont.FixedFont))
+
+        self.path: Optional[str] = None
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+        self._size = 0
+        # 第 i 行的起始偏移
+        self._offsets = array("Q", [0])
+        self._max_line_length = 0
+
+        self.follow_tail = True
+        self._match_line = -1
+        self._match_offset = -1
+
+        self.verticalScrollBar().valueChanged.connect(self._on_scrolled)
+
+    def set_file(self, path: str):
+        """显示指定的日志文件"""
+        self.close_file()
+        self.path = path
+        self.refresh()
+
+    def close_file(self):
+        """关闭当前文件并清空视图"""
+        self._unmap()
+        if self._file:
+            self._file.close()
+            self._file = None
+        self.path = None
+        self._size = 0
+        self._offsets = array("Q", [0])
+        self._max_line_length = 0
+        self._match_line = -1
+        self._match_offset = -1
+        self._update_scrollbars()
+        self.viewport().update()
+
+    def refresh(self):
+        """文件增长后调用，只为新增的内容建立索引"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        if self._file is None:
+            self._file = open(self.path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        if size < self._size:
+            # 文件被截断，重新建立索引
+            path = self.path
+            self.close_file()
+            self.path = path
+            self._file = open(path, "rb")
+        if size == self._size:
+            return
+
+        self._unmap()
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._index(self._size, size)
+        self._size = size
+
+        self._update_scrollbars()
+        if self.follow_tail:
+            bar = self.verticalScrollBar()
+            bar.setValue(bar.maximum())
+        self.viewport().update()
+
+    @property
+    def line_count(self) -> int:
+        count = len(self._offsets)
+        if self._offsets[-1] == self._size:
+            count -= 1
+        return count
+
+    def line_text(self, line: int) -> str:
+        """读取指定行的内容"""
+        start = self._offsets[line]
+        end = self._offsets[line + 1] - 1 if line + 1 < len(self._offsets) else self._size
+        end = min(end, start + MAX_RENDER_CHARS * 4)
+        data = self._map[start:end] if self._map is not None else b""
+        return data.decode("utf-8", errors="replace").rstrip("\r")[:MAX_RENDER_CHARS]
+
+    def jump_to_line(self, line: int):
+        """跳转到指定行（从 1 开始）"""
+        self.set_follow_tail(False)
+        self.verticalScrollBar().setValue(max(0, line - 1))
+
+    def set_follow_tail(self, follow: bool):
+        if follow == self.follow_tail:
+            return
+        self.follow_tail = follow
+        if follow:
+            bar = self.verticalScrollBar()
+            bar.setValue(bar.maximum())
+        self.follow_tail_changed.emit(follow)
+
+    def find(self, text: str, from_top: bool = False) -> bool:
+        """
+        查找文本
+
+        Args:
+            text: 要查找的文本
+            from_top: 为 True 时从当前首个可见行开始查找（用于边输入边搜索），
+                      否则从上一个匹配之后继续查找
+
+        Returns:
+            是否找到
+        """
+        if not text or self._map is None:
+            self._match_line = -1
+            self._match_offset = -1
+            self.viewport().update()
+            return False
+
+        needle = text.encode("utf-8")
+        if from_top or self._match_offset < 0:
+            top = min(self.verticalScrollBar().value(), len(self._offsets) - 1)
+            start = self._offsets[top]
+        else:
+            start = self._match_offset + 1
+        offset = self._map.find(needle, start)
+        if offset < 0 and start > 0:
+            offset = self._map.find(needle, 0)
+        if offset < 0:
+            self._match_line = -1
+            self._match_offset = -1
+            self.viewport().update()
+            return False
+
+        self._match_offset = offset
+        self._match_line = bisect_right(self._offsets, offset) - 1
+        self.set_follow_tail(False)
+        bar = self.verticalScrollBar()
+        bar.setValue(max(0, self._match_line - self._visible_lines() // 2))
+        self.viewport().update()
+        return True
+
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        metrics = self.fontMetrics()
+        line_height = metrics.height()
+        width = self.viewport().width()
+        first = self.verticalScrollBar().value()
+        x = MARGIN - self.horizontalScrollBar().value()
+
+        for row in range(self._visible_lines() + 1):
+            line = first + row
+            if line >= self.line_count:
+                break
+            y = row * line_height
+            if line == self._match_line:
+                painter.fillRect(0, y, width, line_height, QColor("#FFF3A0"))
+            painter.drawText(x, y + metrics.ascent(), self.line_text(line))
+        painter.end()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._update_scrollbars()
+
+    def scrollContentsBy(self, dx, dy):
+        self.viewport().update()
+
+    def _visible_lines(self) -> int:
+        return max(1, self.viewport().height() // self.fontMetrics().height())
+
+    def _update_scrollbars(self):
+        visible = self._visible_lines()
+        vbar = self.verticalScrollBar()
+        vbar.setPageStep(visible)
+        vbar.setRange(0, max(0, self.line_count - visible))
+
+        char_width = self.fontMetrics().horizontalAdvance("M")
+        content_width = min(self._max_line_length, MAX_RENDER_CHARS) * char_width + 2 * MARGIN
+        hbar = self.horizontalScrollBar()
+        hbar.setPageStep(self.viewport().width())
+        hbar.setRange(0, max(0, content_width - self.viewport().width()))
+
+    def _on_scrolled(self, value: int):
+        # 手动滚动离开底部时停止跟随，回到底部时恢复
+        at_bottom = value >= self.verticalScrollBar().maximum()
+        if at_bottom != self.follow_tail:
+            self.follow_tail = at_bottom
+            self.follow_tail_changed.emit(at_bottom)
+
+    def _index(self, start: int, end: int):
+        """为 [start, end) 范围内的换行建立索引"""
+        offsets = self._offsets
+        max_length = self._max_line_length
+        pos = start
+        while pos < end:
+            chunk_end = min(end, pos + INDEX_CHUNK)
+            chunk = self._map[pos:chunk_end]
+            line_start = offsets[-1]
+            for match in re.finditer(b"\n", chunk):
+                next_start = pos + match.start() + 1
+                max_length = max(max_length, next_start - line_start - 1)
+                offsets.append(next_start)
+                line_start = next_start
+            pos = chunk_end
+        self._max_line_length = max(max_length, end - offsets[-1])
+
+    def _unmap(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
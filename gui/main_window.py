@@ -1,12 +1,12 @@
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                            QToolBar, QStatusBar, QSplitter, QMessageBox,
-                           QInputDialog, QListWidget, QListWidgetItem, QMenu,
-                           QMenuBar)
-from PyQt6.QtCore import Qt
+                           QInputDialog, QListView, QLineEdit, QMenu, QMenuBar)
+from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QAction
 from database.db_manager import get_db
 from database.models import Script
 from .script_editor import ScriptEditorWidget
+from .script_model import ScriptListModel
 from .execution_panel import ExecutionPanel
 from utils.i18n import I18n
 
@@ -99,9 +99,28 @@ class MainWindow(QMainWindow):
         # 创建水平分割器
         splitter = QSplitter(Qt.Orientation.Horizontal)
         
-        # 创建脚本列表
-        self.script_list = QListWidget()
-        self.script_list.itemClicked.connect(self.on_script_selected)
+        # 创建脚本列表，滚动时分批加载
+        list_panel = QWidget()
+        list_layout = QVBoxLayout(list_panel)
+        list_layout.setContentsMargins(0, 0, 0, 0)
+        
+        # 搜索框，输入停顿后再查询全文索引
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText(self.i18n.tr("搜索脚本..."))
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(200)
+        self.search_timer.timeout.connect(self.search_scripts)
+        self.search_edit.textChanged.connect(self.search_timer.start)
+        list_layout.addWidget(self.search_edit)
+        
+        self.script_model = ScriptListModel(parent=self)
+        self.script_list = QListView()
+        self.script_list.setUniformItemSizes(True)
+        self.script_list.setModel(self.script_model)
+        self.script_list.clicked.connect(self.on_script_selected)
+        list_layout.addWidget(self.script_list)
         
         # 创建脚本编辑器
         self.editor = ScriptEditorWidget()
@@ -110,7 +129,7 @@ class MainWindow(QMainWindow):
         self.execution_panel = ExecutionPanel()
         
         # 添加到分割器
-        splitter.addWidget(self.script_list)
+        splitter.addWidget(list_panel)
         splitter.addWidget(self.editor)
         splitter.addWidget(self.execution_panel)
         
@@ -137,7 +156,10 @@ class MainWindow(QMainWindow):
                 self.current_script_id = script.id
                 self.editor.set_content(script.content)
                 self.statusBar.showMessage(self.i18n.tr("创建脚本：") + name)
-                self.load_scripts()
+                self.script_model.add_script(script.id, script.name, script.type)
+                index = self.script_model.script_index(script.id)
+                if index.isValid():
+                    self.script_list.setCurrentIndex(index)
             except Exception as e:
                 QMessageBox.critical(self, self.i18n.tr("错误"), self.i18n.tr("创建脚本失败：") + str(e))
     
@@ -165,23 +187,22 @@ class MainWindow(QMainWindow):
         self.execution_panel.run_script(content)
     
     def load_scripts(self):
-        """加载所有脚本到列表中"""
+        """重新加载脚本列表，第一批在视图需要时查询"""
         try:
-            self.script_list.clear()
-            db = next(get_db())
-            scripts = db.query(Script).all()
-            
-            for script in scripts:
-                item = QListWidgetItem(script.name)
-                item.setData(Qt.ItemDataRole.UserRole, script.id)
-                self.script_list.addItem(item)
-                
+            self.script_model.reload()
         except Exception as e:
             QMessageBox.critical(self, self.i18n.tr("错误"), self.i18n.tr(f"加载脚本列表失败：{str(e)}"))
     
-    def on_script_selected(self, item):
-        """当选择脚本列表中的项目时触发"""
-        script_id = item.data(Qt.ItemDataRole.UserRole)
+    def search_scripts(self):
+        """按搜索框内容过滤脚本列表"""
+        try:
+            self.script_model.set_query(self.search_edit.text())
+        except Exception as e:
+            QMessageBox.critical(self, self.i18n.tr("错误"), self.i18n.tr("搜索脚本失败：") + str(e))
+    
+    def on_script_selected(self, index):
+        """当选择脚本列表中的项目时触发，此时才加载脚本内容"""
+        script_id = index.data(Qt.ItemDataRole.UserRole)
         try:
             db = next(get_db())
             script = db.query(Script).get(script_id)
@@ -197,7 +218,7 @@ class MainWindow(QMainWindow):
         if not self.current_script_id:
             QMessageBox.warning(self, self.i18n.tr("警告"), self.i18n.tr("请先选择一个脚本"))
             return
-            
+        
         reply = QMessageBox.question(self, self.i18n.tr("确认删除"), 
                                    self.i18n.tr("确定要删除这个脚本吗？此操作不可撤销。"),
                                    QMessageBox.StandardButton.Yes | 
@@ -210,9 +231,9 @@ class MainWindow(QMainWindow):
                 if script:
                     db.delete(script)
                     db.commit()
+                    self.script_model.remove_script(self.current_script_id)
                     self.current_script_id = None
                     self.editor.set_content("")
-                    self.load_scripts()  # 重新加载脚本列表
                     self.statusBar.showMessage(self.i18n.tr("脚本已删除"))
             except Exception as e:
                 QMessageBox.critical(self, self.i18n.tr("错误"), self.i18n.tr(f"删除脚本失败：{str(e)}"))
\ No newline at end of file
@@ -1,7 +1,39 @@
+import builtins
+import keyword
+import re
 from PyQt6.QtWidgets import QWidget, QVBoxLayout, QPlainTextEdit
 from PyQt6.QtGui import QTextCharFormat, QSyntaxHighlighter, QColor, QFont
 
+# 块状态：行末是否仍在三引号字符串中
+STATE_NORMAL = -1
+STATE_SINGLE_TRIPLE = 1
+STATE_DOUBLE_TRIPLE = 2
+
+# 三引号字符串的结束位置（跳过转义字符）
+TRIPLE_END = {
+    STATE_SINGLE_TRIPLE: re.compile(r"[^'\\]*(?:(?:\\.|'(?!''))[^'\\]*)*'''"),
+    STATE_DOUBLE_TRIPLE: re.compile(r'[^"\\]*(?:(?:\\.|"(?!""))[^"\\]*)*"""'),
+}
+
+# 行内记号按位置从左到右匹配，字符串与注释中的关键字不会被高亮
+TOKEN_PATTERN = re.compile(r"""
+    (?P<comment>\#.*)
+  | (?P<triple>(?<!\w)[rRbBuUfF]{0,2}(?:'''|\"\"\"))
+  | (?P<string>(?<!\w)[rRbBuUfF]{0,2}(?:'[^'\\\n]*(?:\\.[^'\\\n]*)*'?|"[^"\\\n]*(?:\\.[^"\\\n]*)*"?))
+  | (?P<decorator>^\s*@[\w.]+)
+  | (?P<number>\b(?:0[xXoObB][0-9a-fA-F_]+|\d[\d_]*\.?\d*(?:[eE][+-]?\d+)?[jJ]?)\b)
+  | (?P<name>\b[^\W\d]\w*)
+""", re.VERBOSE)
+
 class PythonHighlighter(QSyntaxHighlighter):
+    """
+    Python 语法高亮
+    
+    每行只用预编译的正则扫描一遍，三引号字符串通过块状态跨行延续。
+    QSyntaxHighlighter 只重新高亮被修改的行，行末状态不变时不会继续处理后面的行，
+    输入时的开销与文件长度无关。
+    """
+    
     def __init__(self, parent=None):
         super().__init__(parent)
         
@@ -10,20 +42,89 @@ class PythonHighlighter(QSyntaxHighlighter):
         self.keyword_format.setForeground(QColor("#0000FF"))
         self.keyword_format.setFontWeight(700)
         
-        # Python关键字
-        self.keywords = [
-            'and', 'as', 'assert', 'break', 'class', 'continue', 'def',
-            'del', 'elif', 'else', 'except', 'False', 'finally', 'for',
-            'from', 'global', 'if', 'import', 'in', 'is', 'lambda', 'None',
-            'nonlocal', 'not', 'or', 'pass', 'raise', 'return', 'True',
-            'try', 'while', 'with', 'yield'
-        ]
+        self.builtin_format = QTextCharFormat()
+        self.builtin_format.setForeground(QColor("#7A3E9D"))
+        
+        self.definition_format = QTextCharFormat()
+        self.definition_format.setForeground(QColor("#00627A"))
+        self.definition_format.setFontWeight(700)
+        
+        self.string_format = QTextCharFormat()
+        self.string_format.setForeground(QColor("#067D17"))
+        
+        self.comment_format = QTextCharFormat()
+        self.comment_format.setForeground(QColor("#8C8C8C"))
+        self.comment_format.setFontItalic(True)
+        
+        self.number_format = QTextCharFormat()
+        self.number_format.setForeground(QColor("#1750EB"))
+        
+        self.decorator_format = QTextCharFormat()
+        self.decorator_format.setForeground(QColor("#9E880D"))
+        
+        # Python关键字与内置名称
+        self.keywords = frozenset(keyword.kwlist)
+        self.builtins = frozenset(name for name in dir(builtins) if not name.startswith("_"))
+        
+        self.formats = {
+            "string": self.string_format,
+            "comment": self.comment_format,
+            "number": self.number_format,
+            "decorator": self.decorator_format
+        }
     
     def highlightBlock(self, text):
-        for word in text.split():
-            if word in self.keywords:
-                index = text.index(word)
-                self.setFormat(index, len(word), self.keyword_format)
+        position = 0
+        state = self.previousBlockState()
+        if state in TRIPLE_END:
+            position = self._highlight_triple(text, 0, 0, state)
+            if position is None:
+                return
+        
+        self.setCurrentBlockState(STATE_NORMAL)
+        define_next = False
+        while True:
+            match = TOKEN_PATTERN.search(text, position)
+            if match is None:
+                return
+            kind = match.lastgroup
+            start, position = match.span()
+            length = position - start
+            
+            if kind == "name":
+                word = match.group()
+                if define_next:
+                    self.setFormat(start, length, self.definition_format)
+                elif word in self.keywords:
+                    self.setFormat(start, length, self.keyword_format)
+                elif word in self.builtins:
+                    self.setFormat(start, length, self.builtin_format)
+                define_next = word == "def" or word == "class"
+                continue
+            
+            define_next = False
+            if kind == "triple":
+                state = STATE_SINGLE_TRIPLE if text[position - 1] == "'" else STATE_DOUBLE_TRIPLE
+                position = self._highlight_triple(text, start, position, state)
+                if position is None:
+                    return
+            else:
+                self.setFormat(start, length, self.formats[kind])
+    
+    def _highlight_triple(self, text, start, content_start, state):
+        """
+        高亮从 start 开始的三引号字符串
+        
+        Returns:
+            字符串结束后的位置；字符串延续到下一行时设置块状态并返回 None
+        """
+        match = TRIPLE_END[state].match(text, content_start)
+        if match is None:
+            self.setFormat(start, len(text) - start, self.string_format)
+            self.setCurrentBlockState(state)
+            return None
+        self.setFormat(start, match.end() - start, self.string_format)
+        return match.end()
 
 class ScriptEditorWidget(QWidget):
     def __init__(self):
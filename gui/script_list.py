@@ -1,8 +1,9 @@
-from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QTreeWidget, QTreeWidgetItem,
-                           QPushButton, QInputDialog)
-from PyQt6.QtCore import pyqtSignal
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QTreeView,
+                           QPushButton, QInputDialog, QMessageBox)
+from PyQt6.QtCore import Qt, pyqtSignal
 from database.db_manager import get_db
 from database.models import Script
+from .script_model import ScriptTreeModel
 
 class ScriptListWidget(QWidget):
     script_selected = pyqtSignal(int)  # 发送选中的脚本ID
@@ -11,9 +12,11 @@ class ScriptListWidget(QWidget):
         super().__init__()
         self.layout = QVBoxLayout(self)
         
-        # 创建树形视图
-        self.tree = QTreeWidget()
-        self.tree.setHeaderLabel("脚本列表")
+        # 创建树形视图，各类型下的脚本在展开时分批加载
+        self.model = ScriptTreeModel(parent=self)
+        self.tree = QTreeView()
+        self.tree.setModel(self.model)
+        self.tree.setUniformRowHeights(True)
         self.layout.addWidget(self.tree)
         
         # 添加按钮
@@ -21,44 +24,36 @@ class ScriptListWidget(QWidget):
         self.layout.addWidget(self.add_button)
         
         # 连接信号
-        self.tree.itemSelectionChanged.connect(self.on_selection_changed)
+        self.tree.selectionModel().selectionChanged.connect(self.on_selection_changed)
         self.add_button.clicked.connect(self.add_script)
-        
-        # 加载脚本列表
-        self.load_scripts()
     
     def load_scripts(self):
-        self.tree.clear()
-        
-        # 创建脚本类型的根节点
-        python_root = QTreeWidgetItem(self.tree, ["Python脚本"])
-        node_root = QTreeWidgetItem(self.tree, ["Node.js脚本"])
-        shell_root = QTreeWidgetItem(self.tree, ["Shell脚本"])
-        
-        # 从数据库加载脚本
-        db = next(get_db())
-        scripts = db.query(Script).all()
-        
-        # 将脚本添加到对应类型的节点下
-        for script in scripts:
-            if script.type == "python":
-                parent = python_root
-            elif script.type == "nodejs":
-                parent = node_root
-            else:
-                parent = shell_root
-            
-            item = QTreeWidgetItem(parent, [script.name])
-            item.setData(0, Qt.ItemDataRole.UserRole, script.id)
+        """重新加载脚本列表"""
+        self.model.reload()
     
     def on_selection_changed(self):
-        items = self.tree.selectedItems()
-        if items and items[0].parent():  # 确保选中的是脚本而不是类型节点
-            script_id = items[0].data(0, Qt.ItemDataRole.UserRole)
+        indexes = self.tree.selectionModel().selectedIndexes()
+        if indexes and indexes[0].parent().isValid():  # 确保选中的是脚本而不是类型节点
+            script_id = indexes[0].data(Qt.ItemDataRole.UserRole)
             self.script_selected.emit(script_id)
     
     def add_script(self):
         name, ok = QInputDialog.getText(self, "添加脚本", "请输入脚本名称：")
-        if ok and name:
-            # TODO: 打开新建脚本对话框
-            self.load_scripts()  # 重新加载列表 
\ No newline at end of file
+        if not ok or not name:
+            return
+        titles = [title for _, title in ScriptTreeModel.GROUPS]
+        title, ok = QInputDialog.getItem(self, "添加脚本", "请选择脚本类型：", titles, 0, False)
+        if not ok:
+            return
+        script_type = ScriptTreeModel.GROUPS[titles.index(title)][0]
+        try:
+            db = next(get_db())
+            script = Script(name=name, content="", type=script_type)
+            db.add(script)
+            db.commit()
+        except Exception as e:
+            QMessageBox.critical(self, "错误", "创建脚本失败：" + str(e))
+            return
+        # 只插入新行，不重新加载已展开的分组
+        self.model.add_script(script.id, script.name, script.type)
+        self.script_selected.emit(script.id)
@@ -0,0 +1,312 @@
+from bisect import bisect_left
+from typing import Callable, List, Optional
+from PyQt6.QtCore import QAbstractItemModel, QAbstractListModel, QModelIndex, Qt
+from core.script_manager import ScriptManager
+from database.db_manager import SessionLocal
+
+BATCH_SIZE = 500
+
+
+class _ScriptRows:
+    """
+    按ID顺序分批加载的一组脚本摘要
+
+    只保存 id、name、type，脚本内容在选中时再单独查询。
+    设置了搜索词时改为按相关度分批加载搜索结果。
+    """
+
+    def __init__(self, session_factory: Callable, script_type: Optional[str] = None,
+                 batch_size: int = BATCH_SIZE):
+        self.session_factory = session_factory
+        self.script_type = script_type
+        self.batch_size = batch_size
+        self.query: Optional[str] = None
+        self.ids: List[int] = []
+        self.names: List[str] = []
+        self.types: List[str] = []
+        self.exhausted = False
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def clear(self):
+        self.ids.clear()
+        self.names.clear()
+        self.types.clear()
+        self.exhausted = False
+
+    def fetch(self) -> list:
+        """查询下一批脚本，结果由调用方在通知视图后通过 extend 追加"""
+        db = self.session_factory()
+        try:
+            manager = ScriptManager(db)
+            if self.query:
+                rows = manager.search_scripts(self.query, self.batch_size,
+                                              offset=len(self.ids),
+                                              script_type=self.script_type)
+            else:
+                rows = manager.list_scripts(self.batch_size,
+                                            after_id=self.ids[-1] if self.ids else None,
+                                            script_type=self.script_type)
+        finally:
+            db.close()
+        if len(rows) < self.batch_size:
+            self.exhausted = True
+        return rows
+
+    def extend(self, rows: list):
+        for script_id, name, script_type in rows:
+            self.ids.append(script_id)
+            self.names.append(name)
+            self.types.append(script_type)
+
+    def find(self, script_id: int) -> int:
+        """返回已加载脚本的行号，未加载时返回 -1"""
+        if self.query:
+            try:
+                return self.ids.index(script_id)
+            except ValueError:
+                return -1
+        row = bisect_left(self.ids, script_id)
+        if row < len(self.ids) and self.ids[row] == script_id:
+            return row
+        return -1
+
+    def insert_position(self, script_id: int) -> int:
+        """
+        新脚本应插入的行号
+
+        尚未加载完时，ID 大于已加载部分的脚本会在之后的分批查询中出现，返回 -1。
+        搜索结果按相关度排序，新脚本在重新搜索时才会出现，同样返回 -1
+        """
+        if self.query:
+            return -1
+        row = bisect_left(self.ids, script_id)
+        if row == len(self.ids) and not self.exhausted:
+            return -1
+        if row < len(self.ids) and self.ids[row] == script_id:
+            return -1
+        return row
+
+    def insert(self, row: int, script_id: int, name: str, script_type: str):
+        self.ids.insert(row, script_id)
+        self.names.insert(row, name)
+        self.types.insert(row, script_type)
+
+    def remove(self, row: int):
+        del self.ids[row]
+        del self.names[row]
+        del self.types[row]
+
+
+class ScriptListModel(QAbstractListModel):
+    """
+    脚本列表模型
+
+    视图滚动到末尾时通过 fetchMore 分批加载，新建、重命名和删除脚本时只更新对应的行。
+    """
+
+    def __init__(self, script_type: Optional[str] = None,
+                 session_factory: Callable = SessionLocal,
+                 batch_size: int = BATCH_SIZE, parent=None):
+        super().__init__(parent)
+        self._rows = _ScriptRows(session_factory, script_type, batch_size)
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self._rows)
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._rows):
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self._rows.names[index.row()]
+        if role == Qt.ItemDataRole.UserRole:
+            return self._rows.ids[index.row()]
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return self._rows.types[index.row()]
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()) -> bool:
+        return not parent.isValid() and not self._rows.exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        rows = self._rows.fetch()
+        if not rows:
+            return
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self._rows.extend(rows)
+        self.endInsertRows()
+
+    def reload(self):
+        """清空已加载的数据，由视图重新分批加载"""
+        self.beginResetModel()
+        self._rows.clear()
+        self.endResetModel()
+
+    def set_query(self, query: str):
+        """按搜索词过滤列表，搜索词为空时恢复完整列表"""
+        query = query.strip() or None
+        if query == self._rows.query:
+            return
+        self.beginResetModel()
+        self._rows.clear()
+        self._rows.query = query
+        self.endResetModel()
+
+    def script_index(self, script_id: int) -> QModelIndex:
+        """脚本对应的索引，尚未加载时返回无效索引"""
+        row = self._rows.find(script_id)
+        return self.index(row) if row >= 0 else QModelIndex()
+
+    def add_script(self, script_id: int, name: str, script_type: str = "python"):
+        if self._rows.script_type and script_type != self._rows.script_type:
+            return
+        row = self._rows.insert_position(script_id)
+        if row < 0:
+            return
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._rows.insert(row, script_id, name, script_type)
+        self.endInsertRows()
+
+    def rename_script(self, script_id: int, name: str):
+        row = self._rows.find(script_id)
+        if row < 0:
+            return
+        self._rows.names[row] = name
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.ItemDataRole.DisplayRole])
+
+    def remove_script(self, script_id: int):
+        row = self._rows.find(script_id)
+        if row < 0:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        self._rows.remove(row)
+        self.endRemoveRows()
+
+
+class ScriptTreeModel(QAbstractItemModel):
+    """
+    按脚本类型分组的脚本树模型
+
+    顶层为类型节点，每个类型下的脚本在展开后分批加载。
+    脚本节点的 internalPointer 指向所属分组，类型节点为 None。
+    """
+
+    GROUPS = [("python", "Python脚本"), ("nodejs", "Node.js脚本"), ("shell", "Shell脚本")]
+
+    def __init__(self, session_factory: Callable = SessionLocal,
+                 batch_size: int = BATCH_SIZE, parent=None):
+        super().__init__(parent)
+        self._groups = [_ScriptRows(session_factory, script_type, batch_size)
+                        for script_type, _ in self.GROUPS]
+        self._titles = [title for _, title in self.GROUPS]
+
+    def index(self, row: int, column: int, parent=QModelIndex()) -> QModelIndex:
+        if column != 0 or row < 0:
+            return QModelIndex()
+        if not parent.isValid():
+            if row < len(self._groups):
+                return self.createIndex(row, 0, None)
+            return QModelIndex()
+        if parent.internalPointer() is None and row < len(self._groups[parent.row()]):
+            return self.createIndex(row, 0, self._groups[parent.row()])
+        return QModelIndex()
+
+    def parent(self, index: QModelIndex) -> QModelIndex:
+        if not index.isValid():
+            return QModelIndex()
+        group = index.internalPointer()
+        if group is None:
+            return QModelIndex()
+        return self.createIndex(self._groups.index(group), 0, None)
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        if not parent.isValid():
+            return len(self._groups)
+        if parent.internalPointer() is None:
+            return len(self._groups[parent.row()])
+        return 0
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 1
+
+    def hasChildren(self, parent=QModelIndex()) -> bool:
+        if not parent.isValid():
+            return True
+        if parent.internalPointer() is None:
+            group = self._groups[parent.row()]
+            return len(group) > 0 or not group.exhausted
+        return False
+
+    def headerData(self, section: int, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return "脚本列表"
+        return None
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        group = index.internalPointer()
+        if group is None:
+            return self._titles[index.row()] if role == Qt.ItemDataRole.DisplayRole else None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return group.names[index.row()]
+        if role == Qt.ItemDataRole.UserRole:
+            return group.ids[index.row()]
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()) -> bool:
+        if not parent.isValid() or parent.internalPointer() is not None:
+            return False
+        return not self._groups[parent.row()].exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        group = self._groups[parent.row()]
+        rows = group.fetch()
+        if not rows:
+            return
+        first = len(group)
+        self.beginInsertRows(parent, first, first + len(rows) - 1)
+        group.extend(rows)
+        self.endInsertRows()
+
+    def reload(self):
+        self.beginResetModel()
+        for group in self._groups:
+            group.clear()
+        self.endResetModel()
+
+    def add_script(self, script_id: int, name: str, script_type: str = "python"):
+        group_row = self._group_row(script_type)
+        if group_row < 0:
+            return
+        group = self._groups[group_row]
+        row = group.insert_position(script_id)
+        if row < 0:
+            return
+        self.beginInsertRows(self.index(group_row, 0), row, row)
+        group.insert(row, script_id, name, script_type)
+        self.endInsertRows()
+
+    def remove_script(self, script_id: int):
+        for group_row, group in enumerate(self._groups):
+            row = group.find(script_id)
+            if row >= 0:
+                self.beginRemoveRows(self.index(group_row, 0), row, row)
+                group.remove(row)
+                self.endRemoveRows()
+                return
+
+    def _group_row(self, script_type: str) -> int:
+        for row, (group_type, _) in enumerate(self.GROUPS):
+            if group_type == script_type:
+                return row
+        return -1
@@ -1,12 +1,22 @@
 import sys
-from PyQt6.QtWidgets import QApplication
-from gui.main_window import MainWindow
 from database.db_manager import init_db
+from core.history_retention import HistoryRetention
 
 def main():
+    # 带参数时以命令行模式运行，不导入 PyQt
+    if len(sys.argv) > 1:
+        from cli.runner import main as cli_main
+        sys.exit(cli_main(sys.argv[1:]))
+    
+    from PyQt6.QtWidgets import QApplication
+    from gui.main_window import MainWindow
+    
     # 初始化数据库
     init_db()
     
+    # 定期清理执行历史
+    HistoryRetention().start()
+    
     # 创建应用
     app = QApplication(sys.argv)
     
@@ -18,4 +28,4 @@ def main():
     sys.exit(app.exec())
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
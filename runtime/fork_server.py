@@ -0,0 +1,226 @@
+"""
+预热解释器的 fork 服务
+
+由 core.warm_pool 以独立进程启动，运行在执行脚本所用的解释器中，
+只依赖标准库。启动时预先导入指定模块，之后每个执行请求 fork 一个子进程：
+
+    python fork_server.py <socket_path> [module ...]
+
+请求通过 Unix socket 发送，一行 JSON 加上 stdout/stderr 两个文件描述符，
+stdin 与 results 为 true 时依次再附带标准输入与结构化记录通道的描述符：
+    {"code": "...", "path": "<.pyc>", "env": {...}, "cwd": "...",
+     "rlimits": {"RLIMIT_AS": [soft, hard], ...}, "cgroup": "<cgroup 目录>",
+     "stdin": false, "results": false}
+服务先回复 {"pid": pid}，子进程结束后回复 {"exit": returncode}（被信号终止时为负的信号值）。
+"""
+import builtins
+import importlib
+import json
+import marshal
+import os
+import selectors
+try:
+    import resource
+except ImportError:
+    resource = None
+import signal
+import socket
+import sys
+import traceback
+import types
+
+
+def _run_child(request, fds):
+    """在 fork 出的子进程中执行脚本，不会返回"""
+    exit_code = 0
+    stdout_fd, stderr_fd = fds[:2]
+    extra = fds[2:]
+    stdin_fd = extra.pop(0) if request.get("stdin") else None
+    results_fd = extra.pop(0) if request.get("results") else None
+    try:
+        if stdin_fd is None:
+            stdin_fd = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(stdin_fd, 0)
+        os.dup2(stdout_fd, 1)
+        os.dup2(stderr_fd, 2)
+        for fd in (stdin_fd, stdout_fd, stderr_fd):
+            os.close(fd)
+        os.setsid()
+
+        # 先加入执行的 cgroup，再设置资源限制
+        if request.get("cgroup"):
+            with open(os.path.join(request["cgroup"], "cgroup.procs"), "w") as f:
+                f.write("0")
+        for name, (soft, hard) in (request.get("rlimits") or {}).items():
+            number = getattr(resource, name)
+            _, current_hard = resource.getrlimit(number)
+            if current_hard != resource.RLIM_INFINITY:
+                soft, hard = min(soft, current_hard), min(hard, current_hard)
+            resource.setrlimit(number, (soft, hard))
+
+        os.environ.clear()
+        os.environ.update(request.get("env") or {})
+        if results_fd is not None:
+            os.environ["SCRIPT_RESULTS_FD"] = str(results_fd)
+        if request.get("cwd"):
+            os.chdir(request["cwd"])
+
+        # 与 "python -c" 保持一致：全新的 __main__、sys.argv 与 sys.path[0]，
+        # 请求环境中的 PYTHONPATH 排在 sys.path[0] 之后
+        sys.argv = ["-c"]
+        sys.path[0] = ""
+        extra = [entry for entry in os.environ.get("PYTHONPATH", "").split(os.pathsep)
+                 if entry and entry not in sys.path]
+        sys.path[1:1] = extra
+        main = types.ModuleType("__main__")
+        main.__builtins__ = builtins
+        sys.modules["__main__"] = main
+
+        path = request.get("path")
+        if path:
+            # 缓存的 .pyc：跳过 16 字节文件头
+            with open(path, "rb") as f:
+                f.seek(16)
+                code = marshal.load(f)
+        else:
+            code = compile(request["code"], "<string>", "exec")
+        exec(code, main.__dict__)
+    except SystemExit as e:
+        if e.code is None:
+            exit_code = 0
+        elif isinstance(e.code, int):
+            exit_code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            exit_code = 1
+    except BaseException as e:
+        # 去掉 fork 服务自身的栈帧
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+        exit_code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(exit_code)
+
+
+def _send(conn, message):
+    try:
+        conn.sendall((json.dumps(message) + "\n").encode("utf-8"))
+    except OSError:
+        pass
+
+
+def _read_request(conn):
+    """读取一行 JSON 请求与附带的文件描述符"""
+    data = b""
+    fds = []
+    while not data.endswith(b"\n"):
+        chunk, new_fds, _, _ = socket.recv_fds(conn, 1 << 20, 4)
+        fds.extend(new_fds)
+        if not chunk:
+            break
+        data += chunk
+    return json.loads(data.decode("utf-8")), fds
+
+
+def serve(socket_path, preload):
+    for module in preload:
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            print(f"preload {module} failed: {e}", file=sys.stderr, flush=True)
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen(128)
+
+    # SIGCHLD 通过 wakeup fd 进入事件循环
+    wakeup_r, wakeup_w = socket.socketpair()
+    wakeup_r.setblocking(False)
+    wakeup_w.setblocking(False)
+    signal.set_wakeup_fd(wakeup_w.fileno())
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+
+    selector = selectors.DefaultSelector()
+    selector.register(listener, selectors.EVENT_READ, "accept")
+    selector.register(wakeup_r, selectors.EVENT_READ, "signal")
+    # 父进程关闭 stdin 时退出
+    selector.register(sys.stdin, selectors.EVENT_READ, "stdin")
+
+    children = {}
+    print("ready", flush=True)
+
+    while True:
+        for key, _ in selector.select():
+            if key.data == "stdin":
+                if not os.read(sys.stdin.fileno(), 1024):
+                    return
+            elif key.data == "signal":
+                try:
+                    while wakeup_r.recv(1024):
+                        pass
+                except BlockingIOError:
+                    pass
+                _reap(children)
+            elif key.data == "accept":
+                conn, _ = listener.accept()
+                try:
+                    request, fds = _read_request(conn)
+                except (OSError, ValueError) as e:
+                    _send(conn, {"error": str(e)})
+                    conn.close()
+                    continue
+                expected = 2 + bool(request.get("stdin")) + bool(request.get("results"))
+                if len(fds) != expected:
+                    _send(conn, {"error": f"expected {expected} descriptors, got {len(fds)}"})
+                    for fd in fds:
+                        os.close(fd)
+                    conn.close()
+                    continue
+
+                sys.stdout.flush()
+                sys.stderr.flush()
+                pid = os.fork()
+                if pid == 0:
+                    signal.set_wakeup_fd(-1)
+                    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                    selector.close()
+                    listener.close()
+                    wakeup_r.close()
+                    wakeup_w.close()
+                    for other in children.values():
+                        other.close()
+                    conn.close()
+                    _run_child(request, fds)
+
+                for fd in fds:
+                    os.close(fd)
+                children[pid] = conn
+                _send(conn, {"pid": pid})
+        # 子进程可能在登记前就已退出
+        _reap(children)
+
+
+def _reap(children):
+    while children:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if pid == 0:
+            return
+        conn = children.pop(pid, None)
+        if conn is None:
+            continue
+        if os.WIFSIGNALED(status):
+            code = -os.WTERMSIG(status)
+        else:
+            code = os.WEXITSTATUS(status)
+        _send(conn, {"exit": code})
+        conn.close()
+
+
+if __name__ == "__main__":
+    serve(sys.argv[1], sys.argv[2:])
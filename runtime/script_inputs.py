@@ -0,0 +1,104 @@
+"""
+脚本的输入附件
+
+执行器把大的输入放在共享内存段或文件中（见 core.attachments），附件清单通过环境变量
+SCRIPT_ATTACHMENTS 传给脚本。本模块把附件映射到脚本的地址空间，不复制数据：
+
+    import script_inputs
+    script_inputs.names()                   # 附件名列表
+    data = script_inputs.buffer("dataset")  # 只读 memoryview
+    matrix = script_inputs.array("matrix")  # 只读 NumPy 数组（需要 numpy）
+    path = script_inputs.path("config")     # 文件附件的路径，可交给只接受路径的库
+
+执行器把本目录加入 PYTHONPATH，脚本可以直接导入。只依赖标准库（array 需要 numpy）。
+映射在进程退出前一直有效，执行结束后执行器删除共享内存段与临时文件。
+"""
+import json
+import mmap
+import os
+
+ATTACHMENTS_ENV = "SCRIPT_ATTACHMENTS"
+SHM_DIR = "/dev/shm"
+
+_manifest = None
+# 附件名 -> (映射对象, 只读 memoryview)，映射对象须在 memoryview 使用期间保持存在
+_mapped = {}
+
+
+def _entries():
+    global _manifest
+    if _manifest is None:
+        _manifest = json.loads(os.environ.get(ATTACHMENTS_ENV) or "{}")
+    return _manifest
+
+
+def _entry(name):
+    try:
+        return _entries()[name]
+    except KeyError:
+        raise KeyError(f"No attachment named {name!r}") from None
+
+
+def names():
+    """本次执行的附件名"""
+    return list(_entries())
+
+
+def size(name):
+    """附件的字节数"""
+    return _entry(name)["size"]
+
+
+def path(name):
+    """文件附件的路径；共享内存段在 Linux 上同样可以通过路径访问，其他平台上返回 None"""
+    entry = _entry(name)
+    if entry["kind"] == "file":
+        return entry["location"]
+    location = os.path.join(SHM_DIR, entry["location"].lstrip("/"))
+    return location if os.path.exists(location) else None
+
+
+def buffer(name):
+    """把附件映射为只读 memoryview，重复调用返回同一映射"""
+    if name in _mapped:
+        return _mapped[name][1]
+    entry = _entry(name)
+    if entry["size"] == 0:
+        view = memoryview(b"")
+        _mapped[name] = (None, view)
+        return view
+
+    location = path(name)
+    if location is not None:
+        with open(location, "rb") as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapping)[:entry["size"]]
+    else:
+        mapping = _open_segment(entry["location"])
+        # 部分平台按页大小向上取整段的大小
+        view = mapping.buf[:entry["size"]].toreadonly()
+    _mapped[name] = (mapping, view)
+    return view
+
+
+def array(name):
+    """把数组附件映射为只读 NumPy 数组，dtype 与 shape 与执行器传入的数组相同"""
+    import numpy
+    entry = _entry(name)
+    if "dtype" not in entry:
+        raise ValueError(f"Attachment {name!r} is not an array")
+    dtype = numpy.lib.format.descr_to_dtype(entry["dtype"])
+    return numpy.frombuffer(buffer(name), dtype=dtype).reshape(entry["shape"])
+
+
+def _open_segment(segment_name):
+    """没有 /dev/shm 的平台上通过 multiprocessing 打开共享内存段"""
+    from multiprocessing import shared_memory
+    try:
+        return shared_memory.SharedMemory(name=segment_name, track=False)
+    except TypeError:
+        segment = shared_memory.SharedMemory(name=segment_name)
+        # Python 3.13 之前打开已有的段也会登记到资源跟踪进程，本进程退出时段会被删除
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(segment._name, "shared_memory")
+        return segment
@@ -0,0 +1,80 @@
+"""
+脚本的结构化记录
+
+执行器为每个执行提供一个独立于 stdout/stderr 的记录通道（描述符号码在环境变量 SCRIPT_RESULTS_FD 中），
+本模块每行写一条 JSON 记录，执行器逐行解析并保存到 execution_records 表（见 core.execution_records）：
+
+    import script_results
+    script_results.progress(30, 100, "loading")     # 只保留最新进度
+    script_results.metric("loss", 0.12, step=10)
+    script_results.result("accuracy", 0.93)
+    script_results.emit("checkpoint", name="epoch-3", path="/tmp/ckpt")
+
+不在执行器中运行（没有记录通道）时记录被忽略，脚本可以照常单独运行。
+只依赖标准库，可以在多个线程中调用。
+"""
+import json
+import os
+import threading
+
+RESULTS_FD_ENV = "SCRIPT_RESULTS_FD"
+
+_lock = threading.Lock()
+_fd = None
+_opened = False
+
+
+def _channel():
+    global _fd, _opened
+    if not _opened:
+        _opened = True
+        value = os.environ.get(RESULTS_FD_ENV, "")
+        if value.isdigit():
+            _fd = int(value)
+    return _fd
+
+
+def emit(kind, **fields):
+    """
+    写一条记录
+
+    Args:
+        kind: 记录类型，progress、metric、result 或自定义的类型
+        fields: 记录的其他字段，需要能序列化为 JSON（其他对象按 str() 保存）；
+            name、数值的 value 与整数的 step 另存为可查询的列
+    """
+    global _fd
+    fd = _channel()
+    if fd is None:
+        return
+    record = dict(fields)
+    record["kind"] = kind
+    data = (json.dumps(record, default=str) + "\n").encode("utf-8")
+    # 超过 PIPE_BUF 的写入不是原子的，加锁避免多线程的记录交错
+    with _lock:
+        try:
+            while data:
+                written = os.write(fd, data)
+                data = data[written:]
+        except OSError:
+            # 执行器已关闭通道，之后的记录被忽略
+            _fd = None
+
+
+def progress(done, total=None, message=None):
+    """报告进度：给出 total 时为 done/total，否则 done 为 0~1 之间的比例"""
+    value = done / total if total else done
+    emit("progress", value=value, message=message)
+
+
+def metric(name, value, step=None):
+    """报告一个指标，同名指标可以按 step 多次报告"""
+    if step is None:
+        emit("metric", name=name, value=value)
+    else:
+        emit("metric", name=name, value=value, step=step)
+
+
+def result(name, value):
+    """报告一个结果值，value 可以是任何能序列化为 JSON 的值"""
+    emit("result", name=name, value=value)